@@ -26,7 +26,21 @@ def create_app():
 
     @app.route('/health')
     def health_check():
-        return jsonify({'status': 'healthy', 'version': '2.0.0'})
+        try:
+            from models.database import check_database_health, audit_writer
+            database = check_database_health()
+            database['audit_writer'] = audit_writer.get_stats()
+        except Exception as e:
+            database = {'ok': False, 'error': str(e)}
+        try:
+            from utils.rate_limiter import rate_limiter
+            limiter = rate_limiter.get_stats()
+        except Exception as e:
+            limiter = {'error': str(e)}
+        status = 'healthy' if database['ok'] else 'degraded'
+        return jsonify({
+            'status': status, 'version': '2.0.0', 'database': database, 'rate_limiter': limiter
+        }), 200 if database['ok'] else 503
     
     @app.route('/api/test')
     def test_api():
@@ -52,12 +66,58 @@ def create_app():
     
     # Try to initialize database
     try:
-        from models.database import init_database
+        from models.database import init_database, audit_writer
         init_database()
         print("✓ Database initialized successfully")
+        
+        # Commit audits journaled by workers that died before their group commit
+        replayed = audit_writer.replay_journals()
+        if replayed:
+            print(f"✓ Replayed {replayed} uncommitted audits")
     except Exception as e:
         print(f"✗ Failed to initialize database: {e}")
     
+    # Index any report files written before the report index existed
+    try:
+        from services.report_cache import sync_report_index
+        result = sync_report_index()
+        print(f"✓ Report index synced ({result['indexed']} added, {result['dropped']} dropped)")
+    except Exception as e:
+        print(f"✗ Failed to sync report index: {e}")
+    
+    # Deliver emails left in the outbox by a previous run
+    try:
+        from services.email_outbox import email_outbox
+        email_outbox.start()
+        print("✓ Email outbox dispatcher started")
+    except Exception as e:
+        print(f"✗ Failed to start email outbox: {e}")
+    
+    # Move audits past the retention age out of the hot database, a batch at a time
+    try:
+        from config.settings import ARCHIVE_AFTER_DAYS
+        if ARCHIVE_AFTER_DAYS > 0:
+            from services.audit_archiver import audit_archiver
+            audit_archiver.start()
+            print("✓ Audit archiver started")
+    except Exception as e:
+        print(f"✗ Failed to start audit archiver: {e}")
+    
+    # Optionally warm the cache from audit history so popular URLs don't all go cold
+    try:
+        from config.settings import CACHE_WARM_ON_STARTUP
+        if CACHE_WARM_ON_STARTUP:
+            from utils.process_lock import hold_lock
+            # One warm-up per host, not one per worker
+            if hold_lock('cache-warmer'):
+                from services.cache_warmer import cache_warmer
+                cache_warmer.start()
+                print("✓ Cache warm-up started")
+            else:
+                print("✓ Cache warm-up already started by another worker")
+    except Exception as e:
+        print(f"✗ Failed to start cache warm-up: {e}")
+    
     # Try to setup logging
     try:
         from utils.logging_config import setup_logging
@@ -66,6 +126,13 @@ def create_app():
     except Exception as e:
         print(f"✗ Failed to setup logging: {e}")
     
+    # Startup queries ran on this thread's connection; don't carry it into forked Gunicorn workers
+    try:
+        from models.connection import connections
+        connections.close()
+    except Exception as e:
+        print(f"✗ Failed to close startup database connection: {e}")
+    
     print(f"\nRegistered routes:")
     for rule in app.url_map.iter_rules():
         print(f"  {rule.endpoint}: {rule.rule}")
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Benchmark email body rendering throughput for a mass resend
+
+Compares the previous pipeline (build the segment f-string, then one
+str.replace pass over the whole body per placeholder) with the compiled
+templates that are parsed once and filled in a single pass.
+"""
+
+import os
+import sys
+import html
+import time
+import argparse
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_service import build_email_body, get_email_template, get_score_segment, personalize_email_body
+from benchmarks.bench_report_render import SAMPLE_AUDIT
+
+
+def legacy_email_body(audit_data: dict, website_url: str) -> str:
+    """Body built the way send_email_report did before compiled templates"""
+    overall_score = audit_data.get('overall_score', audit_data.get('score', 0))
+    html_body = get_email_template(get_score_segment(overall_score), audit_data)
+    business_name = website_url.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0].split('.')[0].title()
+    google_overlooks = audit_data.get('estimated_monthly_traffic_loss', 1000) * 2.847
+    html_body = personalize_email_body(html_body, {
+        'businessName': business_name,
+        'websiteUrl': website_url,
+        'googleOverlooks': f"{int(google_overlooks):,}"
+    })
+    critical_issues = audit_data.get('critical_issues', [])
+    replacements = {
+        'recommendations': '<ul>' + ''.join(f'<li>{html.escape(rec)}</li>' for rec in audit_data.get('recommendations', [])) + '</ul>',
+        'critical_issues': '<ul>' + ''.join(f'<li>{html.escape(issue)}</li>' for issue in critical_issues) + '</ul>',
+        'score': str(overall_score),
+        'critical_count': str(len(critical_issues))
+    }
+    for key, value in replacements.items():
+        html_body = html_body.replace(f'{{{{{key}}}}}', value)
+    return html_body
+
+
+def make_audits(count: int) -> list:
+    """Audits spread across all three score segments"""
+    scores = (45, 70, 90)
+    return [
+        ({**SAMPLE_AUDIT, 'overall_score': scores[i % 3]}, f'https://www.site{i}.example.com')
+        for i in range(count)
+    ]
+
+
+def run(render, audits: list) -> float:
+    start = time.perf_counter()
+    for audit_data, url in audits:
+        render(audit_data, url)
+    return len(audits) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark email body rendering')
+    parser.add_argument('--emails', '-n', type=int, default=5000, help='Number of emails to render')
+    args = parser.parse_args()
+
+    audits = make_audits(args.emails)
+    for audit_data, url in audits[:3]:
+        assert legacy_email_body(audit_data, url) == build_email_body(audit_data, url), 'outputs differ'
+
+    # Warm-up so template compilation isn't counted
+    run(build_email_body, audits[:3])
+
+    legacy = run(legacy_email_body, audits)
+    compiled = run(build_email_body, audits)
+    print(f"{'':22} {'emails/s':>10}")
+    print(f"{'replace loop (before)':22} {legacy:10.0f}")
+    print(f"{'compiled (after)':22} {compiled:10.0f}")
+    print(f"speedup: {compiled / legacy:.1f}x")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""Benchmark per-report PDF render time and memory for generate_pdf_report
+
+Compares a warm report template (styles and static flowables built once per
+process) against a cold one rebuilt for every report, which is what every
+render paid before the template layer existed.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import report_generator
+from services.report_generator import generate_pdf_report
+
+SAMPLE_AUDIT = {
+    'overall_score': 58,
+    'category_scores': {
+        'technical_seo': 64,
+        'content_quality': 52,
+        'ai_readiness': 41,
+        'voice_search': 75,
+    },
+    'critical_issues': [
+        'Missing schema markup on key landing pages',
+        'Images missing alt text across the product gallery',
+        'Multiple H1 headings on the homepage',
+        'No meta description on 14 pages',
+        'Slow server response time (1.8s TTFB)',
+    ],
+    'quick_wins': [
+        'Add a unique meta description to each page',
+        'Compress hero images',
+        'Add FAQ schema to the support page',
+        'Fix broken internal links',
+        'Add descriptive alt text to logo',
+    ],
+    'ai_search_issues': ['Content lacks direct answers to common questions', 'No entity markup'],
+    'voice_search_issues': ['No conversational FAQ content', 'Missing local business schema'],
+    'estimated_monthly_traffic_loss': 4200,
+}
+
+
+def render(path: str, website_data: dict, cold: bool) -> None:
+    if cold:
+        report_generator._template = None
+    generate_pdf_report(SAMPLE_AUDIT, website_data, filepath=path)
+
+
+def run_benchmark(iterations: int, cold: bool = False) -> dict:
+    website_data = {'url': 'https://www.example.com/services'}
+    timings = []
+    peaks = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Warm-up render so imports and font loading aren't counted
+        render(os.path.join(tmp_dir, 'warmup.pdf'), website_data, cold)
+
+        for i in range(iterations):
+            path = os.path.join(tmp_dir, f'report_{i}.pdf')
+            start = time.perf_counter()
+            render(path, website_data, cold)
+            timings.append(time.perf_counter() - start)
+
+        for i in range(min(iterations, 10)):
+            path = os.path.join(tmp_dir, f'traced_{i}.pdf')
+            tracemalloc.start()
+            render(path, website_data, cold)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            peaks.append(peak)
+
+    return {
+        'iterations': iterations,
+        'mean_ms': statistics.mean(timings) * 1000,
+        'median_ms': statistics.median(timings) * 1000,
+        'p95_ms': sorted(timings)[int(len(timings) * 0.95) - 1] * 1000,
+        'peak_alloc_kb': statistics.mean(peaks) / 1024,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark PDF report rendering')
+    parser.add_argument('--iterations', '-n', type=int, default=50, help='Number of timed renders')
+    args = parser.parse_args()
+
+    results = {
+        'cold template (before)': run_benchmark(args.iterations, cold=True),
+        'warm template (after)': run_benchmark(args.iterations, cold=False),
+    }
+
+    print(f"{'':24} {'mean ms':>9} {'median ms':>10} {'p95 ms':>8} {'peak KB':>8}")
+    for label, result in results.items():
+        print(f"{label:24} {result['mean_ms']:9.1f} {result['median_ms']:10.1f} "
+              f"{result['p95_ms']:8.1f} {result['peak_alloc_kb']:8.0f}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""Compare PDF file size and render time per report build profile
+
+Renders stored audits (or the sample audit when the database is empty) with
+every profile in REPORT_PROFILES and reports the mean file size, the size
+once base64-encoded for a Resend attachment, and the mean render time.
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.database import get_connection, load_audit_json
+from services.report_generator import generate_pdf_report, REPORT_PROFILES
+from benchmarks.bench_report_render import SAMPLE_AUDIT
+
+
+def load_audits(limit: int) -> list:
+    """Latest stored audits as (url, audit_data) pairs"""
+    try:
+        rows = get_connection().execute('''
+            SELECT a.url, a.audit_data, b.data AS blob
+            FROM audits a LEFT JOIN audit_blobs b ON b.hash = a.blob_hash
+            ORDER BY a.id DESC LIMIT ?
+        ''', (limit,)).fetchall()
+    except sqlite3.Error:
+        rows = []
+    audits = [(row['url'], json.loads(load_audit_json(row))) for row in rows if load_audit_json(row)]
+    return audits or [('https://www.example.com/services', SAMPLE_AUDIT)]
+
+
+def run_profile(profile: str, audits: list, rounds: int) -> dict:
+    sizes = []
+    encoded = []
+    timings = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Warm-up render so imports and the report template aren't counted
+        generate_pdf_report(audits[0][1], {'url': audits[0][0]}, os.path.join(tmp_dir, 'warmup.pdf'), profile)
+
+        for r in range(rounds):
+            for i, (url, audit_data) in enumerate(audits):
+                path = os.path.join(tmp_dir, f'report_{r}_{i}.pdf')
+                start = time.perf_counter()
+                generate_pdf_report(audit_data, {'url': url}, path, profile)
+                timings.append(time.perf_counter() - start)
+
+                with open(path, 'rb') as f:
+                    content = f.read()
+                sizes.append(len(content))
+                encoded.append(len(base64.b64encode(content)))
+
+    return {
+        'mean_kb': statistics.mean(sizes) / 1024,
+        'base64_kb': statistics.mean(encoded) / 1024,
+        'mean_ms': statistics.mean(timings) * 1000,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark PDF size and render time per build profile')
+    parser.add_argument('--audits', '-a', type=int, default=50, help='Number of stored audits to render')
+    parser.add_argument('--rounds', '-r', type=int, default=3, help='Renders per audit and profile')
+    args = parser.parse_args()
+
+    audits = load_audits(args.audits)
+    print(f'{len(audits)} audits x {args.rounds} rounds')
+    print(f"{'profile':14} {'mean KB':>8} {'base64 KB':>10} {'mean ms':>8}")
+    for profile in REPORT_PROFILES:
+        result = run_profile(profile, audits, args.rounds)
+        print(f"{profile:14} {result['mean_kb']:8.1f} {result['base64_kb']:10.1f} {result['mean_ms']:8.1f}")
@@ -9,16 +9,39 @@ load_dotenv()
 
 # App Settings
 DEBUG = os.getenv('DEBUG', 'True').lower() == 'true'
-SECRET_KEY = os.getenv('SECRET_KEY', 'your-secret-key-here-change-in-production')
+DEFAULT_SECRET_KEY = 'your-secret-key-here-change-in-production'  # public placeholder; signed links are off while in use
+SECRET_KEY = os.getenv('SECRET_KEY', DEFAULT_SECRET_KEY)
+ADMIN_API_KEY = os.getenv('ADMIN_API_KEY', '')  # sent as X-Admin-Key; admin endpoints are disabled while empty
 
 # Database
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'data/seo_auditor.db')
+DB_BUSY_TIMEOUT = float(os.getenv('DB_BUSY_TIMEOUT', '10'))  # seconds to wait for a write lock
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough with WAL; FULL fsyncs every commit
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))  # page cache per connection
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))  # bytes of the file read through mmap
+
+# Write-behind audit persistence (rows are journaled, then committed in groups)
+AUDIT_WRITE_BEHIND = os.getenv('AUDIT_WRITE_BEHIND', 'True').lower() == 'true'
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', '200'))  # longest a row waits for its commit
+AUDIT_FLUSH_BATCH = int(os.getenv('AUDIT_FLUSH_BATCH', '100'))  # rows that trigger an early commit
+AUDIT_JOURNAL_DIR = os.getenv('AUDIT_JOURNAL_DIR', 'data/journal')
+AUDIT_JOURNAL_FSYNC = os.getenv('AUDIT_JOURNAL_FSYNC', 'True').lower() == 'true'  # fsync each row so journals survive OS crashes
+AUDIT_JOURNAL_REPLAY_INTERVAL = int(os.getenv('AUDIT_JOURNAL_REPLAY_INTERVAL', '30'))  # seconds between sweeps for dead workers' journals
+
+# Audit archive (old audits move to monthly tables in a separate file, keeping the hot database small)
+ARCHIVE_DATABASE_PATH = os.getenv('ARCHIVE_DATABASE_PATH', '')  # empty: <database>_archive.db alongside it
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))  # 0 disables archiving
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))  # audits moved per transaction
+ARCHIVE_BATCH_PAUSE_MS = int(os.getenv('ARCHIVE_BATCH_PAUSE_MS', '50'))  # gap between batches so writers get the lock
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', '3600'))  # seconds between archive runs
+ARCHIVE_VACUUM_PAGES = int(os.getenv('ARCHIVE_VACUUM_PAGES', '1000'))  # free pages returned per incremental vacuum step
 
 # Directories
 REPORTS_DIR = os.getenv('REPORTS_DIR', 'reports')
 CACHE_DIR = os.getenv('CACHE_DIR', 'cache')
 LOGS_DIR = os.getenv('LOGS_DIR', 'logs')
 STATIC_DIR = os.getenv('STATIC_DIR', 'static')
+LOCK_DIR = os.getenv('LOCK_DIR', 'data/locks')  # lock files electing the one worker that runs each background job
 
 # Email Configuration (Legacy SMTP - kept for backward compatibility)
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
@@ -29,6 +52,20 @@ EMAIL_PASS = os.getenv('EMAIL_PASS', '')  # Your app password
 # Email Service Configuration (Resend)
 RESEND_API_KEY = os.getenv('RESEND_API_KEY', '')
 RESEND_FROM_EMAIL = os.getenv('RESEND_FROM_EMAIL', '')
+RESEND_API_URL = os.getenv('RESEND_API_URL', 'https://api.resend.com')
+
+# Email outbox dispatch
+EMAIL_SEND_RATE = float(os.getenv('EMAIL_SEND_RATE', '2'))  # provider requests per second (Resend default limit)
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', '50'))  # emails per batch request (Resend max 100)
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', '6'))
+EMAIL_RETRY_BASE_DELAY = int(os.getenv('EMAIL_RETRY_BASE_DELAY', '30'))  # seconds, doubled per attempt
+EMAIL_RETRY_MAX_DELAY = int(os.getenv('EMAIL_RETRY_MAX_DELAY', '3600'))  # seconds
+EMAIL_OUTBOX_POLL_INTERVAL = int(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', '5'))  # seconds
+EMAIL_OUTBOX_LEASE = int(os.getenv('EMAIL_OUTBOX_LEASE', '120'))  # seconds before a stuck send is retried
+EMAIL_SEND_TIMEOUT = int(os.getenv('EMAIL_SEND_TIMEOUT', '15'))  # seconds per provider request
+EMAIL_DEDUP_WINDOW = int(os.getenv('EMAIL_DEDUP_WINDOW', '900'))  # skip repeat reports for the same recipient and URL, 0 = off
+EMAIL_DIGEST_WINDOW = int(os.getenv('EMAIL_DIGEST_WINDOW', '0'))  # seconds to collect reports into one email, 0 = off
+EMAIL_DIGEST_MAX = int(os.getenv('EMAIL_DIGEST_MAX', '10'))  # reports per digest email
 
 # Email Marketing Configuration - WITH SAFE DEFAULTS SO APP RUNS!
 BOOKING_URL = os.getenv('BOOKING_URL', 'https://example.com/contact')
@@ -44,9 +81,76 @@ OPENROUTER_BASE_URL = os.getenv('OPENROUTER_BASE_URL', 'https://openrouter.ai/ap
 RATE_LIMIT_PER_IP = int(os.getenv('RATE_LIMIT_PER_IP', '50'))
 RATE_LIMIT_PER_EMAIL = int(os.getenv('RATE_LIMIT_PER_EMAIL', '10'))
 RATE_LIMIT_WINDOW = int(os.getenv('RATE_LIMIT_WINDOW', '3600'))  # 1 hour
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))  # clients tracked at once; least recent dropped past this
+RATE_LIMIT_SWEEP_INTERVAL = int(os.getenv('RATE_LIMIT_SWEEP_INTERVAL', '60'))  # seconds between idle key sweeps
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', '')  # memory, sqlite or redis; empty: redis if REDIS_URL is set, else sqlite
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', 'data/rate_limits.db')  # shared by the workers on one host
+RATE_LIMIT_KEY_PREFIX = os.getenv('RATE_LIMIT_KEY_PREFIX', 'seo_auditor_ratelimit:')  # kept outside the cache's REDIS_KEY_PREFIX
+
+# Audit history API
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '20'))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv('HISTORY_MAX_PAGE_SIZE', '100'))
+STATS_MAX_DAYS = int(os.getenv('STATS_MAX_DAYS', '366'))  # longest window /api/stats serves
 
 # Cache Settings
 CACHE_TTL = int(os.getenv('CACHE_TTL', '7200'))  # 2 hours
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(200 * 1024 * 1024)))  # 200MB, 0 = unbounded
+CACHE_JANITOR_INTERVAL = int(os.getenv('CACHE_JANITOR_INTERVAL', '60'))  # seconds, 0 = disabled
+CACHE_JANITOR_BATCH = int(os.getenv('CACHE_JANITOR_BATCH', '200'))  # entries checked per pass
+
+# Rendered PDF reuse and garbage collection
+REPORT_CACHE_MAX_AGE = int(os.getenv('REPORT_CACHE_MAX_AGE', str(30 * 24 * 3600)))  # 30 days since last use
+REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))  # 500MB
+REPORT_CACHE_CLEANUP_INTERVAL = int(os.getenv('REPORT_CACHE_CLEANUP_INTERVAL', '3600'))  # seconds
+
+# PDF build profile: compact (default), standard (ReportLab defaults) or uncompressed
+REPORT_PDF_PROFILE = os.getenv('REPORT_PDF_PROFILE', 'compact')
+
+# Report downloads (files are content-addressed, so they can be cached forever)
+REPORT_DOWNLOAD_MAX_AGE = int(os.getenv('REPORT_DOWNLOAD_MAX_AGE', str(365 * 24 * 3600)))  # 1 year
+REPORT_ACCEL_REDIRECT = os.getenv('REPORT_ACCEL_REDIRECT', 'False').lower() == 'true'  # let nginx send the file
+REPORT_ACCEL_PREFIX = os.getenv('REPORT_ACCEL_PREFIX', '/protected-reports/')  # internal nginx location
+
+# Attach the PDF to report emails; when off the PDF is only built on first download
+EMAIL_ATTACH_PDF = os.getenv('EMAIL_ATTACH_PDF', 'True').lower() == 'true'
+EMAIL_ATTACH_MAX_BYTES = int(os.getenv('EMAIL_ATTACH_MAX_BYTES', str(2 * 1024 * 1024)))  # larger PDFs are sent as a link, 0 = always link
+EMAIL_ATTACHMENT_CACHE_BYTES = int(os.getenv('EMAIL_ATTACHMENT_CACHE_BYTES', str(32 * 1024 * 1024)))  # base64 payloads kept in memory
+
+# Signed, expiring report download links (emailed instead of large attachments)
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', 'http://localhost:5000')  # where users reach the app
+REPORT_LINK_TTL = int(os.getenv('REPORT_LINK_TTL', str(7 * 24 * 3600)))  # 7 days
+
+# PDF render process pool (0 workers = render inline in the calling thread)
+RENDER_POOL_WORKERS = int(os.getenv('RENDER_POOL_WORKERS', '2'))  # per Gunicorn worker
+RENDER_QUEUE_SIZE = int(os.getenv('RENDER_QUEUE_SIZE', '32'))  # pending renders before rejecting
+RENDER_TIMEOUT = int(os.getenv('RENDER_TIMEOUT', '60'))  # seconds per render
+RENDER_CALLBACK_WORKERS = int(os.getenv('RENDER_CALLBACK_WORKERS', '4'))  # threads running post-render work (email)
+
+# Batch comparison audits (client site plus competitors)
+BATCH_MAX_SITES = int(os.getenv('BATCH_MAX_SITES', '5'))
+BATCH_AUDIT_WORKERS = int(os.getenv('BATCH_AUDIT_WORKERS', '4'))  # audits run concurrently per batch
+
+# Shared Redis cache (leave REDIS_URL empty to use the file cache only)
+REDIS_URL = os.getenv('REDIS_URL', '')
+REDIS_KEY_PREFIX = os.getenv('REDIS_KEY_PREFIX', 'seo_auditor:')
+REDIS_LOCAL_CACHE_SIZE = int(os.getenv('REDIS_LOCAL_CACHE_SIZE', '256'))  # per-worker hot entries
+
+# Negative caching of failed scrapes (base TTL in seconds per error type, doubled per repeat failure)
+NEGATIVE_CACHE_TTLS = {
+    'dns': int(os.getenv('NEGATIVE_TTL_DNS', '300')),
+    'tls': int(os.getenv('NEGATIVE_TTL_TLS', '600')),
+    'timeout': int(os.getenv('NEGATIVE_TTL_TIMEOUT', '60')),
+    'connection': int(os.getenv('NEGATIVE_TTL_CONNECTION', '60')),
+    'http_4xx': int(os.getenv('NEGATIVE_TTL_HTTP_4XX', '300')),
+    'http_5xx': int(os.getenv('NEGATIVE_TTL_HTTP_5XX', '60')),
+}
+NEGATIVE_CACHE_MAX_TTL = int(os.getenv('NEGATIVE_CACHE_MAX_TTL', '3600'))  # 1 hour
+
+# Cache warm-up from audit history
+CACHE_WARM_ON_STARTUP = os.getenv('CACHE_WARM_ON_STARTUP', 'False').lower() == 'true'
+CACHE_WARMUP_LIMIT = int(os.getenv('CACHE_WARMUP_LIMIT', '200'))  # URLs per run
+CACHE_WARMUP_RATE = float(os.getenv('CACHE_WARMUP_RATE', '20'))  # entries per second
+CACHE_WARM_MAX_AGE = int(os.getenv('CACHE_WARM_MAX_AGE', '604800'))  # oldest stored audit to warm from (7 days)
 
 # Create required directories
 for directory in [REPORTS_DIR, CACHE_DIR, LOGS_DIR, STATIC_DIR, os.path.dirname(DATABASE_PATH)]:
@@ -0,0 +1,220 @@
+# File: models/audit_writer.py
+# Write-behind buffer that journals audit rows and commits them to SQLite in groups
+
+import os
+import re
+import json
+import glob
+import time
+import uuid
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# audits_<pid>-<token>.jsonl is being appended to; audits_<pid>-<token>.<seq>.flushing is being committed.
+# The token tells a restarted worker that reused a PID apart from the crashed one (older journals have none)
+JOURNAL_RE = re.compile(r'audits_(\d+)(?:-([0-9a-f]+))?\.')
+
+class AuditWriter:
+    """Buffers audit rows off the request path and inserts them in batches"""
+    
+    def __init__(self, insert_rows: Callable[[List[Dict]], None], journal_dir: str,
+                 flush_interval: float, batch_size: int, fsync: bool = True, replay_interval: float = 30):
+        self.insert_rows = insert_rows
+        self.journal_dir = journal_dir
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.fsync = fsync
+        self.replay_interval = replay_interval
+        self._last_replay = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one group commit at a time
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+        self._token = None
+        self._pending = {}  # report_id -> row, readable before it is committed
+        self._journal = None
+        self._seq = 0
+        self._stats = {'queued': 0, 'flushed': 0, 'batches': 0, 'replayed': 0}
+    
+    def add(self, row: Dict) -> None:
+        """Queue a row; it is journaled before this returns and committed with the next group"""
+        self._ensure_started()
+        line = json.dumps(row) + '\n'
+        with self._lock:
+            # The journal lets a restarted worker replay rows this process never committed
+            self._journal.write(line)
+            self._sync_journal()
+            self._pending[row['report_id']] = row
+            self._stats['queued'] += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+    
+    def get_pending(self, report_id: str) -> Optional[Dict]:
+        """A row that is queued but not yet committed, so callers can read their own writes"""
+        with self._lock:
+            return self._pending.get(report_id) if self._pid == os.getpid() else None
+    
+    def find_journaled(self, report_id: str) -> Optional[Dict]:
+        """A row still waiting in any process's journal, so other workers can read it before its commit"""
+        for path in glob.glob(os.path.join(self.journal_dir, 'audits_*')):
+            try:
+                with open(path) as f:
+                    for line in f:
+                        if report_id not in line:
+                            continue
+                        try:
+                            row = json.loads(line)
+                        except ValueError:
+                            break  # torn last line, still being written
+                        if row.get('report_id') == report_id:
+                            return row
+            except FileNotFoundError:
+                continue  # committed (or replayed) while we looked
+        return None
+    
+    def flush(self) -> int:
+        """Commit everything queued so far in one transaction; returns the number of rows"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid() or not self._pending:
+                    return 0
+                rows = list(self._pending.values())
+                # Rows queued from here on go to a fresh journal
+                committing = self._rotate_journal()
+            
+            try:
+                self.insert_rows(rows)
+            except Exception as e:
+                # Keep the rows readable and the journal on disk; the next flush or a restart retries
+                logger.error(f'Audit group commit of {len(rows)} rows failed: {e}')
+                self._restore(committing)
+                return 0
+            
+            with self._lock:
+                for row in rows:
+                    if self._pending.get(row['report_id']) is row:
+                        del self._pending[row['report_id']]
+                self._stats['flushed'] += len(rows)
+                self._stats['batches'] += 1
+            os.remove(committing)
+            return len(rows)
+    
+    def replay_journals(self) -> int:
+        """Commit rows left in the journals of processes that exited without flushing"""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, 'audits_*'))):
+            match = JOURNAL_RE.search(os.path.basename(path))
+            if not match or self._is_live(int(match.group(1)), match.group(2)):
+                continue
+            rows = []
+            try:
+                with open(path) as f:
+                    for line in f:
+                        try:
+                            rows.append(json.loads(line))
+                        except ValueError:
+                            break  # torn last line from a crash mid-write
+                if rows:
+                    # Inserts ignore report ids that are already stored, so replaying twice is harmless
+                    self.insert_rows(rows)
+                os.remove(path)
+            except FileNotFoundError:
+                continue  # another worker replayed it first
+            replayed += len(rows)
+        with self._lock:
+            self._stats['replayed'] += replayed
+        if replayed:
+            logger.info(f'Replayed {replayed} uncommitted audits from journals')
+        return replayed
+    
+    def get_stats(self) -> Dict:
+        """Rows queued, committed and replayed by this process"""
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending) if self._pid == os.getpid() else 0}
+    
+    def stop(self) -> None:
+        """Flush remaining rows and stop the background committer"""
+        self._stop.set()
+        self._wakeup.set()
+        self.flush()
+    
+    def _ensure_started(self) -> None:
+        """Open this process's journal and start the committer (neither survives Gunicorn's fork)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Rows inherited from the parent are still the parent's to commit
+            self._pid = os.getpid()
+            self._token = uuid.uuid4().hex[:12]
+            self._seq = 0
+            self._pending = {}
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self._journal = open(self._journal_path(), 'a')
+            self._stop.clear()
+        threading.Thread(target=self._run, name='audit-writer', daemon=True).start()
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f'Audit writer flush failed: {e}')
+            
+            # Workers killed by Gunicorn's timeout leave journals that no restart will replay
+            if time.monotonic() - self._last_replay >= self.replay_interval:
+                self._last_replay = time.monotonic()
+                try:
+                    self.replay_journals()
+                except Exception as e:
+                    logger.error(f'Audit journal replay failed: {e}')
+    
+    def _is_live(self, pid: int, token: Optional[str]) -> bool:
+        """Whether a journal still belongs to a running process"""
+        if pid == os.getpid():
+            # Same PID but another token is a crashed predecessor whose PID this process inherited
+            return token is not None and token == self._token and self._pid == pid
+        return _is_running(pid)
+    
+    def _journal_path(self) -> str:
+        return os.path.join(self.journal_dir, f'audits_{self._pid}-{self._token}.jsonl')
+    
+    def _sync_journal(self) -> None:
+        """Push journal writes to the OS, and to disk when fsync is on so they survive a power loss"""
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+    
+    def _rotate_journal(self) -> str:
+        """Move the current journal aside for the commit in progress (caller holds _lock)"""
+        self._seq += 1
+        committing = os.path.join(self.journal_dir, f'audits_{self._pid}-{self._token}.{self._seq}.flushing')
+        self._journal.close()
+        os.replace(self._journal_path(), committing)
+        self._journal = open(self._journal_path(), 'a')
+        return committing
+    
+    def _restore(self, committing: str) -> None:
+        """Fold a failed commit's journal back into the live one"""
+        with self._lock:
+            with open(committing) as f:
+                self._journal.write(f.read())
+            self._sync_journal()
+        os.remove(committing)
+
+def _is_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -1,16 +1,45 @@
 # File: models/database.py
 # Database models and operations for SQLite
 
-import sqlite3
+import os
+import re
 import json
-from datetime import datetime
-from config.settings import DATABASE_PATH
+import time
+import zlib
+import uuid
+import atexit
+import hashlib
+from config.settings import (
+    DATABASE_PATH, AUDIT_WRITE_BEHIND, AUDIT_FLUSH_INTERVAL_MS, AUDIT_FLUSH_BATCH, AUDIT_JOURNAL_DIR,
+    AUDIT_JOURNAL_FSYNC, AUDIT_JOURNAL_REPLAY_INTERVAL, ARCHIVE_DATABASE_PATH
+)
+from models.connection import connections
+from models.audit_writer import AuditWriter
+from utils.helpers import canonicalize_url, get_domain
+
+def get_connection():
+    """This thread's connection to the app database"""
+    return connections.get(DATABASE_PATH)
+
+def transaction():
+    """Write transaction on this thread's connection"""
+    return connections.transaction(DATABASE_PATH)
+
+def check_database_health() -> dict:
+    """Health of this thread's database connection"""
+    return connections.check_health(DATABASE_PATH)
 
 def init_database():
     """Initialize SQLite database for storing leads and audit results"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
+    with transaction() as conn:
+        init_audits(conn.cursor())
+        init_audit_blobs(conn.cursor())
+        init_rollups(conn.cursor())
+        init_report_index(conn.cursor())
+        init_email_outbox(conn.cursor())
+
+def init_audits(cursor):
+    """Create the audits table"""
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS audits (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -22,32 +51,666 @@ def init_database():
             performance_score INTEGER,
             accessibility_score INTEGER,
             audit_data TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            report_id TEXT,
+            domain TEXT,
+            blob_hash TEXT
+        )
+    ''')
+    
+    # Databases created before report links and history lookups lack these columns
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(audits)')]
+    if 'report_id' not in columns:
+        cursor.execute('ALTER TABLE audits ADD COLUMN report_id TEXT')
+    if 'domain' not in columns:
+        cursor.execute('ALTER TABLE audits ADD COLUMN domain TEXT')
+    if 'blob_hash' not in columns:
+        cursor.execute('ALTER TABLE audits ADD COLUMN blob_hash TEXT')
+    rows = cursor.execute('SELECT id, url FROM audits WHERE domain IS NULL').fetchall()
+    cursor.executemany('UPDATE audits SET domain = ? WHERE id = ?', [(get_domain(url), audit_id) for audit_id, url in rows])
+    
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_audits_report_id ON audits (report_id)')
+    # (column, id) indexes serve history lookups and their keyset pagination from the index alone
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_url ON audits (url, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_email ON audits (email COLLATE NOCASE, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_domain ON audits (domain, id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_created_at ON audits (created_at)')
+    # Lets archiving find blobs no remaining audit shares
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_audits_blob_hash ON audits (blob_hash)')
+
+def init_audit_blobs(cursor):
+    """Create the side table of compressed audit data, shared by audits with identical results"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_blobs (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # Move audit data still stored inline (rows from before the side table) out of the audits table
+    last_id = 0
+    while True:
+        rows = cursor.execute(
+            'SELECT id, audit_data FROM audits WHERE id > ? AND audit_data IS NOT NULL ORDER BY id LIMIT 500',
+            (last_id,)
+        ).fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            'UPDATE audits SET blob_hash = ?, audit_data = NULL WHERE id = ?',
+            [(store_audit_blob(cursor, audit_json), audit_id) for audit_id, audit_json in rows]
+        )
+        last_id = rows[-1][0]
+
+def store_audit_blob(cursor, audit_json: str) -> str:
+    """Store compressed audit JSON once per distinct content, returning its hash"""
+    raw = audit_json.encode()
+    blob_hash = hashlib.sha256(raw).hexdigest()
+    cursor.execute(
+        'INSERT OR IGNORE INTO audit_blobs (hash, data, size, created_at) VALUES (?, ?, ?, ?)',
+        (blob_hash, zlib.compress(raw), len(raw), time.time())
+    )
+    return blob_hash
+
+def load_audit_json(row) -> str:
+    """Audit JSON from a row carrying either inline audit_data or its compressed blob"""
+    if row['audit_data'] is not None:
+        return row['audit_data']
+    if row['blob'] is not None:
+        return zlib.decompress(row['blob']).decode()
+    return None
+
+# Columns of the all_audits view: live audits and archived ones look the same to readers
+ARCHIVE_COLUMNS = (
+    'id', 'email', 'url', 'domain', 'overall_score', 'technical_score', 'content_score',
+    'performance_score', 'accessibility_score', 'created_at', 'report_id', 'audit_data', 'blob'
+)
+
+def get_archive_path() -> str:
+    """File holding the monthly archive tables"""
+    return ARCHIVE_DATABASE_PATH or os.path.splitext(DATABASE_PATH)[0] + '_archive.db'
+
+def attach_archive(conn, path: str):
+    """Attach the archive to app database connections and define the all_audits view spanning both"""
+    if path != DATABASE_PATH:
+        return
+    conn.execute('ATTACH DATABASE ? AS archive', (get_archive_path(),))
+    conn.execute('PRAGMA archive.journal_mode=WAL')
+    # Until the first month is archived the archive view is an empty row set
+    empty = ', '.join(f'NULL AS {column}' for column in ARCHIVE_COLUMNS)
+    conn.execute(f'CREATE VIEW IF NOT EXISTS archive.archived_audits AS SELECT {empty} WHERE 0')
+    
+    hot = ', '.join(f'a.{column}' for column in ARCHIVE_COLUMNS[:-1])
+    conn.execute(f'''
+        CREATE TEMP VIEW IF NOT EXISTS all_audits AS
+        SELECT {hot}, b.data AS blob FROM main.audits a LEFT JOIN main.audit_blobs b ON b.hash = a.blob_hash
+        UNION ALL
+        SELECT {', '.join(ARCHIVE_COLUMNS)} FROM archive.archived_audits
+    ''')
+
+connections.on_open(attach_archive)
 
-def save_audit_data(email: str, url: str, audit_data: dict):
-    """Save audit data to database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+def create_archive_table(month: str) -> str:
+    """Create the archive table for a YYYY-MM month and add it to the archive view"""
+    if not re.fullmatch(r'\d{4}-\d{2}', month):
+        raise ValueError(f'Invalid archive month: {month!r}')
+    table = f"audits_{month.replace('-', '_')}"
     
+    with transaction() as conn:
+        if conn.execute("SELECT 1 FROM archive.sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            return table
+        conn.execute(f'''
+            CREATE TABLE archive.{table} (
+                id INTEGER PRIMARY KEY,
+                email TEXT NOT NULL,
+                url TEXT NOT NULL,
+                domain TEXT,
+                overall_score INTEGER,
+                technical_score INTEGER,
+                content_score INTEGER,
+                performance_score INTEGER,
+                accessibility_score INTEGER,
+                created_at TIMESTAMP,
+                report_id TEXT,
+                audit_data TEXT,
+                blob BLOB
+            )
+        ''')
+        # Same lookups as the live table, so history and report links keep working once archived
+        conn.execute(f'CREATE UNIQUE INDEX archive.idx_{table}_report_id ON {table} (report_id)')
+        conn.execute(f'CREATE INDEX archive.idx_{table}_url ON {table} (url, id)')
+        conn.execute(f'CREATE INDEX archive.idx_{table}_email ON {table} (email COLLATE NOCASE, id)')
+        conn.execute(f'CREATE INDEX archive.idx_{table}_domain ON {table} (domain, id)')
+        
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM archive.sqlite_master WHERE type = 'table' AND name GLOB 'audits_[0-9]*' ORDER BY name"
+        )]
+        columns = ', '.join(ARCHIVE_COLUMNS)
+        conn.execute('DROP VIEW archive.archived_audits')
+        conn.execute('CREATE VIEW archive.archived_audits AS ' + ' UNION ALL '.join(
+            f'SELECT {columns} FROM {name}' for name in tables
+        ))
+    return table
+
+def archive_audits(cutoff: str, batch_size: int = 500) -> int:
+    """Move the oldest batch of audits created before cutoff (UTC timestamp) to the archive; returns rows moved"""
+    conn = get_connection()
+    rows = conn.execute('''
+        SELECT id, blob_hash, substr(created_at, 1, 7) AS month FROM audits
+        WHERE created_at < ? ORDER BY created_at LIMIT ?
+    ''', (cutoff, batch_size)).fetchall()
+    if not rows:
+        return 0
+    
+    months = {}
+    for row in rows:
+        months.setdefault(row['month'], []).append(row['id'])
+    hot = ', '.join(f'a.{column}' for column in ARCHIVE_COLUMNS[:-1])
+    for month, ids in months.items():
+        table = create_archive_table(month)
+        # Copied in its own commit before the delete: a crash in between leaves a duplicate the next run clears, never a lost audit
+        conn.execute(f'''
+            INSERT OR IGNORE INTO archive.{table} ({', '.join(ARCHIVE_COLUMNS)})
+            SELECT {hot}, b.data FROM audits a LEFT JOIN audit_blobs b ON b.hash = a.blob_hash
+            WHERE a.id IN ({', '.join('?' * len(ids))})
+        ''', ids)
+    
+    ids = [row['id'] for row in rows]
+    hashes = list({row['blob_hash'] for row in rows if row['blob_hash']})
+    with transaction() as conn:
+        conn.execute(f"DELETE FROM audits WHERE id IN ({', '.join('?' * len(ids))})", ids)
+        # Blobs still shared with live audits stay
+        if hashes:
+            conn.execute(f'''
+                DELETE FROM audit_blobs WHERE hash IN ({', '.join('?' * len(hashes))})
+                AND NOT EXISTS (SELECT 1 FROM audits WHERE blob_hash = audit_blobs.hash)
+            ''', hashes)
+    return len(rows)
+
+def has_incremental_vacuum() -> bool:
+    """Whether the app database can release free pages incrementally"""
+    return get_connection().execute('PRAGMA main.auto_vacuum').fetchone()[0] == 2
+
+def enable_incremental_vacuum() -> bool:
+    """Switch the app database to incremental auto-vacuum; returns True if it had to be rebuilt"""
+    if has_incremental_vacuum():
+        return False
+    # New databases start in this mode; older ones need a full VACUUM, which blocks writers while it
+    # rewrites the file, so this is a one-off step: python -m services.audit_archiver --enable-incremental-vacuum
+    conn = get_connection()
+    conn.execute('PRAGMA main.auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM main')
+    return True
+
+def vacuum_free_pages(max_pages: int) -> int:
+    """Return up to max_pages free pages to the filesystem (a no-op without incremental auto-vacuum)"""
+    conn = get_connection()
+    before = conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+    conn.execute(f'PRAGMA main.incremental_vacuum({int(max_pages)})').fetchall()
+    return before - conn.execute('PRAGMA main.freelist_count').fetchone()[0]
+
+# Rollup score columns: audits column -> category name used in reports
+ROLLUP_SCORES = {
+    'overall_score': 'overall',
+    'technical_score': 'technical_seo',
+    'content_score': 'content_quality',
+    'performance_score': 'ai_readiness',
+    'accessibility_score': 'voice_search'
+}
+
+def init_rollups(cursor):
+    """Create the per-day score rollups (overall, per industry, per domain) and catch them up"""
+    sums = ', '.join(f'{column}_sum INTEGER NOT NULL DEFAULT 0' for column in ROLLUP_SCORES)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS audit_rollups (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            day TEXT NOT NULL,
+            audits INTEGER NOT NULL DEFAULT 0,
+            {sums},
+            PRIMARY KEY (dimension, key, day)
+        ) WITHOUT ROWID
+    ''')
+    # Highest audit id already counted in the rollups
+    cursor.execute('CREATE TABLE IF NOT EXISTS rollup_state (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)')
+    update_rollups(cursor)
+
+def update_rollups(cursor, batch_size: int = 500) -> int:
+    """Fold audits newer than the watermark into the rollups; returns how many were added"""
+    row = cursor.execute("SELECT last_id FROM rollup_state WHERE name = 'audits'").fetchone()
+    last_id = row[0] if row else 0
+    added = 0
+    columns = ', '.join(f'a.{column}' for column in ROLLUP_SCORES)
+    sums = ', '.join(f'{column}_sum' for column in ROLLUP_SCORES)
+    updates = ', '.join(f'{column}_sum = {column}_sum + excluded.{column}_sum' for column in ROLLUP_SCORES)
+    
+    while True:
+        rows = cursor.execute(f'''
+            SELECT a.id, a.domain, date(a.created_at) AS day, {columns}, a.audit_data, b.data AS blob
+            FROM audits a LEFT JOIN audit_blobs b ON b.hash = a.blob_hash
+            WHERE a.id > ? ORDER BY a.id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        
+        totals = {}
+        for row in rows:
+            audit_data = json.loads(load_audit_json(row) or '{}')
+            industry = str(audit_data.get('industry') or 'unknown').strip().lower()[:64]
+            for bucket in (('all', '', row['day']), ('industry', industry, row['day']), ('domain', row['domain'] or '', row['day'])):
+                total = totals.setdefault(bucket, [0] * (len(ROLLUP_SCORES) + 1))
+                total[0] += 1
+                for i, column in enumerate(ROLLUP_SCORES, 1):
+                    total[i] += row[column] or 0
+        
+        cursor.executemany(f'''
+            INSERT INTO audit_rollups (dimension, key, day, audits, {sums})
+            VALUES (?, ?, ?, {', '.join('?' * (len(ROLLUP_SCORES) + 1))})
+            ON CONFLICT (dimension, key, day) DO UPDATE SET audits = audits + excluded.audits, {updates}
+        ''', [bucket + tuple(total) for bucket, total in totals.items()])
+        
+        last_id = rows[-1]['id']
+        added += len(rows)
+    
+    cursor.execute(
+        "INSERT INTO rollup_state (name, last_id) VALUES ('audits', ?) ON CONFLICT (name) DO UPDATE SET last_id = excluded.last_id",
+        (last_id,)
+    )
+    return added
+
+def init_report_index(cursor):
+    """Create the index of rendered PDF files in reports/"""
     cursor.execute('''
-        INSERT INTO audits (email, url, overall_score, technical_score, content_score, 
-                          performance_score, accessibility_score, audit_data)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        email,
-        url,
-        audit_data.get('overall_score', 0),
-        audit_data.get('category_scores', {}).get('technical_seo', 0),
-        audit_data.get('category_scores', {}).get('content_quality', 0),
-        audit_data.get('category_scores', {}).get('ai_readiness', 0),
-        audit_data.get('category_scores', {}).get('voice_search', 0),
-        json.dumps(audit_data)
-    ))
-    
-    conn.commit()
-    conn.close()
\ No newline at end of file
+        CREATE TABLE IF NOT EXISTS report_files (
+            filename TEXT PRIMARY KEY,
+            url TEXT,
+            report_hash TEXT,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_accessed REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_report_files_accessed ON report_files (last_accessed)')
+
+def init_email_outbox(cursor):
+    """Create the durable queue of outgoing emails"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            attachment_path TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            lease_until REAL,
+            last_error TEXT,
+            provider_id TEXT,
+            created_at REAL NOT NULL,
+            sent_at REAL,
+            dedup_key TEXT,
+            digest_key TEXT,
+            digest_html TEXT
+        )
+    ''')
+    
+    # Outboxes created before duplicate suppression and digests lack these columns
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(email_outbox)')]
+    for column in ('dedup_key', 'digest_key', 'digest_html'):
+        if column not in columns:
+            cursor.execute(f'ALTER TABLE email_outbox ADD COLUMN {column} TEXT')
+    
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_recipient ON email_outbox (recipient)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_dedup ON email_outbox (dedup_key, created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_outbox_digest ON email_outbox (digest_key, status, next_attempt_at)')
+    # Next free provider request slot, shared by the dispatchers of every worker
+    cursor.execute('CREATE TABLE IF NOT EXISTS email_send_pacing (name TEXT PRIMARY KEY, next_at REAL NOT NULL)')
+
+def get_audit_timestamp() -> str:
+    """Audit time as stored in created_at (UTC, like CURRENT_TIMESTAMP)"""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+
+def save_audit_data(email: str, url: str, audit_data: dict, report_id: str = None, created_at: str = None) -> str:
+    """Save audit data to database, returning the public report id"""
+    report_id = report_id or uuid.uuid4().hex
+    row = {
+        'email': email,
+        'url': canonicalize_url(url),
+        'domain': get_domain(url),
+        'overall_score': audit_data.get('overall_score', 0),
+        'technical_score': audit_data.get('category_scores', {}).get('technical_seo', 0),
+        'content_score': audit_data.get('category_scores', {}).get('content_quality', 0),
+        'performance_score': audit_data.get('category_scores', {}).get('ai_readiness', 0),
+        'accessibility_score': audit_data.get('category_scores', {}).get('voice_search', 0),
+        # Sorted keys so identical results hash to the same blob
+        'audit_data': json.dumps(audit_data, sort_keys=True),
+        'report_id': report_id,
+        # Set here rather than by SQLite so a delayed commit keeps the audit time
+        'created_at': created_at or get_audit_timestamp()
+    }
+    
+    if AUDIT_WRITE_BEHIND:
+        # Journaled now, committed with the next group so the request doesn't wait on the write
+        audit_writer.add(row)
+    else:
+        insert_audit_rows([row])
+    return report_id
+
+def insert_audit_rows(rows: list):
+    """Insert audit rows in one transaction; report ids that are already stored are skipped"""
+    # Rows journaled before the domain column existed get it filled in here
+    rows = [{**row, 'domain': row.get('domain') or get_domain(row['url'])} for row in rows]
+    with transaction() as conn:
+        cursor = conn.cursor()
+        # The audit data goes to the blob table; the audits row keeps only its hash
+        rows = [{**row, 'blob_hash': store_audit_blob(cursor, row['audit_data'])} for row in rows]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO audits (email, url, domain, overall_score, technical_score, content_score,
+                                          performance_score, accessibility_score, blob_hash, report_id, created_at)
+            VALUES (:email, :url, :domain, :overall_score, :technical_score, :content_score,
+                    :performance_score, :accessibility_score, :blob_hash, :report_id, :created_at)
+        ''', rows)
+        # Same transaction, so the rollups never count a row twice or miss one
+        update_rollups(cursor)
+
+def _audit_from_row(row: dict) -> dict:
+    """Audit as returned by get_audit_by_report_id, from a row that is not committed yet"""
+    audit = {key: row[key] for key in ('url', 'overall_score', 'audit_data', 'created_at', 'report_id')}
+    audit['audit_data'] = json.loads(audit['audit_data'] or '{}')
+    return audit
+
+def get_audit_by_report_id(report_id: str) -> dict:
+    """Get a stored audit by its public report id, or None"""
+    # Audits saved by this process may still be waiting for their group commit
+    pending = audit_writer.get_pending(report_id)
+    if pending:
+        return _audit_from_row(pending)
+    
+    # all_audits also covers archived audits, so old report links keep resolving
+    query = '''
+        SELECT url, overall_score, audit_data, blob, created_at, report_id
+        FROM all_audits WHERE report_id = ?
+    '''
+    row = get_connection().execute(query, (report_id,)).fetchone()
+    if row is None:
+        # Saved by another worker (or a dead one) and not committed yet: read it from the journal
+        journaled = audit_writer.find_journaled(report_id)
+        if journaled:
+            return _audit_from_row(journaled)
+        # The commit may have landed while the journals were being read
+        row = get_connection().execute(query, (report_id,)).fetchone()
+    if row is None:
+        return None
+    
+    audit = {key: row[key] for key in ('url', 'overall_score', 'created_at', 'report_id')}
+    audit['audit_data'] = json.loads(load_audit_json(row) or '{}')
+    return audit
+
+def get_recent_popular_audits(max_age_seconds: int, limit: int = 100) -> list:
+    """Get the latest audit per URL, most frequently then most recently audited first"""
+    cursor = get_connection().execute('''
+        SELECT a.id, a.url, a.audit_data, b.data AS blob, a.created_at, a.report_id, counts.audit_count
+        FROM (
+            SELECT url, COUNT(*) AS audit_count, MAX(id) AS latest_id
+            FROM audits
+            WHERE created_at >= datetime('now', ?)
+            GROUP BY url
+        ) AS counts
+        JOIN audits a ON a.id = counts.latest_id
+        LEFT JOIN audit_blobs b ON b.hash = a.blob_hash
+        ORDER BY counts.audit_count DESC, a.created_at DESC
+        LIMIT ?
+    ''', (f'-{int(max_age_seconds)} seconds', limit))
+    
+    audits = []
+    for row in cursor.fetchall():
+        audit = {key: row[key] for key in ('id', 'url', 'created_at', 'report_id', 'audit_count')}
+        audit['audit_data'] = load_audit_json(row)
+        audits.append(audit)
+    return audits
+
+# History lookups: query parameter -> WHERE condition
+HISTORY_FILTERS = {
+    'url': 'a.url = ?',
+    'email': 'a.email = ? COLLATE NOCASE',
+    'domain': 'a.domain = ?'
+}
+HISTORY_COLUMNS = (
+    'id', 'report_id', 'url', 'domain', 'overall_score', 'technical_score', 'content_score',
+    'performance_score', 'accessibility_score', 'created_at'
+)
+
+def get_audit_history(field: str, value: str, limit: int = 20, before_id: int = None, full: bool = False) -> list:
+    """Audits for a URL, email or domain, newest first, starting below before_id (keyset pagination)"""
+    if field == 'url':
+        value = canonicalize_url(value)
+    elif field == 'domain':
+        value = get_domain(value)
+    
+    columns = ', '.join(f'a.{column}' for column in HISTORY_COLUMNS)
+    if full:
+        # Only full listings read audit data; all_audits spans the archive too
+        query = f'SELECT {columns}, a.audit_data, a.blob FROM all_audits a WHERE {HISTORY_FILTERS[field]}'
+    else:
+        query = f'SELECT {columns} FROM all_audits a WHERE {HISTORY_FILTERS[field]}'
+    params = [value]
+    if before_id is not None:
+        query += ' AND a.id < ?'
+        params.append(before_id)
+    query += ' ORDER BY a.id DESC LIMIT ?'
+    params.append(limit)
+    
+    rows = []
+    for row in get_connection().execute(query, params):
+        audit = {column: row[column] for column in HISTORY_COLUMNS}
+        if full:
+            audit['audit_data'] = json.loads(load_audit_json(row) or '{}')
+        rows.append(audit)
+    return rows
+
+def get_rollup_series(dimension: str, key: str, since_day: str) -> list:
+    """Daily rollup rows for one dimension key since since_day (YYYY-MM-DD), oldest first"""
+    rows = get_connection().execute('''
+        SELECT * FROM audit_rollups WHERE dimension = ? AND key = ? AND day >= ? ORDER BY day
+    ''', (dimension, key, since_day)).fetchall()
+    return [_rollup_averages(row, {'day': row['day']}) for row in rows]
+
+def get_rollup_totals(dimension: str, since_day: str, limit: int = 50) -> list:
+    """Rollups summed per key of a dimension since since_day, most audited first"""
+    sums = ', '.join(f'SUM({column}_sum) AS {column}_sum' for column in ROLLUP_SCORES)
+    rows = get_connection().execute(f'''
+        SELECT key, SUM(audits) AS audits, {sums} FROM audit_rollups
+        WHERE dimension = ? AND day >= ?
+        GROUP BY key ORDER BY audits DESC LIMIT ?
+    ''', (dimension, since_day, limit)).fetchall()
+    return [_rollup_averages(row, {dimension: row['key']}) for row in rows]
+
+def _rollup_averages(row, result: dict) -> dict:
+    count = row['audits']
+    result['audits'] = count
+    result['average_scores'] = {
+        name: round(row[f'{column}_sum'] / count, 1) if count else None
+        for column, name in ROLLUP_SCORES.items()
+    }
+    return result
+
+def record_report_file(filename: str, url: str, report_hash: str, size: int, created_at: float = None):
+    """Add or replace a report file in the index"""
+    now = created_at or time.time()
+    conn = get_connection()
+    conn.execute('''
+        INSERT OR REPLACE INTO report_files (filename, url, report_hash, size, created_at, last_accessed, hits)
+        VALUES (?, ?, ?, ?, ?, ?, 0)
+    ''', (filename, url, report_hash, size, now, now))
+
+def get_report_file(filename: str) -> dict:
+    """Index entry for a report file, or None"""
+    conn = get_connection()
+    row = conn.execute('SELECT * FROM report_files WHERE filename = ?', (filename,)).fetchone()
+    return dict(row) if row else None
+
+def touch_report_file(filename: str, min_interval: int = 60):
+    """Mark a report as used; skips the write if it was touched in the last min_interval seconds"""
+    now = time.time()
+    conn = get_connection()
+    conn.execute('''
+        UPDATE report_files SET last_accessed = ?, hits = hits + 1
+        WHERE filename = ? AND last_accessed < ?
+    ''', (now, filename, now - min_interval))
+
+def get_report_files() -> list:
+    """All indexed report files, least recently used first"""
+    conn = get_connection()
+    rows = [dict(row) for row in conn.execute('SELECT * FROM report_files ORDER BY last_accessed ASC')]
+    return rows
+
+def delete_report_files(filenames: list):
+    """Remove report files from the index"""
+    if not filenames:
+        return
+    conn = get_connection()
+    conn.executemany('DELETE FROM report_files WHERE filename = ?', [(name,) for name in filenames])
+
+def get_report_file_stats() -> dict:
+    """Count and total size of indexed report files"""
+    conn = get_connection()
+    count, total_bytes, hits = conn.execute(
+        'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM report_files'
+    ).fetchone()
+    return {'files': count, 'total_bytes': total_bytes, 'hits': hits}
+
+def enqueue_email(recipient: str, subject: str, html: str, attachment_path: str = None,
+                  dedup_key: str = None, dedup_window: int = 0,
+                  digest_html: str = None, digest_window: int = 0, digest_max: int = 0) -> int:
+    """Add an email to the outbox, returning its id (or the id of a recent duplicate)"""
+    now = time.time()
+    # One write transaction so concurrent requests can't both pass the duplicate check
+    with transaction() as conn:
+        if dedup_key and dedup_window > 0:
+            row = conn.execute('''
+                SELECT id FROM email_outbox
+                WHERE dedup_key = ? AND created_at > ? AND status != 'failed'
+                ORDER BY id DESC LIMIT 1
+            ''', (dedup_key, now - dedup_window)).fetchone()
+            if row:
+                return row[0]
+        
+        # Digest emails wait for the window so later reports for the recipient can join them
+        send_at, digest_key = now, None
+        if digest_html is not None and digest_window > 0:
+            digest_key = recipient.lower()
+            row = conn.execute('''
+                SELECT next_attempt_at, COUNT(*) FROM email_outbox
+                WHERE digest_key = ? AND status = 'pending' AND next_attempt_at > ?
+                GROUP BY next_attempt_at ORDER BY next_attempt_at DESC LIMIT 1
+            ''', (digest_key, now)).fetchone()
+            if row and (digest_max <= 0 or row[1] < digest_max):
+                send_at = row[0]
+            else:
+                send_at = now + digest_window
+        
+        cursor = conn.execute('''
+            INSERT INTO email_outbox (recipient, subject, html, attachment_path, next_attempt_at, created_at,
+                                      dedup_key, digest_key, digest_html)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (recipient, subject, html, attachment_path, send_at, now, dedup_key, digest_key, digest_html))
+        return cursor.lastrowid
+
+def find_recent_email(dedup_key: str, window: int) -> int:
+    """Id of an email with this dedup key queued or sent in the last window seconds, or None"""
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT id FROM email_outbox
+        WHERE dedup_key = ? AND created_at > ? AND status != 'failed'
+        ORDER BY id DESC LIMIT 1
+    ''', (dedup_key, time.time() - window)).fetchone()
+    return row[0] if row else None
+
+def claim_due_emails(limit: int, lease_seconds: int) -> list:
+    """Lease due emails to this dispatcher; expired leases from crashed workers are reclaimed"""
+    now = time.time()
+    with transaction() as conn:
+        rows = [dict(row) for row in conn.execute('''
+            SELECT * FROM email_outbox
+            WHERE (status = 'pending' AND next_attempt_at <= ?)
+               OR (status = 'sending' AND lease_until < ?)
+            ORDER BY next_attempt_at
+            LIMIT ?
+        ''', (now, now, limit))]
+        conn.executemany(
+            "UPDATE email_outbox SET status = 'sending', lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+            [(now + lease_seconds, row['id']) for row in rows]
+        )
+    for row in rows:
+        row['attempts'] += 1
+    return rows
+
+def mark_email_sent(email_id: int, provider_id: str = None):
+    """Record a successful send"""
+    conn = get_connection()
+    conn.execute('''
+        UPDATE email_outbox SET status = 'sent', provider_id = ?, sent_at = ?, lease_until = NULL, last_error = NULL
+        WHERE id = ?
+    ''', (provider_id, time.time(), email_id))
+
+def reschedule_email(email_id: int, delay: float, error: str):
+    """Put an email back in the queue after a failed attempt"""
+    conn = get_connection()
+    conn.execute('''
+        UPDATE email_outbox SET status = 'pending', next_attempt_at = ?, lease_until = NULL, last_error = ?
+        WHERE id = ?
+    ''', (time.time() + delay, error, email_id))
+
+def mark_email_failed(email_id: int, error: str):
+    """Give up on an email"""
+    conn = get_connection()
+    conn.execute(
+        "UPDATE email_outbox SET status = 'failed', lease_until = NULL, last_error = ? WHERE id = ?",
+        (error, email_id)
+    )
+
+def get_email_status(email_id: int) -> dict:
+    """Delivery status of an outbox email, or None"""
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT id, recipient, subject, status, attempts, next_attempt_at, last_error, provider_id, created_at, sent_at
+        FROM email_outbox WHERE id = ?
+    ''', (email_id,)).fetchone()
+    return dict(row) if row else None
+
+def reserve_send_slot(interval: float, name: str = 'resend') -> float:
+    """Claim the next provider request slot across all processes; returns seconds to wait for it"""
+    now = time.time()
+    with transaction() as conn:
+        row = conn.execute('SELECT next_at FROM email_send_pacing WHERE name = ?', (name,)).fetchone()
+        slot = max(now, row['next_at'] if row else 0)
+        conn.execute(
+            'INSERT INTO email_send_pacing (name, next_at) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET next_at = excluded.next_at',
+            (name, slot + interval)
+        )
+    return slot - now
+
+def pause_send_slots(until: float, name: str = 'resend'):
+    """Hold every dispatcher's provider requests until a timestamp (after a 429)"""
+    get_connection().execute('''
+        INSERT INTO email_send_pacing (name, next_at) VALUES (?, ?)
+        ON CONFLICT (name) DO UPDATE SET next_at = MAX(next_at, excluded.next_at)
+    ''', (name, until))
+
+def get_outbox_stats() -> dict:
+    """Outbox email counts by status"""
+    conn = get_connection()
+    counts = dict(conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall())
+    return {status: counts.get(status, 0) for status in ('pending', 'sending', 'sent', 'failed')}
+
+# Global write-behind buffer for audits, flushed when the process exits
+audit_writer = AuditWriter(
+    lambda rows: insert_audit_rows(rows), AUDIT_JOURNAL_DIR, AUDIT_FLUSH_INTERVAL_MS / 1000, AUDIT_FLUSH_BATCH,
+    fsync=AUDIT_JOURNAL_FSYNC, replay_interval=AUDIT_JOURNAL_REPLAY_INTERVAL
+)
+atexit.register(audit_writer.stop)
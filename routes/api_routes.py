@@ -3,12 +3,28 @@
 
 import os
 import time
-import threading
+from datetime import datetime, timedelta, timezone
 from typing import Dict  # ADD THIS LINE - THIS IS THE FIX
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response
 from services.seo_auditor import SEOAuditor
 from services.cache_service import cache
-from utils.helpers import clean_url, is_valid_email, is_valid_url
+from services.cache_warmer import cache_warmer
+from services.email_outbox import email_outbox
+from services.report_cache import (
+    cleanup_reports, get_report_etag, get_report_hash, get_report_path, lookup_report, get_report_store_stats,
+    verify_report_link
+)
+from services.render_pool import is_rendering, get_pool_stats, submit_render
+from services.report_view import build_report_view, render_report_html
+from models.database import (
+    get_audit_by_report_id, get_audit_history, get_rollup_series, get_rollup_totals, HISTORY_FILTERS
+)
+from config.settings import (
+    REPORTS_DIR, REPORT_DOWNLOAD_MAX_AGE, REPORT_ACCEL_REDIRECT, REPORT_ACCEL_PREFIX, RENDER_TIMEOUT,
+    BATCH_MAX_SITES, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, STATS_MAX_DAYS
+)
+from utils.helpers import clean_url, get_domain, is_valid_email, is_valid_url
+from utils.auth import admin_required
 from utils.rate_limiter import rate_limit, email_rate_limit
 from utils.logging_config import log_audit_request, log_audit_completion, log_error
 
@@ -61,13 +77,15 @@ def run_audit():
         try:
             cached_result = cache.get(url)
             if cached_result:
-                # Still send email with cached results
+                # Still send email with cached results (rendered and sent off the request path)
+                email_status = 'queued'
                 try:
-                    threading.Thread(
-                        target=lambda: auditor.send_cached_report(email, cached_result, url)
-                    ).start()
+                    sending = auditor.send_cached_report(email, cached_result, url)
+                    # Resolved to a falsy result straight away: skipped as a duplicate or failed to queue
+                    if sending.done() and not sending.result():
+                        email_status = 'skipped'
                 except:
-                    pass  # Don't fail if email threading fails
+                    email_status = 'failed'  # Don't fail if queueing the email fails
                 
                 duration = time.time() - start_time
                 
@@ -80,12 +98,31 @@ def run_audit():
                 return jsonify({
                     **cached_result,
                     'cached': True,
-                    'email_sent': True
+                    'email_sent': False,
+                    'email_status': email_status
                 })
         except Exception as e:
             print(f"Cache check error (non-fatal): {e}")
             # Continue with fresh audit if cache fails
         
+        # Don't hammer sites that failed recently - report when to retry instead
+        try:
+            failure = cache.get_failure(url)
+            if failure:
+                response = jsonify({
+                    'success': False,
+                    'error': f"This site recently failed to load ({failure['error_type']}). "
+                             f"Please retry in {failure['retry_in']} seconds.",
+                    'error_type': failure['error_type'],
+                    'retry_in': failure['retry_in']
+                })
+                if failure['error_type'] == 'http_4xx':
+                    return response, 400  # the page itself is missing or refused, not a transient error
+                response.headers['Retry-After'] = str(failure['retry_in'])
+                return response, 503
+        except Exception as e:
+            print(f"Negative cache check error (non-fatal): {e}")
+        
         # Run fresh audit
         try:
             result = auditor.run_full_audit(url, email)
@@ -110,10 +147,20 @@ def run_audit():
             except:
                 pass
             
-            return jsonify({
+            error_response = {
                 'success': False,
                 'error': result.get('error', 'Audit failed. Please check the URL and try again.')
-            }), 400
+            }
+            if result.get('retry_in'):
+                error_response['error_type'] = result.get('error_type')
+                error_response['retry_in'] = result['retry_in']
+            if result.get('retry_in') and result.get('error_type') != 'http_4xx':
+                # A transient fetch failure (now negatively cached): same answer as the pre-check above
+                response = jsonify(error_response)
+                response.headers['Retry-After'] = str(result['retry_in'])
+                return response, 503
+            # Bad input, or a page the site refuses or doesn't have: retrying won't help
+            return jsonify(error_response), 400
         
         # Cache successful results (wrapped)
         try:
@@ -150,9 +197,56 @@ def run_audit():
             'error': 'An unexpected error occurred. Please try again.'
         }), 500
 
+@api_bp.route('/audit/batch', methods=['POST'])
+@rate_limit(limit=10, window=3600, per='ip')  # each batch runs several audits
+@email_rate_limit(limit=3, window=3600)
+def run_batch_audit():
+    """Audit a client site plus competitors and email one comparison report"""
+    start_time = time.time()
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        email = str(data.get('email', '')).strip()
+        urls = data.get('urls')
+        
+        if not email or not is_valid_email(email):
+            return jsonify({'success': False, 'error': 'A valid email is required'}), 400
+        
+        if not isinstance(urls, list) or not 2 <= len(urls) <= BATCH_MAX_SITES:
+            return jsonify({
+                'success': False,
+                'error': f'Provide between 2 and {BATCH_MAX_SITES} URLs, your site first'
+            }), 400
+        
+        cleaned = []
+        for url in urls:
+            url = clean_url(str(url).strip())
+            if not is_valid_url(url):
+                return jsonify({'success': False, 'error': f'Invalid URL format: {url}'}), 400
+            if url not in cleaned:
+                cleaned.append(url)
+        
+        try:
+            log_audit_request(','.join(cleaned), email, request.remote_addr)
+        except Exception as e:
+            print(f"Logging error (non-fatal): {e}")
+        
+        result = auditor.run_batch_audit(cleaned, email)
+        
+        try:
+            log_audit_completion(','.join(cleaned), email, result['sites'][0].get('score') or 0, time.time() - start_time)
+        except:
+            pass
+        
+        return jsonify(result), 200 if result.get('success') else 400
+        
+    except Exception as e:
+        log_error('BATCH_AUDIT_EXCEPTION', str(e), {'email': data.get('email') if 'data' in locals() else None})
+        return jsonify({'success': False, 'error': 'Failed to complete batch audit. Please try again.'}), 500
+
 @api_bp.route('/download')
 def download_report():
-    """Download PDF report"""
+    """Download PDF report through a signed link (same expires/sig parameters as /reports/<filename>)"""
     try:
         path = request.args.get('path')
         if not path:
@@ -163,44 +257,269 @@ def download_report():
             return jsonify({'success': False, 'error': 'Invalid path'}), 400
             
         # Construct safe path
-        safe_path = os.path.join('reports', os.path.basename(path))
+        filename = os.path.basename(path)
+        safe_path = os.path.join(REPORTS_DIR, filename)
+        
+        # Same check as signed links: otherwise anyone holding a filename could fetch the report
+        if not verify_report_link(filename, request.args.get('expires'), request.args.get('sig')):
+            return jsonify({'success': False, 'error': 'Download link is invalid or has expired'}), 403
         
-        if not os.path.exists(safe_path):
+        # The report index answers most lookups; the filesystem is only checked on an index miss
+        if lookup_report(filename) is None and not os.path.exists(safe_path):
+            if is_rendering(filename):
+                # Report is still being rendered in the background
+                response = jsonify({'success': False, 'error': 'Report is still being generated', 'retry_in': 2})
+                response.headers['Retry-After'] = '2'
+                return response, 202
             return jsonify({'success': False, 'error': 'File not found'}), 404
         
-        return send_file(safe_path, as_attachment=True)
+        return send_report_file(safe_path)
+        
+    except FileNotFoundError:
+        # Indexed but deleted from disk; the next cleanup drops the stale entry
+        return jsonify({'success': False, 'error': 'File not found'}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Download failed'}), 500
+
+@api_bp.route('/reports/<filename>')
+def download_signed_report(filename):
+    """Download a report through a signed, expiring link from an email"""
+    try:
+        filename = os.path.basename(filename)
+        if not verify_report_link(filename, request.args.get('expires'), request.args.get('sig')):
+            return jsonify({'success': False, 'error': 'Download link is invalid or has expired'}), 403
+        
+        safe_path = os.path.join(REPORTS_DIR, filename)
+        if lookup_report(filename) is None and not os.path.exists(safe_path):
+            return jsonify({'success': False, 'error': 'Report is no longer available'}), 410
+        
+        return send_report_file(safe_path)
+        
+    except FileNotFoundError:
+        return jsonify({'success': False, 'error': 'Report is no longer available'}), 410
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Download failed'}), 500
+
+@api_bp.route('/audits')
+@admin_required
+def audit_history():
+    """Audit history for one url, email or domain, newest first, paged with ?before=<next_before> (admin endpoint)"""
+    try:
+        filters = [field for field in HISTORY_FILTERS if request.args.get(field)]
+        if len(filters) != 1:
+            return jsonify({'success': False, 'error': f'Exactly one of {", ".join(HISTORY_FILTERS)} is required'}), 400
+        field = filters[0]
+        
+        try:
+            limit = min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+            before_id = int(request.args['before']) if request.args.get('before') else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'limit and before must be integers'}), 400
+        if limit < 1:
+            return jsonify({'success': False, 'error': 'limit must be positive'}), 400
+        
+        full = request.args.get('fields') == 'full'
+        audits = get_audit_history(field, request.args[field], limit, before_id, full)
+        
+        return jsonify({
+            'success': True,
+            field: request.args[field],
+            'audits': audits,
+            # A full page means there may be more; pass this back as ?before= for the next one
+            'next_before': audits[-1]['id'] if len(audits) == limit else None
+        })
+        
+    except Exception as e:
+        log_error('AUDIT_HISTORY_FAILED', str(e), {'args': request.args.to_dict()})
+        return jsonify({'success': False, 'error': 'Failed to load audit history'}), 500
+
+@api_bp.route('/stats')
+def audit_stats():
+    """Daily audit counts and average scores from the rollups, overall or for one ?domain= / ?industry="""
+    try:
+        try:
+            days = max(1, min(int(request.args.get('days', 30)), STATS_MAX_DAYS))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'days must be an integer'}), 400
+        since_day = (datetime.now(timezone.utc).date() - timedelta(days=days - 1)).isoformat()
+        
+        # Rollups are pre-aggregated per day, so the cost depends on the window, not the audit history
+        response = {'success': True, 'days': days, 'since': since_day}
+        if request.args.get('domain'):
+            response['domain'] = get_domain(request.args['domain'])
+            response['daily'] = get_rollup_series('domain', response['domain'], since_day)
+        elif request.args.get('industry'):
+            response['industry'] = request.args['industry'].strip().lower()
+            response['daily'] = get_rollup_series('industry', response['industry'], since_day)
+        else:
+            response['daily'] = get_rollup_series('all', '', since_day)
+            response['industries'] = get_rollup_totals('industry', since_day)
+        return jsonify(response)
+        
+    except Exception as e:
+        log_error('STATS_FAILED', str(e), {'args': request.args.to_dict()})
+        return jsonify({'success': False, 'error': 'Failed to load stats'}), 500
+
+@api_bp.route('/report/<report_id>')
+def view_report(report_id):
+    """Report as JSON, or as an HTML page with ?format=html"""
+    try:
+        audit = get_audit_by_report_id(report_id)
+        if not audit:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+        
+        view = build_report_view(audit['audit_data'], audit['url'], audit['created_at'])
+        pdf_url = f'/api/report/{report_id}/pdf'
+        
+        # Stored audits never change, so the content hash is a stable validator
+        etag = get_report_hash(audit['audit_data'], audit['url'])
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        elif request.args.get('format') == 'html':
+            response = Response(render_report_html(view, pdf_url), mimetype='text/html')
+        else:
+            response = jsonify({'success': True, 'report_id': report_id, 'pdf_url': pdf_url, **view})
+        
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = REPORT_DOWNLOAD_MAX_AGE
+        return response
+        
+    except Exception as e:
+        log_error('REPORT_VIEW_FAILED', str(e), {'report_id': report_id})
+        return jsonify({'success': False, 'error': 'Failed to load report'}), 500
+
+@api_bp.route('/report/<report_id>/pdf')
+def download_report_pdf(report_id):
+    """Download the PDF for a report, rendering it on first request"""
+    try:
+        audit = get_audit_by_report_id(report_id)
+        if not audit:
+            return jsonify({'success': False, 'error': 'Report not found'}), 404
+        
+        filepath = get_report_path(audit['audit_data'], audit['url'], audit['created_at'])
+        if lookup_report(os.path.basename(filepath)) is None and not os.path.exists(filepath):
+            # First download: render in the pool, then cache like any other report
+            website_data = {'url': audit['url'], 'audit_date': audit['created_at']}
+            try:
+                filepath = submit_render(audit['audit_data'], website_data).result(timeout=RENDER_TIMEOUT)
+            except Exception as e:
+                log_error('REPORT_RENDER_FAILED', str(e), {'report_id': report_id})
+                filepath = None
+            if not filepath:
+                response = jsonify({'success': False, 'error': 'Report could not be generated, please retry', 'retry_in': 5})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+        
+        return send_report_file(filepath)
         
     except Exception as e:
         return jsonify({'success': False, 'error': 'Download failed'}), 500
 
+def send_report_file(filepath: str):
+    """Send a report PDF with a strong ETag and immutable caching, via nginx when configured"""
+    filename = os.path.basename(filepath)
+    
+    # Report files never change once written, so clients may cache them indefinitely
+    etag = get_report_etag(filepath)
+    
+    if REPORT_ACCEL_REDIRECT:
+        # Validate here, let nginx stream the bytes (see /protected-reports/ in deploy/nginx.config)
+        response = Response(mimetype='application/pdf')
+        response.set_etag(etag)
+        if request.if_none_match.contains(etag):
+            response.status_code = 304
+        else:
+            response.headers['X-Accel-Redirect'] = f'{REPORT_ACCEL_PREFIX.rstrip("/")}/{filename}'
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    else:
+        # conditional=True answers If-None-Match with 304 and serves Range requests
+        response = send_file(
+            filepath, as_attachment=True, conditional=True,
+            etag=etag, max_age=REPORT_DOWNLOAD_MAX_AGE
+        )
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = REPORT_DOWNLOAD_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+@api_bp.route('/email/<int:email_id>')
+def email_status(email_id):
+    """Delivery status of a queued report email"""
+    try:
+        status = email_outbox.get_status(email_id)
+        if not status:
+            return jsonify({'success': False, 'error': 'Email not found'}), 404
+        status.pop('recipient', None)  # ids are guessable, don't expose addresses
+        return jsonify({'success': True, **status})
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to get email status'}), 500
+
+@api_bp.route('/email/stats')
+def email_stats():
+    """Outbox counts by delivery status"""
+    try:
+        return jsonify({'success': True, 'outbox': email_outbox.get_stats()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to get email stats'}), 500
+
 @api_bp.route('/cache/stats')
 def cache_stats():
     """Get cache statistics"""
     try:
         stats = cache.get_cache_stats()
+        stats['render_pool'] = get_pool_stats()
+        stats['reports'] = get_report_store_stats()
         return jsonify(stats)
     except Exception as e:
         return jsonify({'success': False, 'error': 'Failed to get cache stats'}), 500
 
 @api_bp.route('/cache/clear', methods=['POST'])
+@admin_required
 def clear_cache():
     """Clear cache (admin endpoint)"""
     try:
-        # TODO: Add authentication check here
         cleared = cache.clear()
         return jsonify({'success': True, 'cleared_items': cleared})
     except Exception as e:
         return jsonify({'success': False, 'error': 'Failed to clear cache'}), 500
 
 @api_bp.route('/cache/cleanup', methods=['POST'])
+@admin_required
 def cleanup_cache():
-    """Remove expired cache entries"""
+    """Remove expired cache entries and stale rendered reports (admin endpoint)"""
     try:
         removed = cache.cleanup_expired()
-        return jsonify({'success': True, 'removed_expired': removed})
+        reports = cleanup_reports()
+        return jsonify({'success': True, 'removed_expired': removed, 'reports': reports})
     except Exception as e:
         return jsonify({'success': False, 'error': 'Failed to cleanup cache'}), 500
 
+@api_bp.route('/cache/warm', methods=['POST'])
+@admin_required
+def warm_cache():
+    """Start repopulating the cache from audit history (admin endpoint)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        limit = data.get('limit')
+        started = cache_warmer.start(limit=int(limit) if limit else None)
+        return jsonify({
+            'success': True,
+            'started': started,
+            'status': cache_warmer.get_status()
+        }), 202 if started else 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to start cache warm-up'}), 500
+
+@api_bp.route('/cache/warm', methods=['GET'])
+def warm_cache_status():
+    """Get cache warm-up progress"""
+    try:
+        return jsonify({'success': True, 'status': cache_warmer.get_status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': 'Failed to get warm-up status'}), 500
+
 # Error handlers for the blueprint
 @api_bp.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,118 @@
+# File: services/audit_archiver.py
+# Moves old audits out of the hot database into monthly archive tables and gives the space back
+
+import time
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any
+from config.settings import (
+    ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_BATCH_PAUSE_MS, ARCHIVE_INTERVAL, ARCHIVE_VACUUM_PAGES
+)
+from models.database import archive_audits, enable_incremental_vacuum, has_incremental_vacuum, vacuum_free_pages
+from utils.process_lock import hold_lock
+
+logger = logging.getLogger(__name__)
+
+class AuditArchiver:
+    """Background job that archives audits in small batches, then runs incremental vacuum"""
+    
+    def __init__(self, max_age_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE,
+                 pause=ARCHIVE_BATCH_PAUSE_MS / 1000, interval=ARCHIVE_INTERVAL, vacuum_pages=ARCHIVE_VACUUM_PAGES):
+        self.max_age_days = max_age_days
+        self.batch_size = max(1, batch_size)
+        self.pause = pause
+        self.interval = interval
+        self.vacuum_pages = max(1, vacuum_pages)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._status = {'state': 'idle', 'runs': 0}
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Get the outcome of the current or last archive run"""
+        with self._lock:
+            return dict(self._status)
+    
+    def _update_status(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+    
+    def start(self) -> bool:
+        """Archive every interval in the background, returns False if already running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='audit-archiver', daemon=True)
+            self._thread.start()
+            return True
+    
+    def stop(self):
+        """Stop after the batch in progress"""
+        self._stop.set()
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            # Every worker starts the thread, but only the lock holder archives; the others
+            # keep checking so one of them takes over if that worker exits
+            if hold_lock('audit-archiver'):
+                self.run()
+            else:
+                self._update_status(state='standby')
+            self._stop.wait(self.interval)
+    
+    def run(self) -> Dict[str, Any]:
+        """Archive everything older than the cutoff, then release the freed pages"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+        self._update_status(state='running', cutoff=cutoff, archived=0, pages_freed=0, started_at=time.time())
+        
+        try:
+            archived = 0
+            while not self._stop.is_set():
+                moved = archive_audits(cutoff, self.batch_size)
+                archived += moved
+                self._update_status(archived=archived)
+                if moved < self.batch_size:
+                    break
+                # Short transactions with gaps between them, so audit commits never queue behind the archiver
+                time.sleep(self.pause)
+            
+            pages_freed = 0
+            if not has_incremental_vacuum():
+                logger.warning('Archived rows leave free pages until the database is converted: '
+                               'python -m services.audit_archiver --enable-incremental-vacuum')
+            while not self._stop.is_set() and has_incremental_vacuum():
+                freed = vacuum_free_pages(self.vacuum_pages)
+                pages_freed += freed
+                if freed < self.vacuum_pages:
+                    break
+                time.sleep(self.pause)
+        except Exception as e:
+            logger.error(f'Audit archive run failed: {e}')
+            self._update_status(state='failed', error=str(e), finished_at=time.time())
+            return self.get_status()
+        
+        if archived:
+            logger.info(f'Archived {archived} audits older than {cutoff}, freed {pages_freed} pages')
+        with self._lock:
+            self._status.update(state='idle', pages_freed=pages_freed, finished_at=time.time())
+            self._status['runs'] += 1
+            return dict(self._status)
+
+# Global archiver instance
+audit_archiver = AuditArchiver()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Audit archive maintenance')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='one-off VACUUM converting the database to incremental auto-vacuum (blocks writers while it runs)')
+    parser.add_argument('--run', action='store_true', help='archive and release free pages once, then exit')
+    args = parser.parse_args()
+    if args.enable_incremental_vacuum:
+        print('Converted' if enable_incremental_vacuum() else 'Already using incremental auto-vacuum')
+    if args.run:
+        print(audit_archiver.run())
+    if not (args.enable_incremental_vacuum or args.run):
+        parser.print_help()
@@ -5,32 +5,190 @@ import json
 import hashlib
 import time
 import os
-from typing import Optional, Dict, Any
+import heapq
+import logging
+import threading
+from urllib.parse import urlsplit
+from typing import Optional, Dict, Any, List
+from config.settings import (
+    CACHE_DIR, CACHE_TTL, CACHE_MAX_BYTES, CACHE_JANITOR_INTERVAL, CACHE_JANITOR_BATCH,
+    NEGATIVE_CACHE_TTLS, NEGATIVE_CACHE_MAX_TTL, REDIS_URL
+)
+from utils.helpers import canonicalize_url
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Error types that are scoped to a single page rather than the whole host
+URL_SCOPED_ERRORS = {'http_4xx'}
+FAILURE_PREFIX = 'failure_'
+
+# Lifetime counters shared by all workers, merged into this file by the janitor
+STATS_FILENAME = 'cache_stats.meta'
+PERSISTED_COUNTERS = ('hits', 'misses', 'sets', 'evictions', 'expired')
+
+def get_cache_key(url: str) -> str:
+    """Generate cache key from URL"""
+    # Canonicalize so scheme/www/tracking variants share one entry
+    url = canonicalize_url(url)
+    return hashlib.md5(url.encode()).hexdigest()
+
+def get_failure_scopes(url: str) -> Dict[str, str]:
+    """Get the URL and host scopes negative entries are stored under"""
+    canonical = canonicalize_url(url)
+    return {'url': canonical, 'host': urlsplit(canonical).netloc}
+
+def get_failure_scope(url: str, error_type: str) -> str:
+    """Get the scope a failure of this type is recorded against"""
+    scopes = get_failure_scopes(url)
+    return scopes['url'] if error_type in URL_SCOPED_ERRORS else scopes['host']
+
+def build_failure_entry(scope: str, error_type: str, error: str, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build a negative cache entry, doubling the TTL for repeat failures"""
+    failures = previous.get('failures', 0) + 1 if previous else 1
+    ttl = min(NEGATIVE_CACHE_TTLS[error_type] * 2 ** (failures - 1), NEGATIVE_CACHE_MAX_TTL)
+    
+    now = time.time()
+    return {
+        'scope': scope,
+        'error_type': error_type,
+        'error': error,
+        'failures': failures,
+        'cached_at': now,
+        'retry_at': now + ttl,
+        'retry_in': ttl,
+        # Keep the entry past retry_at so the next failure keeps backing off
+        'expires_at': now + ttl + NEGATIVE_CACHE_MAX_TTL
+    }
 
 class SimpleCache:
     """Simple file-based cache for audit results"""
     
-    def __init__(self, cache_dir='cache', default_ttl=3600):
+    def __init__(self, cache_dir='cache', default_ttl=3600, max_bytes=0, janitor_interval=0,
+                 janitor_batch=200):
         self.cache_dir = cache_dir
         self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.janitor_interval = janitor_interval
+        self.janitor_batch = janitor_batch
         os.makedirs(cache_dir, exist_ok=True)
+        
+        # In-memory index of cache files: filename -> {size, expires_at, accessed_at}
+        self._lock = threading.RLock()
+        self._index = {}
+        self._counters = dict.fromkeys(PERSISTED_COUNTERS, 0)
+        self._unpersisted = dict.fromkeys(PERSISTED_COUNTERS, 0)
+        self._bytes = 0
+        self._negative = 0
+        self._sweep_queue = []
+        self._janitor_pid = None
+        self._janitor_stop = threading.Event()
+        self._rescan()
     
     def _get_cache_key(self, url: str) -> str:
         """Generate cache key from URL"""
-        # Normalize URL for consistent caching
-        url = url.lower().rstrip('/')
-        return hashlib.md5(url.encode()).hexdigest()
+        return get_cache_key(url)
     
     def _get_cache_path(self, cache_key: str) -> str:
         """Get cache file path"""
         return os.path.join(self.cache_dir, f"{cache_key}.json")
     
+    # ---------- Index and counters ----------
+    
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+            self._unpersisted[counter] += amount
+    
+    def _index_add(self, filename: str, size: int, expires_at: Optional[float]) -> None:
+        """Track a cache file, replacing any previous entry for it"""
+        with self._lock:
+            self._index_discard(filename)
+            self._index[filename] = {'size': size, 'expires_at': expires_at, 'accessed_at': time.time()}
+            self._bytes += size
+            if filename.startswith(FAILURE_PREFIX):
+                self._negative += 1
+    
+    def _index_discard(self, filename: str) -> None:
+        with self._lock:
+            entry = self._index.pop(filename, None)
+            if entry:
+                self._bytes -= entry['size']
+                if filename.startswith(FAILURE_PREFIX):
+                    self._negative -= 1
+    
+    def _remove_file(self, filename: str, reason: Optional[str] = None) -> bool:
+        """Delete a cache file and update the index; reason is the counter to bump"""
+        try:
+            os.remove(os.path.join(self.cache_dir, filename))
+            removed = True
+        except FileNotFoundError:
+            removed = False
+        except OSError:
+            return False
+        
+        self._index_discard(filename)
+        if removed and reason:
+            self._count(reason)
+        return removed
+    
+    def _write_file(self, filename: str, payload: Dict[str, Any]) -> bool:
+        """Write a cache file atomically so concurrent readers never see partial JSON"""
+        file_path = os.path.join(self.cache_dir, filename)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, file_path)
+            self._index_add(filename, os.path.getsize(file_path), payload.get('expires_at'))
+            return True
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+    
+    def _rescan(self) -> None:
+        """Rebuild the index from the cache directory (stat only, no JSON parsing)"""
+        index = {}
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.json') and entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except OSError:
+                            continue
+                        index[entry.name] = {'size': stat.st_size, 'expires_at': None, 'accessed_at': stat.st_mtime}
+        except OSError:
+            return
+        
+        with self._lock:
+            # Keep what we already know about files that are still present
+            for filename, known in self._index.items():
+                if filename in index and known['expires_at'] is not None:
+                    index[filename] = known
+            self._index = index
+            self._bytes = sum(entry['size'] for entry in index.values())
+            self._negative = sum(1 for filename in index if filename.startswith(FAILURE_PREFIX))
+    
+    # ---------- Public cache API ----------
+    
     def get(self, url: str) -> Optional[Dict[Any, Any]]:
         """Get cached audit result"""
+        self._ensure_janitor()
         cache_key = self._get_cache_key(url)
         cache_path = self._get_cache_path(cache_key)
+        filename = os.path.basename(cache_path)
         
         if not os.path.exists(cache_path):
+            self._index_discard(filename)
+            self._count('misses')
             return None
         
         try:
@@ -39,21 +197,41 @@ class SimpleCache:
             
             # Check if cache is expired
             if time.time() > cached_data.get('expires_at', 0):
-                os.remove(cache_path)
+                self._remove_file(filename, 'expired')
+                self._count('misses')
                 return None
             
-            return cached_data.get('data')
+            with self._lock:
+                entry = self._index.get(filename)
+                if entry is None:
+                    # Written by another worker since our last rescan
+                    self._index_add(filename, os.path.getsize(cache_path), cached_data.get('expires_at'))
+                else:
+                    entry['expires_at'] = cached_data.get('expires_at')
+                    entry['accessed_at'] = time.time()
             
+            self._count('hits')
+            return cached_data.get('data')
+        
         except (json.JSONDecodeError, IOError):
             # Remove corrupted cache file
-            if os.path.exists(cache_path):
-                os.remove(cache_path)
+            self._remove_file(filename)
+            self._count('misses')
             return None
     
+    def get_many(self, urls: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get cached results for several URLs, keyed by the URL as passed in"""
+        results = {}
+        for url in urls:
+            data = self.get(url)
+            if data is not None:
+                results[url] = data
+        return results
+    
     def set(self, url: str, data: Dict[Any, Any], ttl: Optional[int] = None) -> bool:
         """Cache audit result"""
+        self._ensure_janitor()
         cache_key = self._get_cache_key(url)
-        cache_path = self._get_cache_path(cache_key)
         
         if ttl is None:
             ttl = self.default_ttl
@@ -65,12 +243,53 @@ class SimpleCache:
             'url': url
         }
         
-        try:
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-            return True
-        except IOError:
+        if not self._write_file(f"{cache_key}.json", cache_data):
             return False
+        self._count('sets')
+        return True
+    
+    def _get_failure_filename(self, scope: str) -> str:
+        """Get negative cache filename for a host or URL scope"""
+        return f"{FAILURE_PREFIX}{hashlib.md5(scope.encode()).hexdigest()}.json"
+    
+    def _read_failure(self, scope: str) -> Optional[Dict[str, Any]]:
+        failure_path = os.path.join(self.cache_dir, self._get_failure_filename(scope))
+        if not os.path.exists(failure_path):
+            return None
+        try:
+            with open(failure_path, 'r') as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return None
+        if time.time() > entry.get('expires_at', 0):
+            return None
+        return entry
+    
+    def get_failure(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get an active negative cache entry for a URL or its host"""
+        now = time.time()
+        for scope in get_failure_scopes(url).values():
+            entry = self._read_failure(scope)
+            if entry and now < entry.get('retry_at', 0):
+                return {**entry, 'retry_in': int(entry['retry_at'] - now) + 1}
+        return None
+    
+    def record_failure(self, url: str, error_type: str, error: str = '') -> Optional[Dict[str, Any]]:
+        """Negative-cache a failed scrape with exponential backoff per host"""
+        if not NEGATIVE_CACHE_TTLS.get(error_type):
+            return None
+        
+        scope = get_failure_scope(url, error_type)
+        entry = build_failure_entry(scope, error_type, error, self._read_failure(scope))
+        
+        if not self._write_file(self._get_failure_filename(scope), entry):
+            return None
+        return entry
+    
+    def clear_failures(self, url: str) -> None:
+        """Forget negative cache entries after a successful scrape"""
+        for scope in get_failure_scopes(url).values():
+            self._remove_file(self._get_failure_filename(scope))
     
     def delete(self, url: str) -> bool:
         """Delete cached result"""
@@ -78,57 +297,42 @@ class SimpleCache:
         cache_path = self._get_cache_path(cache_key)
         
         if os.path.exists(cache_path):
-            try:
-                os.remove(cache_path)
-                return True
-            except IOError:
-                return False
+            return self._remove_file(os.path.basename(cache_path))
         return True
     
     def clear(self) -> int:
         """Clear all cached results"""
         cleared = 0
         for filename in os.listdir(self.cache_dir):
-            if filename.endswith('.json'):
-                try:
-                    os.remove(os.path.join(self.cache_dir, filename))
-                    cleared += 1
-                except IOError:
-                    pass
+            if filename.endswith('.json') and self._remove_file(filename):
+                cleared += 1
+        with self._lock:
+            self._index = {}
+            self._bytes = 0
+            self._negative = 0
         return cleared
     
     def get_cache_stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
-        total_files = 0
-        total_size = 0
-        expired_files = 0
-        
-        current_time = time.time()
-        
-        for filename in os.listdir(self.cache_dir):
-            if filename.endswith('.json'):
-                file_path = os.path.join(self.cache_dir, filename)
-                try:
-                    file_size = os.path.getsize(file_path)
-                    total_size += file_size
-                    total_files += 1
-                    
-                    # Check if expired
-                    with open(file_path, 'r') as f:
-                        cached_data = json.load(f)
-                    
-                    if current_time > cached_data.get('expires_at', 0):
-                        expired_files += 1
-                        
-                except (IOError, json.JSONDecodeError):
-                    pass
-        
-        return {
-            'total_cached_items': total_files,
-            'total_size_bytes': total_size,
-            'expired_items': expired_files,
-            'cache_hit_potential': max(0, total_files - expired_files)
-        }
+        """Get cache statistics from live counters (no directory scan)"""
+        with self._lock:
+            entries = len(self._index)
+            hits = self._counters['hits']
+            misses = self._counters['misses']
+            stats = {
+                'total_cached_items': entries - self._negative,
+                'total_size_bytes': self._bytes,
+                'negative_items': self._negative,
+                'max_size_bytes': self.max_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                'sets': self._counters['sets'],
+                'evictions': self._counters['evictions'],
+                'expired': self._counters['expired'],
+                'cache_hit_potential': entries - self._negative
+            }
+        stats['lifetime'] = self._read_persisted_stats()
+        return stats
     
     def cleanup_expired(self) -> int:
         """Remove expired cache entries"""
@@ -143,18 +347,155 @@ class SimpleCache:
                         cached_data = json.load(f)
                     
                     if current_time > cached_data.get('expires_at', 0):
-                        os.remove(file_path)
-                        removed += 1
-                        
+                        if self._remove_file(filename, 'expired'):
+                            removed += 1
+                
                 except (IOError, json.JSONDecodeError):
                     # Remove corrupted files too
-                    try:
-                        os.remove(file_path)
+                    if self._remove_file(filename):
                         removed += 1
-                    except IOError:
-                        pass
         
         return removed
+    
+    # ---------- Background maintenance ----------
+    
+    def run_maintenance(self) -> Dict[str, int]:
+        """One incremental janitor pass: expire a batch of entries, then enforce the size budget"""
+        expired = 0
+        evicted = 0
+        now = time.time()
+        
+        # Walk the index a batch at a time; refill from a fresh directory scan each round
+        with self._lock:
+            if not self._sweep_queue:
+                self._rescan()
+                self._sweep_queue = list(self._index)
+            batch = self._sweep_queue[-self.janitor_batch:]
+            del self._sweep_queue[-self.janitor_batch:]
+        
+        for filename in batch:
+            with self._lock:
+                entry = self._index.get(filename)
+            if entry is None:
+                continue
+            expires_at = entry['expires_at']
+            if expires_at is None:
+                expires_at = self._read_expiry(filename)
+                if expires_at is None:
+                    continue
+            if now > expires_at and self._remove_file(filename, 'expired'):
+                expired += 1
+        
+        # Evict least recently used entries while over budget, a bounded number per pass
+        if self.max_bytes:
+            with self._lock:
+                over_budget = self._bytes > self.max_bytes
+                candidates = heapq.nsmallest(
+                    self.janitor_batch, self._index.items(), key=lambda item: item[1]['accessed_at']
+                ) if over_budget else []
+            for filename, _ in candidates:
+                with self._lock:
+                    if self._bytes <= self.max_bytes:
+                        break
+                if self._remove_file(filename, 'evictions'):
+                    evicted += 1
+        
+        self.persist_stats()
+        return {'expired': expired, 'evicted': evicted}
+    
+    def _read_expiry(self, filename: str) -> Optional[float]:
+        """Load expires_at for an entry discovered by a directory scan"""
+        try:
+            with open(os.path.join(self.cache_dir, filename), 'r') as f:
+                expires_at = json.load(f).get('expires_at', 0)
+        except FileNotFoundError:
+            self._index_discard(filename)
+            return None
+        except (IOError, json.JSONDecodeError):
+            # Corrupted entries are treated as already expired
+            return 0
+        with self._lock:
+            if filename in self._index:
+                self._index[filename]['expires_at'] = expires_at
+        return expires_at
+    
+    def persist_stats(self) -> None:
+        """Merge counters accumulated since the last call into the shared stats file"""
+        with self._lock:
+            pending = dict(self._unpersisted)
+            self._unpersisted = dict.fromkeys(PERSISTED_COUNTERS, 0)
+        if not any(pending.values()):
+            return
+        
+        stats_path = os.path.join(self.cache_dir, STATS_FILENAME)
+        try:
+            with open(stats_path, 'a+') as f:
+                # Other workers merge into the same file (no flock on Windows: single process assumed)
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                f.seek(0)
+                try:
+                    totals = json.loads(f.read() or '{}')
+                except json.JSONDecodeError:
+                    totals = {}
+                for counter, amount in pending.items():
+                    totals[counter] = totals.get(counter, 0) + amount
+                totals['updated_at'] = time.time()
+                f.seek(0)
+                f.truncate()
+                json.dump(totals, f)
+        except (IOError, OSError) as e:
+            logger.warning(f'Failed to persist cache stats: {e}')
+    
+    def _read_persisted_stats(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.cache_dir, STATS_FILENAME), 'r') as f:
+                return json.load(f)
+        except (IOError, json.JSONDecodeError):
+            return {}
+    
+    def _ensure_janitor(self) -> None:
+        """Start the janitor once per process (threads don't survive Gunicorn's fork)"""
+        if self.janitor_interval <= 0 or self._janitor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._janitor_pid == os.getpid():
+                return
+            self._janitor_pid = os.getpid()
+            self._janitor_stop.clear()
+            threading.Thread(target=self._janitor_loop, name='cache-janitor', daemon=True).start()
+    
+    def _janitor_loop(self) -> None:
+        while not self._janitor_stop.wait(self.janitor_interval):
+            try:
+                self.run_maintenance()
+            except Exception as e:
+                logger.error(f'Cache janitor pass failed: {e}')
+    
+    def stop_janitor(self) -> None:
+        """Stop the background janitor and flush counters"""
+        self._janitor_stop.set()
+        self._janitor_pid = None
+        self.persist_stats()
+
+def create_cache():
+    """Create the shared Redis cache when configured, falling back to the file cache"""
+    file_cache = SimpleCache(
+        cache_dir=CACHE_DIR,
+        default_ttl=CACHE_TTL,
+        max_bytes=CACHE_MAX_BYTES,
+        janitor_interval=CACHE_JANITOR_INTERVAL,
+        janitor_batch=CACHE_JANITOR_BATCH
+    )
+    if not REDIS_URL:
+        return file_cache
+    
+    try:
+        from services.redis_cache import RedisCache
+        return RedisCache.from_url(REDIS_URL, fallback=file_cache, default_ttl=CACHE_TTL)
+    except Exception as e:
+        logger.warning(f'Redis cache unavailable, using file cache: {e}')
+        return file_cache
 
 # Global cache instance
-cache = SimpleCache(cache_dir='cache', default_ttl=7200)  # 2 hours default
\ No newline at end of file
+cache = create_cache()
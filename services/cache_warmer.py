@@ -0,0 +1,108 @@
+# File: services/cache_warmer.py
+# Repopulates the audit cache from stored audit history after a deploy or cache clear
+
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from config.settings import CACHE_TTL, CACHE_WARM_MAX_AGE, CACHE_WARMUP_LIMIT, CACHE_WARMUP_RATE
+from models.database import get_recent_popular_audits
+from services.cache_service import cache
+from services.seo_auditor import SEOAuditor
+
+logger = logging.getLogger(__name__)
+
+class CacheWarmer:
+    """Rate-limited background job that rebuilds cache entries from the audits table"""
+
+    def __init__(self, cache, max_age=CACHE_WARM_MAX_AGE, limit=CACHE_WARMUP_LIMIT, rate=CACHE_WARMUP_RATE,
+                 ttl=CACHE_TTL):
+        self.cache = cache
+        # Longer than the cache TTL, so a restart after a quiet spell still has audits to warm from
+        self.max_age = max_age
+        self.ttl = ttl
+        self.limit = limit
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._thread = None
+        self._status = {'state': 'idle'}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get progress of the current or last warm-up run"""
+        with self._lock:
+            return dict(self._status)
+
+    def _update_status(self, **changes):
+        with self._lock:
+            self._status.update(changes)
+
+    def start(self, limit: Optional[int] = None) -> bool:
+        """Start a warm-up run in the background, returns False if one is already running"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self.run, args=(limit,), daemon=True)
+            self._thread.start()
+            return True
+
+    def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """Warm the cache synchronously and return the final status"""
+        self._update_status(
+            state='running', total=0, processed=0, warmed=0,
+            skipped=0, failed=0, started_at=time.time(), finished_at=None
+        )
+
+        try:
+            candidates = get_recent_popular_audits(self.max_age, limit or self.limit)
+        except Exception as e:
+            logger.error(f'Cache warm-up could not read audit history: {e}')
+            self._update_status(state='failed', error=str(e), finished_at=time.time())
+            return self.get_status()
+
+        self._update_status(total=len(candidates))
+        interval = 1.0 / self.rate if self.rate > 0 else 0
+
+        # One bulk lookup instead of a round trip per candidate
+        try:
+            already_cached = set(self.cache.get_many([row['url'] for row in candidates]))
+        except Exception as e:
+            logger.warning(f'Cache warm-up bulk lookup failed: {e}')
+            already_cached = set()
+
+        for row in candidates:
+            outcome = 'skipped' if row['url'] in already_cached else self._warm_entry(row)
+            with self._lock:
+                self._status['processed'] += 1
+                self._status[outcome] += 1
+
+            # Only entries actually written count against the rate limit
+            if outcome == 'warmed' and interval:
+                time.sleep(interval)
+
+        self._update_status(state='completed', finished_at=time.time())
+        status = self.get_status()
+        logger.info(f"Cache warm-up finished: {status['warmed']} warmed, "
+                    f"{status['skipped']} skipped, {status['failed']} failed")
+        return status
+
+    def _warm_entry(self, row: Dict[str, Any]) -> str:
+        """Populate one cache entry, returns the status counter to increment"""
+        url = row['url']
+        try:
+            # A normal cache lifetime, but never past the warm-up age limit
+            created_at = datetime.strptime(row['created_at'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+            ttl = min(self.ttl, int(created_at.timestamp() + self.max_age - time.time()))
+            if ttl <= 0 or not row['audit_data']:
+                return 'skipped'
+
+            audit_data = json.loads(row['audit_data'])
+            self.cache.set(url, SEOAuditor.build_response(audit_data, report_id=row.get('report_id')), ttl=ttl)
+            return 'warmed'
+        except Exception as e:
+            logger.warning(f'Cache warm-up failed for {url}: {e}')
+            return 'failed'
+
+# Global warmer instance
+cache_warmer = CacheWarmer(cache)
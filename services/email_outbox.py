@@ -0,0 +1,331 @@
+# File: services/email_outbox.py
+# Durable email outbox: emails are queued in SQLite and dispatched to Resend by a background worker
+
+import os
+import time
+import base64
+import random
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import requests
+from config.settings import (
+    RESEND_API_URL, EMAIL_SEND_RATE, EMAIL_BATCH_SIZE, EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_DELAY,
+    EMAIL_RETRY_MAX_DELAY, EMAIL_OUTBOX_POLL_INTERVAL, EMAIL_OUTBOX_LEASE, EMAIL_SEND_TIMEOUT,
+    EMAIL_ATTACHMENT_CACHE_BYTES, EMAIL_DEDUP_WINDOW, EMAIL_DIGEST_WINDOW, EMAIL_DIGEST_MAX
+)
+from models import database
+
+logger = logging.getLogger(__name__)
+
+# Wrapper for digest emails; each report contributes its own digest_html section
+DIGEST_TEMPLATE = """
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; color: #333;">
+        <h2 style="color: #1976d2;">Your SEO Audit Reports</h2>
+        <p style="font-size: 16px;">Here are the results for the {count} websites you audited.</p>
+        {sections}
+    </div>
+"""
+
+class ProviderError(Exception):
+    """Email provider rejected or failed a request"""
+    
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+        # Network errors, rate limits and server errors are worth retrying; other 4xx are not
+        self.retryable = status is None or status == 429 or status >= 500
+
+class ResendClient:
+    """Minimal Resend HTTP API client"""
+    
+    def __init__(self, api_key: str, base_url: str = RESEND_API_URL, timeout: float = EMAIL_SEND_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'})
+    
+    def send(self, message: Dict) -> str:
+        """Send one email, returning the provider id"""
+        return self._post('/emails', message).get('id')
+    
+    def send_batch(self, messages: List[Dict]) -> List[str]:
+        """Send several emails in one request (the batch endpoint doesn't take attachments)"""
+        return [item.get('id') for item in self._post('/emails/batch', messages).get('data', [])]
+    
+    def _post(self, path: str, payload) -> Dict:
+        try:
+            response = self.session.post(f'{self.base_url}{path}', json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise ProviderError(f'Request failed: {e}')
+        
+        if response.status_code >= 400:
+            retry_after = response.headers.get('retry-after') or response.headers.get('ratelimit-reset')
+            raise ProviderError(
+                f'HTTP {response.status_code}: {response.text[:200]}',
+                status=response.status_code,
+                retry_after=float(retry_after) if retry_after else None
+            )
+        return response.json()
+
+class EmailOutbox:
+    """Queues emails durably and sends them with retries, rate limiting and batching"""
+    
+    def __init__(self, rate: float = EMAIL_SEND_RATE, batch_size: int = EMAIL_BATCH_SIZE,
+                 max_attempts: int = EMAIL_MAX_ATTEMPTS, poll_interval: float = EMAIL_OUTBOX_POLL_INTERVAL):
+        self.rate = rate
+        self.batch_size = max(1, min(batch_size, 100))
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker_pid = None
+        self._paused_until = 0.0
+        self._client = None
+        self._client_key = None
+        self._encoded = OrderedDict()  # (path, mtime_ns, size) -> base64 payload, LRU order
+        self._encoded_bytes = 0
+    
+    def enqueue(self, recipient: str, subject: str, html: str, attachment_path: Optional[str] = None,
+                dedup_key: Optional[str] = None, digest_html: Optional[str] = None) -> Optional[int]:
+        """Queue an email for delivery, returning its outbox id (None if it couldn't be stored)"""
+        # A recent duplicate's id is returned instead of queueing it again; digest_html marks
+        # emails that may be combined per recipient when EMAIL_DIGEST_WINDOW is set
+        try:
+            email_id = database.enqueue_email(
+                recipient, subject, html, attachment_path,
+                dedup_key=dedup_key, dedup_window=EMAIL_DEDUP_WINDOW,
+                digest_html=digest_html, digest_window=EMAIL_DIGEST_WINDOW, digest_max=EMAIL_DIGEST_MAX
+            )
+        except Exception as e:
+            logger.error(f'Could not queue email to {recipient}: {e}')
+            return None
+        self._ensure_worker()
+        self._wakeup.set()
+        return email_id
+    
+    def find_duplicate(self, dedup_key: str) -> Optional[int]:
+        """Id of an email with this key queued within EMAIL_DEDUP_WINDOW, if any"""
+        if EMAIL_DEDUP_WINDOW <= 0:
+            return None
+        return database.find_recent_email(dedup_key, EMAIL_DEDUP_WINDOW)
+    
+    def get_status(self, email_id: int) -> Optional[Dict]:
+        """Delivery status of a queued email"""
+        return database.get_email_status(email_id)
+    
+    def get_stats(self) -> Dict:
+        """Outbox counts by status and the attachment cache size"""
+        stats = database.get_outbox_stats()
+        with self._lock:
+            stats['attachment_cache'] = {'entries': len(self._encoded), 'bytes': self._encoded_bytes}
+        return stats
+    
+    def run_once(self) -> Dict[str, int]:
+        """Send every due email once; returns counts of sent, retried and failed emails"""
+        counts = {'sent': 0, 'retried': 0, 'failed': 0}
+        if time.time() < self._paused_until:
+            return counts
+        
+        client = self._get_client()
+        if client is None:
+            return counts
+        
+        due = database.claim_due_emails(self.batch_size * 2, EMAIL_OUTBOX_LEASE)
+        
+        # Reports waiting for the same recipient's digest go out as one email
+        digests = {}
+        for row in due:
+            if row.get('digest_key'):
+                digests.setdefault(row['digest_key'], []).append(row)
+        digests = {key: rows for key, rows in digests.items() if len(rows) > 1}
+        grouped = {row['id'] for rows in digests.values() for row in rows}
+        due = [row for row in due if row['id'] not in grouped]
+        
+        plain = [row for row in due if not row['attachment_path']]
+        with_attachment = [row for row in due if row['attachment_path']]
+        
+        send_one = lambda rows: [client.send(self._build_message(rows[0]))]
+        
+        # Emails without attachments share batch requests
+        for start in range(0, len(plain), self.batch_size):
+            chunk = plain[start:start + self.batch_size]
+            self._dispatch(chunk, counts, lambda rows: client.send_batch([self._build_message(row) for row in rows]),
+                           send_one=send_one)
+        
+        for row in with_attachment:
+            self._dispatch([row], counts, send_one)
+        
+        for rows in digests.values():
+            self._dispatch(rows, counts, lambda rows: [client.send(self._build_digest(rows))] * len(rows))
+        
+        return counts
+    
+    def _dispatch(self, rows: List[Dict], counts: Dict[str, int], send, send_one=None) -> None:
+        """Send rows in one provider request; send_one, if given, retries a rejected batch email by email"""
+        if time.time() < self._paused_until:
+            # Rate limited earlier in this pass: put the rest back without spending an attempt
+            for row in rows:
+                database.reschedule_email(row['id'], self._paused_until - time.time(), 'rate limited')
+                counts['retried'] += 1
+            return
+        
+        self._wait_for_slot()
+        try:
+            provider_ids = send(rows)
+        except Exception as e:
+            error = e if isinstance(e, ProviderError) else ProviderError(str(e))
+            if not error.retryable and send_one is not None and len(rows) > 1:
+                # The provider rejects a whole batch over one bad message; find it by sending one at a time
+                logger.warning(f'Batch of {len(rows)} emails rejected ({error}), sending individually')
+                for row in rows:
+                    self._dispatch([row], counts, send_one)
+                return
+            if error.status == 429:
+                self._paused_until = time.time() + (error.retry_after or 1)
+                # Other workers' dispatchers hold off too
+                database.pause_send_slots(self._paused_until)
+            # One delay for the whole request so a digest is retried as one email
+            delay = self.get_retry_delay(max(row['attempts'] for row in rows), error.retry_after)
+            for row in rows:
+                self._handle_failure(row, error, counts, delay)
+            return
+        
+        for row, provider_id in zip(rows, provider_ids + [None] * (len(rows) - len(provider_ids))):
+            database.mark_email_sent(row['id'], provider_id)
+            counts['sent'] += 1
+            logger.info(f"Email {row['id']} sent to {row['recipient']}")
+    
+    def _handle_failure(self, row: Dict, error: ProviderError, counts: Dict[str, int], delay: float) -> None:
+        if not error.retryable or row['attempts'] >= self.max_attempts:
+            database.mark_email_failed(row['id'], str(error))
+            counts['failed'] += 1
+            logger.error(f"Email {row['id']} to {row['recipient']} failed permanently: {error}")
+            return
+        
+        database.reschedule_email(row['id'], delay, str(error))
+        counts['retried'] += 1
+        logger.warning(f"Email {row['id']} to {row['recipient']} will be retried: {error}")
+    
+    @staticmethod
+    def get_retry_delay(attempts: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with jitter, never sooner than the provider asked"""
+        delay = min(EMAIL_RETRY_MAX_DELAY, EMAIL_RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+        # Jitter spreads retries from many workers so they don't hit the provider together
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, retry_after or 0)
+    
+    def _wait_for_slot(self) -> None:
+        """Space provider requests to stay under the configured rate, counted across all worker processes"""
+        if self.rate <= 0:
+            return
+        wait = database.reserve_send_slot(1.0 / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _build_message(self, row: Dict) -> Dict:
+        from_email = os.getenv('RESEND_FROM_EMAIL', 'onboarding@resend.dev')
+        message = {
+            'from': f'SEO Auditor <{from_email}>',
+            'to': row['recipient'],
+            'subject': row['subject'],
+            'html': row['html']
+        }
+        path = row['attachment_path']
+        if path:
+            content = self._encode_attachment(path)
+            if content is not None:
+                message['attachments'] = [{'filename': os.path.basename(path), 'content': content}]
+            else:
+                logger.warning(f"Attachment for email {row['id']} is gone, sending without it: {path}")
+        return message
+    
+    def _build_digest(self, rows: List[Dict]) -> Dict:
+        """One email carrying the sections and attachments of several queued reports"""
+        sections = ''.join(row['digest_html'] for row in rows)
+        message = self._build_message({
+            'id': rows[0]['id'],
+            'recipient': rows[0]['recipient'],
+            'subject': f'Your SEO Audit Reports for {len(rows)} Websites',
+            'html': DIGEST_TEMPLATE.format(count=len(rows), sections=sections),
+            'attachment_path': None
+        })
+        attachments = []
+        for row in rows:
+            content = self._encode_attachment(row['attachment_path']) if row['attachment_path'] else None
+            if content is not None:
+                attachments.append({'filename': os.path.basename(row['attachment_path']), 'content': content})
+        if attachments:
+            message['attachments'] = attachments
+        return message
+    
+    def _encode_attachment(self, path: str) -> Optional[str]:
+        """Base64 payload for a file, reused across emails and retries of the same report"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._encoded:
+                self._encoded.move_to_end(key)
+                return self._encoded[key]
+        
+        with open(path, 'rb') as f:
+            content = base64.b64encode(f.read()).decode()
+        
+        with self._lock:
+            if key not in self._encoded and len(content) <= EMAIL_ATTACHMENT_CACHE_BYTES:
+                self._encoded[key] = content
+                self._encoded_bytes += len(content)
+                while self._encoded_bytes > EMAIL_ATTACHMENT_CACHE_BYTES:
+                    _, evicted = self._encoded.popitem(last=False)
+                    self._encoded_bytes -= len(evicted)
+        return content
+    
+    def _get_client(self) -> Optional[ResendClient]:
+        api_key = os.getenv('RESEND_API_KEY', '')
+        if not api_key:
+            logger.warning('RESEND_API_KEY not set, outbox emails are waiting')
+            return None
+        base_url = os.getenv('RESEND_API_URL', RESEND_API_URL)
+        if self._client is None or self._client_key != (api_key, base_url):
+            self._client = ResendClient(api_key, base_url)
+            self._client_key = (api_key, base_url)
+        return self._client
+    
+    def _ensure_worker(self) -> None:
+        """Start the dispatcher once per process (threads don't survive Gunicorn's fork)"""
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            self._stop.clear()
+            threading.Thread(target=self._worker_loop, name='email-outbox', daemon=True).start()
+    
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f'Email outbox pass failed: {e}')
+            self._wakeup.wait(max(self.poll_interval, self._paused_until - time.time()))
+            self._wakeup.clear()
+    
+    def start(self) -> None:
+        """Start dispatching emails queued by earlier runs"""
+        self._ensure_worker()
+    
+    def stop(self) -> None:
+        """Stop the dispatcher; queued emails stay in the outbox"""
+        self._stop.set()
+        self._wakeup.set()
+        self._worker_pid = None
+
+# Global outbox instance
+email_outbox = EmailOutbox()
@@ -1,11 +1,16 @@
 # File: services/email_service.py
-# Email service using Resend – now with built-in product offer
+# Email service using Resend – now with built-in product offer, delivered through the outbox
 
 import os
+import re
 import random
-import base64
 import html
-from typing import Dict
+import hashlib
+from typing import Dict, List, Optional
+from config.settings import EMAIL_ATTACH_MAX_BYTES, REPORT_LINK_TTL
+from services.email_outbox import email_outbox
+from services.report_cache import get_signed_report_url
+from utils.helpers import canonicalize_url
 
 # Configuration - use defaults so app runs without setup
 BOOKING_URL = os.getenv('BOOKING_URL', 'https://example.com/contact')
@@ -13,101 +18,176 @@ STRATEGY_CALL_VALUE = os.getenv('STRATEGY_CALL_VALUE', '0')
 VISITOR_VALUE_USD = int(os.getenv('VISITOR_VALUE_USD', '50'))
 
 
-def send_email_report(email: str, audit_data: Dict, pdf_path: str, website_url: str) -> bool:
-    """Send detailed email report using Resend and include a product upsell."""
-    RESEND_API_KEY = os.getenv('RESEND_API_KEY', '')
-    RESEND_FROM_EMAIL = os.getenv('RESEND_FROM_EMAIL', 'onboarding@resend.dev')  # Default to resend's demo email
+def is_email_configured() -> bool:
+    """Whether report emails can be delivered at all (read at call time, like send_email_report)"""
+    return bool(os.getenv('RESEND_API_KEY', ''))
 
-    if not RESEND_API_KEY:
+
+def send_email_report(email: str, audit_data: Dict, pdf_path: str, website_url: str,
+                      kind: str = 'audit', compared_urls: List[str] = ()) -> Optional[int]:
+    """Queue the detailed email report (with product upsell) in the outbox; returns its outbox id."""
+    if not is_email_configured():
         print("❌ RESEND_API_KEY not set in .env file")
-        return False
+        return None
 
     try:
-        import resend
-        resend.api_key = RESEND_API_KEY
-
-        # Prepare attachments
-        attachments = []
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, 'rb') as f:
-                content = f.read()
-                attachments = [{
-                    "filename": os.path.basename(pdf_path),
-                    "content": base64.b64encode(content).decode()
-                }]
-
         # Get score
         overall_score = audit_data.get('overall_score', audit_data.get('score', 0))
         
         # Add website_url to audit_data for template functions
         audit_data['website_url'] = website_url
 
-        # Determine score segment & template
-        score_segment = get_score_segment(overall_score)
-        html_body = get_email_template(score_segment, audit_data)
-
-        # Personalize
-        user_name = audit_data.get('user_name') or email.split('@')[0].replace('.', ' ').title()
-        # Extract business name from website URL
-        business_name = website_url.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0].split('.')[0].title()
-        
-        # Calculate Google overlook metric (example calculation - adjust as needed)
-        google_overlooks = audit_data.get('estimated_monthly_traffic_loss', 1000) * 2.847  # Mock calculation
-        
-        # Add website_url to audit_data for template functions
-        audit_data['website_url'] = website_url
-        
-        html_body = personalize_email_body(html_body, {
-            'businessName': business_name,  # Use business name instead of userName
-            'websiteUrl': website_url,
-            'googleOverlooks': f"{int(google_overlooks):,}"
-        })
-
-        # Get all dynamic content
-        recommendations = audit_data.get('recommendations', [])
-        critical_issues = audit_data.get('critical_issues', [])
-        
-        # Centralized replacements
-        replacements = {
-            'recommendations': '<ul>' + ''.join(f'<li>{html.escape(rec)}</li>' for rec in recommendations) + '</ul>',
-            'critical_issues': '<ul>' + ''.join(f'<li>{html.escape(issue)}</li>' for issue in critical_issues) + '</ul>',
-            'score': str(overall_score),
-            'critical_count': str(len(critical_issues))
-        }
-        
-        # Apply all replacements
-        for key, value in replacements.items():
-            html_body = html_body.replace(f'{{{{{key}}}}}', value)
+        html_body = build_email_body(audit_data, website_url)
 
         # Subject line
-        audit_data['website_url'] = website_url
         subject = personalize_subject_line(
             "Your SEO Audit Report for {{websiteUrl}} – Score: " + str(overall_score),
             audit_data
         )
 
-        # Send email
-        response = resend.Emails.send({
-            "from": f"SEO Auditor <{RESEND_FROM_EMAIL}>",
-            "to": email,
-            "subject": subject,
-            "html": html_body,
-            "attachments": attachments
-        })
-
-        print(f"✅ Email sent successfully to {email} via Resend!")
-        return True
-
-    except ImportError:
-        print("❌ Resend not installed. Run: pip install resend")
-        return False
+        attachment_path = pdf_path if pdf_path and os.path.exists(pdf_path) else None
+        link_html = ''
+        signed_url = None
+        if attachment_path and os.path.getsize(attachment_path) > EMAIL_ATTACH_MAX_BYTES:
+            # Large PDF: link to it instead of inflating the email by a third with base64
+            signed_url = get_signed_report_url(attachment_path)
+        if signed_url:
+            link_html = download_link_html(signed_url)
+            html_body += link_html
+            attachment_path = None
+
+        # Single-site reports can be combined into a digest; comparisons always go out alone
+        digest_html = None
+        if kind == 'audit':
+            digest_html = digest_section_html(website_url, overall_score, len(audit_data.get('critical_issues', [])), link_html)
+
+        # Delivery (retries, rate limits, batching, dedup) happens in the outbox worker
+        email_id = email_outbox.enqueue(
+            email, subject, html_body, attachment_path,
+            dedup_key=get_email_dedup_key(email, website_url, kind, compared_urls), digest_html=digest_html
+        )
+        if email_id is not None:
+            print(f"✅ Email to {email} queued for delivery (outbox id {email_id})")
+        return email_id
+
     except Exception as e:
-        print(f"❌ Resend error: {e}")
-        return False
+        print(f"❌ Email queue error: {e}")
+        return None
+
+
+def get_email_dedup_key(email: str, website_url: str, kind: str = 'audit', compared_urls: List[str] = ()) -> str:
+    """Idempotency key for a report email: recipient, canonical URL, report kind and any compared sites"""
+    # A comparison against a different set of competitors is a different report
+    sites = ','.join(sorted({canonicalize_url(url) for url in compared_urls}))
+    return hashlib.sha256(f'{email.strip().lower()}|{canonicalize_url(website_url)}|{kind}|{sites}'.encode()).hexdigest()
+
+
+def is_duplicate_report(email: str, website_url: str, kind: str = 'audit', compared_urls: List[str] = ()) -> bool:
+    """Whether this report was emailed to the recipient within EMAIL_DEDUP_WINDOW"""
+    return email_outbox.find_duplicate(get_email_dedup_key(email, website_url, kind, compared_urls)) is not None
 
 
 # ---------- Helper Functions ----------
 
+PLACEHOLDER_RE = re.compile(r'\{\{(\w+)\}\}')
+
+
+class SafeHTML(str):
+    """Markup that is inserted into a template slot without escaping"""
+
+
+class CompiledTemplate:
+    """Template parsed once into literal segments and named slots"""
+
+    def __init__(self, source: str):
+        parts = PLACEHOLDER_RE.split(source)
+        self.literals: List[str] = parts[0::2]
+        self.slots: List[str] = parts[1::2]
+
+    def render(self, values: Dict) -> str:
+        """Fill all slots in a single pass; unknown slots are left as-is"""
+        out = [self.literals[0]]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot)
+            if value is None:
+                out.append(f'{{{{{slot}}}}}')
+            elif isinstance(value, SafeHTML):
+                out.append(value)
+            else:
+                out.append(html.escape(str(value)))
+            out.append(literal)
+        return ''.join(out)
+
+
+_compiled_templates: Dict[str, CompiledTemplate] = {}
+
+
+def get_compiled_template(segment: str) -> CompiledTemplate:
+    """Segment template compiled on first use and reused for every email"""
+    template = _compiled_templates.get(segment)
+    if template is None:
+        # The segment templates don't depend on audit data, only on the segment
+        template = _compiled_templates[segment] = CompiledTemplate(get_email_template(segment))
+    return template
+
+
+def build_email_body(audit_data: Dict, website_url: str) -> str:
+    """Personalized HTML body for the audit's score segment"""
+    overall_score = audit_data.get('overall_score', audit_data.get('score', 0))
+    template = get_compiled_template(get_score_segment(overall_score))
+
+    # Extract business name from website URL
+    business_name = website_url.replace('https://', '').replace('http://', '').replace('www.', '').split('/')[0].split('.')[0].title()
+
+    # Calculate Google overlook metric (example calculation - adjust as needed)
+    google_overlooks = audit_data.get('estimated_monthly_traffic_loss', 1000) * 2.847  # Mock calculation
+
+    critical_issues = audit_data.get('critical_issues', [])
+
+    # Fill every slot in one pass; plain values are escaped, SafeHTML fragments are not
+    return template.render({
+        'businessName': business_name,  # Use business name instead of userName
+        'websiteUrl': website_url,
+        'googleOverlooks': f"{int(google_overlooks):,}",
+        'recommendations': SafeHTML(html_list(audit_data.get('recommendations', []))),
+        'critical_issues': SafeHTML(html_list(critical_issues)),
+        'score': overall_score,
+        'critical_count': len(critical_issues)
+    })
+
+
+def html_list(items: List[str]) -> str:
+    """Escaped <ul> of items"""
+    return '<ul>' + ''.join(f'<li>{html.escape(item)}</li>' for item in items) + '</ul>'
+
+
+def digest_section_html(website_url: str, score: int, critical_count: int, link_html: str = '') -> str:
+    """One report's section in a digest email"""
+    delivery = link_html or '<p style="font-size: 0.9em; color: #666;">Full PDF report attached.</p>'
+    return f"""
+        <div style="border: 1px solid #e0e0e0; border-radius: 6px; padding: 16px; margin: 16px 0;">
+            <h3 style="margin: 0 0 8px; color: #333;">{html.escape(website_url)}</h3>
+            <p style="margin: 0;">Score: <strong>{score}/100</strong> • {critical_count} critical issue{'s' if critical_count != 1 else ''}</p>
+            {delivery}
+        </div>
+    """
+
+
+def download_link_html(url: str) -> str:
+    """Download button for a report sent as a link rather than an attachment"""
+    days = max(1, REPORT_LINK_TTL // 86400)
+    return f"""
+        <div style="text-align: center; margin: 30px 0;">
+            <a href="{html.escape(url)}"
+               style="display:inline-block; background:#1976d2; color:#fff; padding:14px 28px;
+                      border-radius:6px; text-decoration:none; font-weight:bold;">
+                Download Your Full PDF Report
+            </a>
+            <p style="font-size: 0.9em; color: #666;">This link is valid for {days} day{'s' if days != 1 else ''}.</p>
+        </div>
+    """
+
+
 def get_score_segment(score: int) -> str:
     if score >= 80:
         return 'high'
@@ -0,0 +1,364 @@
+# File: services/redis_cache.py
+# Redis-backed cache shared by all Gunicorn workers, same interface as SimpleCache
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from config.settings import REDIS_KEY_PREFIX, REDIS_LOCAL_CACHE_SIZE, NEGATIVE_CACHE_TTLS
+from services.cache_service import get_cache_key, get_failure_scopes, get_failure_scope, build_failure_entry
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long a worker serves an entry from memory if an invalidation is missed
+LOCAL_MAX_AGE = 30
+
+# Seconds between attempts to resubscribe after the invalidation listener failed
+LISTENER_RETRY_INTERVAL = 5
+MGET_BATCH_SIZE = 100
+
+class RedisCache:
+    """Redis cache backend with a small per-worker hot layer kept coherent via pub/sub"""
+    
+    def __init__(self, client, fallback=None, default_ttl=3600, prefix=REDIS_KEY_PREFIX,
+                 local_size=REDIS_LOCAL_CACHE_SIZE):
+        self.client = client
+        self.fallback = fallback
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.local_size = local_size
+        self.channel = f'{prefix}invalidate'
+        self._instance_id = uuid.uuid4().hex
+        self._local = OrderedDict()  # cache_key -> (local_expires_at, data)
+        self._local_lock = threading.Lock()
+        self._listener = None
+        self._listener_pid = None
+        self._listener_retry_at = 0.0
+    
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisCache':
+        """Connect to Redis, raising if the server can't be reached"""
+        if redis is None:
+            raise RuntimeError('redis package not installed. Run: pip install redis')
+        client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        client.ping()
+        return cls(client, **kwargs)
+    
+    def _audit_key(self, cache_key: str) -> str:
+        return f'{self.prefix}audit:{cache_key}'
+    
+    def _failure_key(self, scope: str) -> str:
+        return f'{self.prefix}failure:{hashlib.md5(scope.encode()).hexdigest()}'
+    
+    def _use_fallback(self, operation: str, error: Exception):
+        """Log a Redis error and return the file cache method to use instead"""
+        logger.warning(f'Redis cache {operation} failed, using file cache: {error}')
+        if self.fallback is None:
+            return None
+        return getattr(self.fallback, operation)
+    
+    # ---------- Per-worker hot layer ----------
+    
+    def _local_get(self, cache_key: str) -> Optional[Dict[Any, Any]]:
+        if not self.local_size or self._listener is None:
+            return None
+        with self._local_lock:
+            entry = self._local.get(cache_key)
+            if entry is None:
+                return None
+            if time.time() > entry[0]:
+                del self._local[cache_key]
+                return None
+            self._local.move_to_end(cache_key)
+            return entry[1]
+    
+    def _local_put(self, cache_key: str, data: Dict[Any, Any], expires_at: float) -> None:
+        if not self.local_size:
+            return
+        with self._local_lock:
+            self._local[cache_key] = (min(expires_at, time.time() + LOCAL_MAX_AGE), data)
+            self._local.move_to_end(cache_key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+    
+    def _local_drop(self, cache_key: Optional[str] = None) -> None:
+        with self._local_lock:
+            if cache_key is None:
+                self._local.clear()
+            else:
+                self._local.pop(cache_key, None)
+    
+    def _handle_invalidation(self, message: Dict[str, Any]) -> None:
+        """Drop local copies of entries another worker changed"""
+        sender, _, cache_key = message['data'].decode().partition(':')
+        if sender == self._instance_id:
+            return
+        self._local_drop(None if cache_key == '*' else cache_key)
+    
+    def _publish_invalidation(self, pipe, cache_key: str) -> None:
+        pipe.publish(self.channel, f'{self._instance_id}:{cache_key}')
+    
+    def _listener_ok(self) -> bool:
+        """Subscribed in this process, or failed too recently to try again"""
+        if self._listener_pid != os.getpid():
+            return False
+        return self._listener is not None or time.time() < self._listener_retry_at
+    
+    def _ensure_listener(self) -> None:
+        """Subscribe to invalidations once per process (threads don't survive Gunicorn's fork)"""
+        if not self.local_size or self._listener_ok():
+            return
+        with self._local_lock:
+            if self._listener_ok():
+                return
+            self._listener_pid = os.getpid()
+            self._listener_retry_at = time.time() + LISTENER_RETRY_INTERVAL
+            self._local.clear()
+        try:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{self.channel: self._handle_invalidation})
+            self._listener = pubsub.run_in_thread(
+                sleep_time=1, daemon=True, exception_handler=self._listener_failed
+            )
+        except Exception as e:
+            # Without invalidations we can't trust local copies, so skip the hot layer
+            logger.warning(f'Redis invalidation listener unavailable: {e}')
+            self._listener = None
+    
+    def _listener_failed(self, error: Exception, pubsub, thread) -> None:
+        """Stop a listener whose connection dropped; the hot layer is skipped until it resubscribes"""
+        logger.warning(f'Redis invalidation listener lost its connection: {error}')
+        thread.stop()
+        with self._local_lock:
+            if self._listener is thread:
+                self._listener = None
+                self._listener_retry_at = 0.0  # resubscribe on the next read
+            self._local.clear()
+    
+    # ---------- Public cache API ----------
+    
+    def get(self, url: str) -> Optional[Dict[Any, Any]]:
+        """Get cached audit result"""
+        self._ensure_listener()
+        cache_key = get_cache_key(url)
+        
+        data = self._local_get(cache_key)
+        if data is not None:
+            return data
+        
+        try:
+            raw = self.client.get(self._audit_key(cache_key))
+        except Exception as e:
+            fallback = self._use_fallback('get', e)
+            return fallback(url) if fallback else None
+        
+        return self._decode(cache_key, raw)
+    
+    def _decode(self, cache_key: str, raw: Optional[bytes]) -> Optional[Dict[Any, Any]]:
+        if raw is None:
+            return None
+        try:
+            cached_data = json.loads(raw)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+        self._local_put(cache_key, cached_data.get('data'), cached_data.get('expires_at', 0))
+        return cached_data.get('data')
+    
+    def get_many(self, urls: List[str]) -> Dict[str, Dict[Any, Any]]:
+        """Get cached results for several URLs in one pipelined round trip"""
+        self._ensure_listener()
+        results = {}
+        pending = {}
+        for url in urls:
+            cache_key = get_cache_key(url)
+            data = self._local_get(cache_key)
+            if data is not None:
+                results[url] = data
+            else:
+                pending.setdefault(cache_key, []).append(url)
+        
+        if not pending:
+            return results
+        
+        cache_keys = list(pending)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for start in range(0, len(cache_keys), MGET_BATCH_SIZE):
+                pipe.mget([self._audit_key(key) for key in cache_keys[start:start + MGET_BATCH_SIZE]])
+            values = [raw for batch in pipe.execute() for raw in batch]
+        except Exception as e:
+            fallback = self._use_fallback('get_many', e)
+            if fallback:
+                results.update(fallback([url for urls_for_key in pending.values() for url in urls_for_key]))
+            return results
+        
+        for cache_key, raw in zip(cache_keys, values):
+            data = self._decode(cache_key, raw)
+            if data is not None:
+                for url in pending[cache_key]:
+                    results[url] = data
+        return results
+    
+    def set(self, url: str, data: Dict[Any, Any], ttl: Optional[int] = None) -> bool:
+        """Cache audit result with a server-side TTL"""
+        self._ensure_listener()
+        cache_key = get_cache_key(url)
+        
+        if ttl is None:
+            ttl = self.default_ttl
+        
+        cache_data = {
+            'data': data,
+            'cached_at': time.time(),
+            'expires_at': time.time() + ttl,
+            'url': url
+        }
+        
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(self._audit_key(cache_key), json.dumps(cache_data), ex=max(1, int(ttl)))
+            self._publish_invalidation(pipe, cache_key)
+            pipe.execute()
+        except Exception as e:
+            fallback = self._use_fallback('set', e)
+            return fallback(url, data, ttl) if fallback else False
+        
+        self._local_put(cache_key, data, cache_data['expires_at'])
+        return True
+    
+    def delete(self, url: str) -> bool:
+        """Delete cached result"""
+        cache_key = get_cache_key(url)
+        self._local_drop(cache_key)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(self._audit_key(cache_key))
+            self._publish_invalidation(pipe, cache_key)
+            pipe.execute()
+            return True
+        except Exception as e:
+            fallback = self._use_fallback('delete', e)
+            return fallback(url) if fallback else False
+    
+    def clear(self) -> int:
+        """Clear all cached results"""
+        self._local_drop()
+        cleared = 0
+        try:
+            # Only audit and failure entries; other state may share the prefix or the database
+            for pattern in (self._audit_key('*'), f'{self.prefix}failure:*'):
+                batch = []
+                for key in self.client.scan_iter(match=pattern, count=500):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        cleared += self.client.delete(*batch)
+                        batch = []
+                if batch:
+                    cleared += self.client.delete(*batch)
+            self.client.publish(self.channel, f'{self._instance_id}:*')
+        except Exception as e:
+            logger.warning(f'Redis cache clear failed: {e}')
+        
+        if self.fallback is not None:
+            cleared += self.fallback.clear()
+        return cleared
+    
+    def get_failure(self, url: str) -> Optional[Dict[str, Any]]:
+        """Get an active negative cache entry for a URL or its host"""
+        scopes = list(get_failure_scopes(url).values())
+        try:
+            values = self.client.mget([self._failure_key(scope) for scope in scopes])
+        except Exception as e:
+            fallback = self._use_fallback('get_failure', e)
+            return fallback(url) if fallback else None
+        
+        now = time.time()
+        for raw in values:
+            if raw is None:
+                continue
+            entry = json.loads(raw)
+            if now < entry.get('retry_at', 0):
+                return {**entry, 'retry_in': int(entry['retry_at'] - now) + 1}
+        return None
+    
+    def record_failure(self, url: str, error_type: str, error: str = '') -> Optional[Dict[str, Any]]:
+        """Negative-cache a failed scrape with exponential backoff per host"""
+        if not NEGATIVE_CACHE_TTLS.get(error_type):
+            return None
+        
+        scope = get_failure_scope(url, error_type)
+        key = self._failure_key(scope)
+        try:
+            raw = self.client.get(key)
+            entry = build_failure_entry(scope, error_type, error, json.loads(raw) if raw else None)
+            self.client.set(key, json.dumps(entry), ex=max(1, int(entry['expires_at'] - time.time())))
+            return entry
+        except Exception as e:
+            fallback = self._use_fallback('record_failure', e)
+            return fallback(url, error_type, error) if fallback else None
+    
+    def clear_failures(self, url: str) -> None:
+        """Forget negative cache entries after a successful scrape"""
+        try:
+            self.client.delete(*[self._failure_key(scope) for scope in get_failure_scopes(url).values()])
+        except Exception as e:
+            fallback = self._use_fallback('clear_failures', e)
+            if fallback:
+                fallback(url)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get cache statistics from the server's own counters"""
+        try:
+            info = self.client.info()
+            # Counted by prefix rather than dbsize(), which includes every other key in the database
+            entries = sum(1 for _ in self.client.scan_iter(match=self._audit_key('*'), count=1000))
+        except Exception as e:
+            fallback = self._use_fallback('get_cache_stats', e)
+            return {**fallback(), 'backend': 'file'} if fallback else {'backend': 'redis', 'error': str(e)}
+        
+        hits = info.get('keyspace_hits', 0)
+        misses = info.get('keyspace_misses', 0)
+        with self._local_lock:
+            local_entries = len(self._local)
+        return {
+            'backend': 'redis',
+            'total_cached_items': entries,
+            'total_size_bytes': info.get('used_memory', 0),
+            'max_size_bytes': info.get('maxmemory', 0),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'evictions': info.get('evicted_keys', 0),
+            'expired': info.get('expired_keys', 0),
+            'local_entries': local_entries,
+            'cache_hit_potential': entries
+        }
+    
+    def cleanup_expired(self) -> int:
+        """Redis expires entries server-side; only the file fallback needs sweeping"""
+        return self.fallback.cleanup_expired() if self.fallback is not None else 0
+    
+    def run_maintenance(self) -> Dict[str, int]:
+        """Redis evicts under its own maxmemory policy; maintain the file fallback only"""
+        if self.fallback is not None:
+            return self.fallback.run_maintenance()
+        return {'expired': 0, 'evicted': 0}
+    
+    def stop_janitor(self) -> None:
+        """Stop the invalidation listener"""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self._listener_pid = None
+        if self.fallback is not None:
+            self.fallback.stop_janitor()
@@ -0,0 +1,294 @@
+# File: services/render_pool.py
+# Process pool that renders PDF reports off the request path
+
+import os
+import time
+import queue
+import signal
+import logging
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Tuple
+from config.settings import (
+    RENDER_POOL_WORKERS, RENDER_QUEUE_SIZE, RENDER_TIMEOUT, RENDER_CALLBACK_WORKERS
+)
+from services.report_cache import (
+    render_pdf_cached, render_comparison_cached, get_report_path, get_comparison_path
+)
+
+logger = logging.getLogger(__name__)
+
+class RenderQueueFull(Exception):
+    """Raised through the future when too many renders are already pending"""
+
+class RenderTimeout(Exception):
+    """Raised through the future when a render runs longer than RENDER_TIMEOUT"""
+
+# Seconds between watchdog checks for renders past their deadline
+WATCHDOG_INTERVAL = 0.25
+
+# Times a render is resubmitted after another render broke the pool under it
+RENDER_RETRIES = 1
+
+_lock = threading.Lock()
+_pid = None
+_executor = None
+_callback_executor = None
+_started = None  # render processes report (job id, pid) here when a job starts running
+_pending = 0
+_in_flight = {}  # report path -> future, so identical renders share one job
+_jobs = {}  # job id -> _Job, for renders queued or running in the pool
+_job_ids = itertools.count()
+
+_worker_started = None  # in render processes: the queue job starts are reported on
+
+class _Job:
+    """One render request, kept so it can be timed from its start and resubmitted if the pool is replaced"""
+    
+    def __init__(self, path: str, timeout: float, func: Callable, args: tuple, outer: Future):
+        self.id = next(_job_ids)
+        self.path = path
+        self.timeout = timeout
+        self.func = func
+        self.args = args
+        self.outer = outer
+        self.retries = 0
+        self.executor = None
+        self.pid = None
+        self.deadline = None  # set once a render process picks the job up
+
+def _init_worker(started=None):
+    """Preload ReportLab, its standard fonts and the report template in each render process"""
+    global _worker_started
+    _worker_started = started
+    from reportlab.pdfbase import pdfmetrics
+    from services.report_generator import get_report_template
+    for font_name in ('Helvetica', 'Helvetica-Bold', 'Helvetica-Oblique', 'Helvetica-BoldOblique'):
+        pdfmetrics.getFont(font_name)
+    get_report_template()
+
+def _run_job(job_id: int, func: Callable, *args):
+    """Runs in a render process: report the start so the deadline excludes time spent queued"""
+    if _worker_started is not None:
+        _worker_started.put((job_id, os.getpid()))
+    return func(*args)
+
+def _render_in_worker(audit_data: Dict, website_data: Dict):
+    return render_pdf_cached(audit_data, website_data)
+
+def _render_comparison_in_worker(sites: List[Tuple[str, Dict]]):
+    return render_comparison_cached(sites)
+
+def _get_executors():
+    """Create the pools once per process; pools and threads don't survive Gunicorn's fork"""
+    global _pid, _executor, _callback_executor, _started, _pending
+    with _lock:
+        if _pid != os.getpid():
+            _pid = os.getpid()
+            _pending = 0
+            _in_flight.clear()
+            _jobs.clear()
+            _executor = None
+            _started = None
+            _callback_executor = ThreadPoolExecutor(
+                max_workers=RENDER_CALLBACK_WORKERS, thread_name_prefix='render-callback'
+            )
+        if _executor is None and RENDER_POOL_WORKERS > 0:
+            # spawn avoids inheriting locks held by threads in the forking worker
+            context = multiprocessing.get_context('spawn')
+            if _started is None:
+                _started = context.Queue()
+                threading.Thread(target=_watch, args=(_started,), name='render-watchdog', daemon=True).start()
+            _executor = ProcessPoolExecutor(
+                max_workers=RENDER_POOL_WORKERS,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(_started,)
+            )
+        return _executor, _callback_executor
+
+def _watch(started) -> None:
+    """Start each job's deadline when it begins running and expire the ones that overrun it"""
+    while True:
+        try:
+            message = started.get(timeout=WATCHDOG_INTERVAL)
+            if message is None:
+                return  # shutdown
+            job_id, pid = message
+            with _lock:
+                job = _jobs.get(job_id)
+                if job is not None:
+                    job.pid = pid
+                    job.deadline = time.monotonic() + job.timeout
+        except queue.Empty:
+            pass
+        except (EOFError, OSError):
+            return
+        
+        now = time.monotonic()
+        with _lock:
+            overdue = [job for job in _jobs.values() if job.deadline is not None and now > job.deadline]
+            for job in overdue:
+                job.deadline = None
+        for job in overdue:
+            _expire(job.outer, job.timeout, job)
+
+def _settle(future: Future, result=None, error: Exception = None) -> None:
+    """Resolve a future unless the timeout already did"""
+    with _lock:
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+def _recycle(executor: ProcessPoolExecutor, reason: str, pid: int = None) -> None:
+    """Retire a stuck or broken pool, killing the stuck process; the next submit starts a fresh one"""
+    global _executor
+    with _lock:
+        if _executor is not executor:
+            return  # already replaced
+        _executor = None
+    logger.error(f'Restarting render pool: {reason}')
+    if pid is not None:
+        # The pool notices the dead process and fails its other jobs, which _finished resubmits
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    executor.shutdown(wait=False)
+
+def _finished(render: Future, job: _Job, executor: ProcessPoolExecutor) -> None:
+    global _pending
+    result, error = None, None
+    try:
+        result = render.result()
+    except BrokenProcessPool as e:
+        # Replace the pool on the next submit instead of failing every render from now on
+        _recycle(executor, f'pool broke: {e}')
+        if not job.outer.done() and job.retries < RENDER_RETRIES:
+            # A bystander of another render's crash or timeout: run it again on the fresh pool
+            job.retries += 1
+            try:
+                _start(job)
+                return
+            except Exception as retry_error:
+                e = retry_error
+        error = e
+    except Exception as e:
+        error = e
+    
+    with _lock:
+        _pending -= 1
+        _in_flight.pop(job.path, None)
+        _jobs.pop(job.id, None)
+    _settle(job.outer, result=result, error=error)
+
+def _expire(outer: Future, timeout: float, job: _Job = None) -> None:
+    _settle(outer, error=RenderTimeout(f'PDF render ran longer than {timeout}s'))
+    # A hung render would otherwise hold its process (and a queue slot) forever
+    if job is not None and job.pid is not None:
+        _recycle(job.executor, f'render ran longer than {timeout}s', job.pid)
+
+def submit_render(audit_data: Dict, website_data: Dict, timeout: float = RENDER_TIMEOUT) -> Future:
+    """Queue a PDF render and return a future for its path (None if rendering failed)"""
+    path = get_report_path(audit_data, website_data['url'], website_data.get('audit_date'))
+    return _submit(path, timeout, _render_in_worker, audit_data, website_data)
+
+def submit_comparison_render(sites: List[Tuple[str, Dict]], timeout: float = RENDER_TIMEOUT) -> Future:
+    """Queue a comparison PDF render for (url, audit data) pairs and return a future for its path"""
+    return _submit(get_comparison_path(sites), timeout, _render_comparison_in_worker, sites)
+
+def _start(job: _Job) -> None:
+    """Submit a job to the current pool; the watchdog arms its deadline once it starts running"""
+    executor, _ = _get_executors()
+    if executor is None:
+        raise RuntimeError('render pool is shut down')
+    with _lock:
+        job.executor = executor
+        job.pid = job.deadline = None
+        _jobs[job.id] = job
+    render = executor.submit(_run_job, job.id, job.func, *job.args)
+    render.add_done_callback(lambda done: _finished(done, job, executor))
+
+def _submit(path: str, timeout: float, func: Callable, *args) -> Future:
+    global _pending
+    executor, _ = _get_executors()
+    outer = Future()
+    
+    if executor is None:
+        # Pool disabled: render inline, still returning a future
+        try:
+            outer.set_result(func(*args))
+        except Exception as e:
+            outer.set_exception(e)
+        return outer
+    
+    with _lock:
+        if path in _in_flight:
+            return _in_flight[path]
+        if _pending >= RENDER_QUEUE_SIZE:
+            outer.set_exception(RenderQueueFull(f'{_pending} renders already queued'))
+            return outer
+        _pending += 1
+        _in_flight[path] = outer
+    
+    job = _Job(path, timeout, func, args, outer)
+    try:
+        _start(job)
+    except Exception as e:
+        with _lock:
+            _pending -= 1
+            _in_flight.pop(path, None)
+            _jobs.pop(job.id, None)
+        outer.set_exception(e)
+    return outer
+
+def on_done(future: Future, callback: Callable) -> Future:
+    """Run callback(future) on a helper thread once it resolves, returning a future for its result"""
+    _, callback_executor = _get_executors()
+    chained = Future()
+    
+    def _run():
+        try:
+            chained.set_result(callback(future))
+        except Exception as e:
+            chained.set_exception(e)
+    
+    future.add_done_callback(lambda _: callback_executor.submit(_run))
+    return chained
+
+def is_rendering(filename: str) -> bool:
+    """Whether a report with this filename is still queued or rendering"""
+    with _lock:
+        return any(os.path.basename(path) == filename for path in _in_flight)
+
+def get_pool_stats() -> Dict:
+    """Current pool configuration and queue depth"""
+    with _lock:
+        return {
+            'workers': RENDER_POOL_WORKERS,
+            'pending': _pending,
+            'queue_size': RENDER_QUEUE_SIZE,
+            'timeout': RENDER_TIMEOUT
+        }
+
+def shutdown(wait: bool = True) -> None:
+    """Stop the render processes and helper threads"""
+    global _pid, _executor, _callback_executor, _started, _pending
+    with _lock:
+        executor, callback_executor, started = _executor, _callback_executor, _started
+        _pid = _executor = _callback_executor = _started = None
+        _pending = 0
+        _in_flight.clear()
+        _jobs.clear()
+    if executor is not None:
+        executor.shutdown(wait=wait)
+    if started is not None:
+        started.put(None)  # stops the watchdog
+    if callback_executor is not None:
+        callback_executor.shutdown(wait=wait)
@@ -0,0 +1,261 @@
+# File: services/report_cache.py
+# Content-addressed store of rendered PDF reports with an index, LRU/age retention and a disk budget
+
+import os
+import re
+import json
+import time
+import hmac
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from config.settings import (
+    REPORTS_DIR, REPORT_CACHE_MAX_AGE, REPORT_CACHE_MAX_BYTES, REPORT_CACHE_CLEANUP_INTERVAL, REPORT_PDF_PROFILE,
+    SECRET_KEY, DEFAULT_SECRET_KEY, PUBLIC_BASE_URL, REPORT_LINK_TTL
+)
+from services.report_generator import (
+    generate_pdf_report, generate_comparison_report, get_report_slug, format_audit_date, REPORT_TEMPLATE_VERSION
+)
+from models import database
+
+logger = logging.getLogger(__name__)
+
+# Keys added to audit data by the email/API layers that don't change the rendered report
+VOLATILE_KEYS = {'website_url', 'cached', 'email_sent', 'pdf_path', 'report_id', 'report_url', 'pdf_url'}
+
+# Report filenames end in their content hash: audit_<slug>_<hash16>.pdf
+HASHED_REPORT_RE = re.compile(r'_([0-9a-f]{16})\.pdf$')
+
+_etag_lock = threading.Lock()
+_etags = {}  # (path, mtime_ns, size) -> etag for reports without a hash in the name
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+def get_report_hash(audit_data: Dict, url: str, audit_date: str = None) -> str:
+    """Hash of everything that determines the rendered PDF"""
+    content = {key: value for key, value in audit_data.items() if key not in VOLATILE_KEYS}
+    key = {'template': REPORT_TEMPLATE_VERSION, 'profile': REPORT_PDF_PROFILE, 'url': url, 'audit': content}
+    if audit_date:
+        # Stored audits print their own date, so the same data audited on another day is another PDF
+        key['date'] = format_audit_date(audit_date)
+    payload = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def get_report_path(audit_data: Dict, url: str, audit_date: str = None) -> str:
+    """Deterministic report path for this audit data and template version"""
+    report_hash = get_report_hash(audit_data, url, audit_date)
+    return os.path.join(REPORTS_DIR, f"audit_{get_report_slug(url)}_{report_hash[:16]}.pdf")
+
+def render_pdf_cached(audit_data: Dict, website_data: Dict) -> Optional[str]:
+    """Return the cached PDF for this audit data, rendering it only on a miss"""
+    url = website_data['url']
+    audit_date = website_data.get('audit_date')
+    return _render_cached(
+        get_report_path(audit_data, url, audit_date), url, get_report_hash(audit_data, url, audit_date),
+        lambda path: generate_pdf_report(audit_data, website_data, filepath=path)
+    )
+
+def get_comparison_hash(sites: List[Tuple[str, Dict]]) -> str:
+    """Hash of everything that determines a comparison PDF (site order matters)"""
+    return hashlib.sha256('|'.join(get_report_hash(audit, url) for url, audit in sites).encode()).hexdigest()
+
+def get_comparison_path(sites: List[Tuple[str, Dict]]) -> str:
+    """Deterministic comparison report path, named after the client (first) site"""
+    return os.path.join(
+        REPORTS_DIR, f"compare_{get_report_slug(sites[0][0])}_{get_comparison_hash(sites)[:16]}.pdf"
+    )
+
+def render_comparison_cached(sites: List[Tuple[str, Dict]]) -> Optional[str]:
+    """Return the cached comparison PDF for these audits, rendering it only on a miss"""
+    return _render_cached(
+        get_comparison_path(sites), sites[0][0], get_comparison_hash(sites),
+        lambda path: generate_comparison_report(sites, path)
+    )
+
+def _render_cached(filepath: str, url: str, report_hash: str, render) -> Optional[str]:
+    filename = os.path.basename(filepath)
+    
+    if os.path.exists(filepath):
+        # Mark as used so LRU retention keeps it
+        _index_call(database.touch_report_file, filename)
+        logger.info(f'Report cache hit: {filename}')
+        return filepath
+    
+    # Render to a private temp file so concurrent renders never expose a partial PDF
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if not render(tmp_path):
+        _remove_report(tmp_path)
+        return None
+    os.replace(tmp_path, filepath)
+    
+    _index_call(database.record_report_file, filename, url, report_hash, os.path.getsize(filepath))
+    maybe_cleanup_reports()
+    return filepath
+
+def lookup_report(filename: str) -> Optional[Dict]:
+    """Index entry for a report file, marking it as used; None if it isn't stored"""
+    record = _index_call(database.get_report_file, filename)
+    if record:
+        _index_call(database.touch_report_file, filename)
+    return record
+
+def get_report_etag(filepath: str) -> Optional[str]:
+    """Strong ETag for a report file, taken from its name when content-addressed"""
+    match = HASHED_REPORT_RE.search(os.path.basename(filepath))
+    if match:
+        return match.group(1)
+    
+    # Older timestamped reports: hash the bytes once per file version
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    key = (filepath, stat.st_mtime_ns, stat.st_size)
+    with _etag_lock:
+        if key in _etags:
+            return _etags[key]
+    
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:16]
+    with _etag_lock:
+        if len(_etags) >= 1024:
+            _etags.clear()
+        _etags[key] = etag
+    return etag
+
+def sign_report_link(filename: str, expires: int) -> str:
+    """HMAC of a report filename and its link expiry"""
+    message = f'{filename}:{expires}'.encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def can_sign_links() -> bool:
+    """Whether SECRET_KEY is set; the shipped default is public, so links signed with it prove nothing"""
+    return bool(SECRET_KEY) and SECRET_KEY != DEFAULT_SECRET_KEY
+
+def get_signed_report_url(filepath: str, ttl: int = REPORT_LINK_TTL) -> Optional[str]:
+    """Absolute download link for a report file that stops working after ttl seconds (None without a SECRET_KEY)"""
+    if not can_sign_links():
+        logger.warning('SECRET_KEY is not set, not issuing a signed report link')
+        return None
+    filename = os.path.basename(filepath)
+    expires = int(time.time()) + ttl
+    return f'{PUBLIC_BASE_URL.rstrip("/")}/api/reports/{filename}?expires={expires}&sig={sign_report_link(filename, expires)}'
+
+def verify_report_link(filename: str, expires: str, signature: str) -> bool:
+    """Whether a signed link is genuine and not yet expired"""
+    if not can_sign_links():
+        return False
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(sign_report_link(filename, expires), signature or '')
+
+def sync_report_index() -> Dict[str, int]:
+    """Index report files that aren't tracked yet and drop entries whose file is gone"""
+    records = {record['filename']: record for record in database.get_report_files()}
+    added = 0
+    
+    with os.scandir(REPORTS_DIR) as entries:
+        on_disk = set()
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith('.pdf'):
+                continue
+            on_disk.add(entry.name)
+            if entry.name in records:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            # Untracked (older timestamped reports, or written before the index existed)
+            match = HASHED_REPORT_RE.search(entry.name)
+            database.record_report_file(
+                entry.name, None, match.group(1) if match else None, stat.st_size, created_at=stat.st_mtime
+            )
+            added += 1
+    
+    missing = [name for name in records if name not in on_disk]
+    database.delete_report_files(missing)
+    return {'indexed': added, 'dropped': len(missing)}
+
+def cleanup_reports(max_age: int = REPORT_CACHE_MAX_AGE, max_bytes: int = REPORT_CACHE_MAX_BYTES) -> Dict[str, int]:
+    """Delete reports unused for max_age seconds, then the least recently used over max_bytes"""
+    now = time.time()
+    removed_expired = []
+    removed_over_budget = []
+    
+    try:
+        sync_report_index()
+        records = database.get_report_files()  # least recently used first
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f'Report cleanup could not read the report index: {e}')
+        return {'removed_expired': 0, 'removed_over_budget': 0, 'total_bytes': 0}
+    
+    kept = []
+    for record in records:
+        if max_age and now - record['last_accessed'] > max_age:
+            _remove_report(os.path.join(REPORTS_DIR, record['filename']))
+            removed_expired.append(record['filename'])
+        else:
+            kept.append(record)
+    
+    total_bytes = sum(record['size'] for record in kept)
+    if max_bytes:
+        for record in kept:
+            if total_bytes <= max_bytes:
+                break
+            _remove_report(os.path.join(REPORTS_DIR, record['filename']))
+            removed_over_budget.append(record['filename'])
+            total_bytes -= record['size']
+    
+    _index_call(database.delete_report_files, removed_expired + removed_over_budget)
+    return {
+        'removed_expired': len(removed_expired),
+        'removed_over_budget': len(removed_over_budget),
+        'total_bytes': total_bytes
+    }
+
+def get_report_store_stats() -> Dict:
+    """Indexed report count, size and disk budget"""
+    stats = _index_call(database.get_report_file_stats) or {}
+    stats['max_bytes'] = REPORT_CACHE_MAX_BYTES
+    stats['max_age'] = REPORT_CACHE_MAX_AGE
+    return stats
+
+def maybe_cleanup_reports() -> None:
+    """Run cleanup at most once per REPORT_CACHE_CLEANUP_INTERVAL"""
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.time() - _last_cleanup < REPORT_CACHE_CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.time()
+    try:
+        result = cleanup_reports()
+        if result['removed_expired'] or result['removed_over_budget']:
+            logger.info(f'Report cleanup: {result}')
+    except Exception as e:
+        logger.error(f'Report cleanup failed: {e}')
+
+def _index_call(func, *args, **kwargs):
+    """Run a report index query; the index only speeds things up, so errors are logged and ignored"""
+    try:
+        return func(*args, **kwargs)
+    except sqlite3.Error as e:
+        logger.warning(f'Report index {func.__name__} failed: {e}')
+        return None
+
+def _remove_report(path: str) -> bool:
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
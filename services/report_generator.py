@@ -2,67 +2,251 @@
 # Enhanced PDF report generation - SIMPLE VERSION
 # Just replace your existing report_generator.py with this
 
-from __future__ import annotations
 import os
+import copy
 import urllib.parse
 import html
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional  # FIX: Added the missing import
+from typing import Dict, List, Optional, Tuple  # FIX: Added the missing import
 
+from reportlab import rl_config
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.units import inch
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, KeepTogether
+    PageBreak
 )
 
-from config.settings import REPORTS_DIR
+from config.settings import REPORTS_DIR, REPORT_PDF_PROFILE
 
 # Default visitor value if not in settings
 VISITOR_VALUE_USD = 50
 
+# Bump whenever the report layout changes so cached renders are rebuilt
+REPORT_TEMPLATE_VERSION = "1"
 
-def generate_pdf_report(audit_data: Dict, website_data: Dict) -> Optional[str]:
-    """Enhanced PDF report using only existing data"""
-    
-    # Build filename (same as before)
-    slug = urllib.parse.quote(
-        website_data["url"].replace("https://", "").replace("http://", "").rstrip("/"),
+
+def format_audit_date(created_at: Optional[str] = None) -> str:
+    """Report date for a stored audit timestamp (SQLite UTC), or today for a fresh audit"""
+    if created_at:
+        try:
+            return datetime.strptime(str(created_at)[:19], "%Y-%m-%d %H:%M:%S").strftime("%B %d, %Y")
+        except ValueError:
+            pass
+    return datetime.now().strftime("%B %d, %Y")
+
+
+def get_report_slug(url: str) -> str:
+    """Filesystem-safe slug for a website URL"""
+    return urllib.parse.quote(
+        url.replace("https://", "").replace("http://", "").rstrip("/"),
         safe="",
     )
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"audit_{slug}_{timestamp}.pdf"
-    filepath = os.path.join(REPORTS_DIR, filename)
-    os.makedirs(REPORTS_DIR, exist_ok=True)
+
+
+# PDF build profiles. Reports only use the standard 14 fonts, which PDF viewers
+# supply themselves, so no font data is embedded and there is nothing to subset.
+# The size win is in the content streams: ReportLab wraps every compressed
+# stream in ASCII85 by default, which inflates it by a quarter for no benefit
+# in a binary file.
+REPORT_PROFILES = {
+    "compact": {"pageCompression": 1, "use_a85": False, "invariant": 1},
+    "standard": {"pageCompression": 1, "use_a85": True, "invariant": 0},
+    "uncompressed": {"pageCompression": 0, "use_a85": False, "invariant": 0},
+}
+
+
+def get_report_profile(name: Optional[str] = None) -> Dict:
+    """Build settings for a named profile, falling back to the configured one"""
+    return REPORT_PROFILES.get(name or REPORT_PDF_PROFILE, REPORT_PROFILES["compact"])
+
+
+def new_report_document(filepath: str, profile: Optional[str] = None) -> SimpleDocTemplate:
+    """Letter-size document using the given build profile"""
+    build = get_report_profile(profile)
+    # Stream encoding is a ReportLab global; every render in a process normally uses the same profile
+    rl_config.useA85 = int(build["use_a85"])
+    return SimpleDocTemplate(
+        filepath, pagesize=letter,
+        pageCompression=build["pageCompression"], invariant=build["invariant"]
+    )
+
+
+class ReportTemplate:
+    """Styles and static flowables shared by every report, built once per process"""
     
-    try:
-        doc = SimpleDocTemplate(filepath, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        self.normal = self.styles["Normal"]
         
         # Enhanced styles
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             "CustomTitle",
-            parent=styles["Heading1"],
+            parent=self.styles["Heading1"],
             fontSize=28,
             textColor=colors.HexColor("#764ba2"),
             spaceAfter=30,
             alignment=1,  # Center
         )
         
-        section_style = ParagraphStyle(
+        self.section_style = ParagraphStyle(
             "SectionHeader",
-            parent=styles["Heading2"],
+            parent=self.styles["Heading2"],
             fontSize=18,
             textColor=colors.HexColor("#764ba2"),
             spaceAfter=20,
             spaceBefore=20,
         )
         
+        self.summary_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f0f0f0")),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ])
+        
+        self.grid_table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ])
+        
+        self._paragraphs = {}
+    
+    def static(self, text: str, style: Optional[ParagraphStyle] = None) -> Paragraph:
+        """Paragraph for fixed text, parsed once and handed out as a fresh copy per report"""
+        style = style or self.normal
+        key = (text, style.name)
+        paragraph = self._paragraphs.get(key)
+        if paragraph is None:
+            paragraph = self._paragraphs[key] = Paragraph(text, style)
+        # Layout state is stored on the flowable, so each story needs its own copy
+        return copy.copy(paragraph)
+    
+    def paragraph(self, text: str, style: Optional[ParagraphStyle] = None) -> Paragraph:
+        """Paragraph for data-dependent text"""
+        return Paragraph(text, style or self.normal)
+
+
+_template: Optional[ReportTemplate] = None
+_template_lock = threading.Lock()
+
+
+def get_report_template() -> ReportTemplate:
+    """Get the process-wide report template, building it on first use"""
+    global _template
+    if _template is None:
+        with _template_lock:
+            if _template is None:
+                _template = ReportTemplate()
+    return _template
+
+
+# Score band -> (assessment, recommended action)
+SCORE_INTERPRETATIONS = {
+    "high": ("Excellent - Your site is well-optimized for AI search",
+             "Focus on maintaining your advantage and fine-tuning"),
+    "medium": ("Good - But missing key optimizations competitors use",
+               "Implement our priority fixes to jump ahead"),
+    "low": ("Critical - Your site is nearly invisible to AI search",
+            "Urgent action needed to prevent further traffic loss"),
+}
+
+# (keywords, explanation lines) checked in order against each critical issue
+ISSUE_CONTEXT = [
+    (("schema",), [
+        "→ <i>Why it matters: AI systems use schema to understand your content. "
+        "Without it, you're invisible to AI-powered features.</i>",
+        "→ <i>How to fix: Add JSON-LD structured data to your pages. "
+        "Use Google's Structured Data Testing Tool to validate.</i>",
+    ]),
+    (("alt",), [
+        "→ <i>Why it matters: AI can't 'see' images without alt text. "
+        "You're missing voice search and accessibility traffic.</i>",
+        "→ <i>How to fix: Add descriptive alt text (5-15 words) to all images. "
+        "Include your target keywords naturally.</i>",
+    ]),
+    (("h1", "heading"), [
+        "→ <i>Why it matters: H1 tags tell AI the main topic of your page. "
+        "Missing H1s confuse AI about your content.</i>",
+        "→ <i>How to fix: Add one clear H1 per page with your main keyword. "
+        "Keep it under 60 characters.</i>",
+    ]),
+]
+DEFAULT_ISSUE_CONTEXT = [
+    "→ <i>Impact: This issue affects your visibility in AI search results.</i>",
+]
+
+TIMELINE_ROWS = [
+    ["Timeframe", "Actions", "Expected Results"],
+    ["Week 1-2", "Complete Quick Wins", "+5-10% AI visibility"],
+    ["Month 1", "Fix Critical Issues", "+15-25% search traffic"],
+    ["Month 2-3", "Full Optimization", "+40-60% overall visibility"],
+    ["Month 6", "Ongoing Refinement", "2-3x organic traffic"],
+]
+
+NEXT_STEPS = [
+    "1. Start with the Quick Wins - these can be done today",
+    "2. Schedule time to address Critical Issues (aim for 1-2 per week)",
+    "3. Monitor your scores in Google Search Console",
+    "4. Re-audit in 60 days to track improvement",
+    "5. Consider professional help for complex technical issues"
+]
+
+
+def get_score_band(score: int) -> str:
+    if score >= 80:
+        return "high"
+    elif score >= 60:
+        return "medium"
+    return "low"
+
+
+def get_category_status(score: int) -> Tuple[str, str]:
+    """(status, priority) labels for a category score"""
+    if score >= 80:
+        return "Strong", "Maintain"
+    elif score >= 60:
+        return "Moderate", "Improve"
+    return "Weak", "Critical"
+
+
+def get_issue_context(issue: str) -> List[str]:
+    """Explanation lines shown under a critical issue"""
+    issue_lower = issue.lower()
+    for keywords, lines in ISSUE_CONTEXT:
+        if any(keyword in issue_lower for keyword in keywords):
+            return lines
+    return DEFAULT_ISSUE_CONTEXT
+
+
+def generate_pdf_report(audit_data: Dict, website_data: Dict, filepath: Optional[str] = None,
+                        profile: Optional[str] = None) -> Optional[str]:
+    """Enhanced PDF report using only existing data"""
+    
+    # Build filename (same as before) unless the caller chose the output path
+    if filepath is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"audit_{get_report_slug(website_data['url'])}_{timestamp}.pdf"
+        filepath = os.path.join(REPORTS_DIR, filename)
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    
+    try:
+        doc = new_report_document(filepath, profile)
+        t = get_report_template()
+        story = []
+        
         # ENHANCED TITLE PAGE
-        story.append(Paragraph("AI SEO AUDIT REPORT", title_style))
+        story.append(t.static("AI SEO AUDIT REPORT", t.title_style))
         story.append(Spacer(1, 30))
         
         # Executive Summary Box
@@ -74,7 +258,7 @@ def generate_pdf_report(audit_data: Dict, website_data: Dict) -> Optional[str]:
         
         exec_data = [
             ["Website:", url_display],
-            ["Audit Date:", datetime.now().strftime('%B %d, %Y')],
+            ["Audit Date:", format_audit_date(website_data.get("audit_date"))],
             ["Overall Score:", f"{score}/100"],
             ["Critical Issues:", str(critical_count)],
             ["Est. Monthly Traffic Loss:", f"{traffic_loss:,} visitors"],
@@ -82,35 +266,19 @@ def generate_pdf_report(audit_data: Dict, website_data: Dict) -> Optional[str]:
         ]
         
         exec_table = Table(exec_data, colWidths=[2.5*inch, 3.5*inch])
-        exec_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor("#f0f0f0")),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-        ]))
+        exec_table.setStyle(t.summary_table_style)
         story.append(exec_table)
         story.append(Spacer(1, 30))
         
         # Score interpretation
-        if score >= 80:
-            interpretation = "Excellent - Your site is well-optimized for AI search"
-            action = "Focus on maintaining your advantage and fine-tuning"
-        elif score >= 60:
-            interpretation = "Good - But missing key optimizations competitors use"
-            action = "Implement our priority fixes to jump ahead"
-        else:
-            interpretation = "Critical - Your site is nearly invisible to AI search"
-            action = "Urgent action needed to prevent further traffic loss"
-            
-        story.append(Paragraph(f"<b>Assessment:</b> {interpretation}", styles["Normal"]))
-        story.append(Paragraph(f"<b>Recommended Action:</b> {action}", styles["Normal"]))
+        interpretation, action = SCORE_INTERPRETATIONS[get_score_band(score)]
+        story.append(t.static(f"<b>Assessment:</b> {interpretation}"))
+        story.append(t.static(f"<b>Recommended Action:</b> {action}"))
         
         story.append(PageBreak())
         
         # CATEGORY SCORES WITH INTERPRETATION
-        story.append(Paragraph("Performance by Category", section_style))
+        story.append(t.static("Performance by Category", t.section_style))
         
         categories = audit_data.get("category_scores", audit_data.get("categories", {}))
         if categories:
@@ -120,159 +288,82 @@ def generate_pdf_report(audit_data: Dict, website_data: Dict) -> Optional[str]:
                 cat_name = cat.replace("_", " ").title()
                 
                 # Add status and priority based on score
-                if score >= 80:
-                    status = "Strong"
-                    priority = "Maintain"
-                elif score >= 60:
-                    status = "Moderate"
-                    priority = "Improve"
-                else:
-                    status = "Weak"
-                    priority = "Critical"
+                status, priority = get_category_status(score)
                     
                 cat_data.append([cat_name, f"{score}/100", status, priority])
             
             cat_table = Table(cat_data, colWidths=[2.5*inch, 1*inch, 1*inch, 1*inch])
-            cat_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ]))
+            cat_table.setStyle(t.grid_table_style)
             story.append(cat_table)
         
         story.append(Spacer(1, 30))
         
         # PRIORITY ACTION PLAN (Quick Wins First)
-        story.append(Paragraph("Priority Action Plan", section_style))
-        story.append(Paragraph(
-            "We've organized issues by impact and effort. Start with Quick Wins for immediate results:",
-            styles["Normal"]
+        story.append(t.static("Priority Action Plan", t.section_style))
+        story.append(t.static(
+            "We've organized issues by impact and effort. Start with Quick Wins for immediate results:"
         ))
         story.append(Spacer(1, 15))
         
         # Quick Wins Section
         if audit_data.get("quick_wins"):
-            story.append(Paragraph("<b>🎯 Quick Wins (Do These First!)</b>", styles["Normal"]))
-            story.append(Paragraph("High impact, low effort - can be done in hours:", styles["Normal"]))
+            story.append(t.static("<b>🎯 Quick Wins (Do These First!)</b>"))
+            story.append(t.static("High impact, low effort - can be done in hours:"))
             story.append(Spacer(1, 10))
             
             for i, win in enumerate(audit_data["quick_wins"][:5], 1):
-                story.append(Paragraph(f"{i}. {html.escape(win)}", styles["Normal"]))
-                story.append(Paragraph(f"   <i>Estimated time: 30-60 minutes</i>", styles["Normal"]))
+                story.append(t.paragraph(f"{i}. {html.escape(win)}"))
+                story.append(t.static("   <i>Estimated time: 30-60 minutes</i>"))
                 story.append(Spacer(1, 5))
         
         story.append(Spacer(1, 20))
         
         # Critical Issues with Details
-        story.append(Paragraph("<b>⚠️ Critical Issues (Address Within 30 Days)</b>", styles["Normal"]))
+        story.append(t.static("<b>⚠️ Critical Issues (Address Within 30 Days)</b>"))
         story.append(Spacer(1, 10))
         
         for i, issue in enumerate(audit_data.get("critical_issues", [])[:5], 1):
-            story.append(Paragraph(f"<b>Issue {i}:</b> {html.escape(issue)}", styles["Normal"]))
+            story.append(t.paragraph(f"<b>Issue {i}:</b> {html.escape(issue)}"))
             
             # Add helpful context based on issue type
-            if "schema" in issue.lower():
-                story.append(Paragraph(
-                    "→ <i>Why it matters: AI systems use schema to understand your content. "
-                    "Without it, you're invisible to AI-powered features.</i>",
-                    styles["Normal"]
-                ))
-                story.append(Paragraph(
-                    "→ <i>How to fix: Add JSON-LD structured data to your pages. "
-                    "Use Google's Structured Data Testing Tool to validate.</i>",
-                    styles["Normal"]
-                ))
-            elif "alt" in issue.lower():
-                story.append(Paragraph(
-                    "→ <i>Why it matters: AI can't 'see' images without alt text. "
-                    "You're missing voice search and accessibility traffic.</i>",
-                    styles["Normal"]
-                ))
-                story.append(Paragraph(
-                    "→ <i>How to fix: Add descriptive alt text (5-15 words) to all images. "
-                    "Include your target keywords naturally.</i>",
-                    styles["Normal"]
-                ))
-            elif "h1" in issue.lower() or "heading" in issue.lower():
-                story.append(Paragraph(
-                    "→ <i>Why it matters: H1 tags tell AI the main topic of your page. "
-                    "Missing H1s confuse AI about your content.</i>",
-                    styles["Normal"]
-                ))
-                story.append(Paragraph(
-                    "→ <i>How to fix: Add one clear H1 per page with your main keyword. "
-                    "Keep it under 60 characters.</i>",
-                    styles["Normal"]
-                ))
-            else:
-                story.append(Paragraph(
-                    "→ <i>Impact: This issue affects your visibility in AI search results.</i>",
-                    styles["Normal"]
-                ))
+            for line in get_issue_context(issue):
+                story.append(t.static(line))
             
             story.append(Spacer(1, 15))
         
         story.append(PageBreak())
         
         # ESTIMATED IMPACT SECTION
-        story.append(Paragraph("Expected Results Timeline", section_style))
-        
-        timeline_data = [
-            ["Timeframe", "Actions", "Expected Results"],
-            ["Week 1-2", "Complete Quick Wins", "+5-10% AI visibility"],
-            ["Month 1", "Fix Critical Issues", "+15-25% search traffic"],
-            ["Month 2-3", "Full Optimization", "+40-60% overall visibility"],
-            ["Month 6", "Ongoing Refinement", "2-3x organic traffic"],
-        ]
+        story.append(t.static("Expected Results Timeline", t.section_style))
         
-        timeline_table = Table(timeline_data, colWidths=[1.5*inch, 2.5*inch, 2*inch])
-        timeline_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
+        timeline_table = Table(TIMELINE_ROWS, colWidths=[1.5*inch, 2.5*inch, 2*inch])
+        timeline_table.setStyle(t.grid_table_style)
         story.append(timeline_table)
         
         story.append(Spacer(1, 30))
         
         # AI & VOICE SEARCH SPECIFIC ISSUES
         if audit_data.get("ai_search_issues") or audit_data.get("voice_search_issues"):
-            story.append(Paragraph("AI & Voice Search Optimization", section_style))
+            story.append(t.static("AI & Voice Search Optimization", t.section_style))
             
             if audit_data.get("ai_search_issues"):
-                story.append(Paragraph("<b>AI Search Issues:</b>", styles["Normal"]))
+                story.append(t.static("<b>AI Search Issues:</b>"))
                 for issue in audit_data["ai_search_issues"][:3]:
-                    story.append(Paragraph(f"• {html.escape(issue)}", styles["Normal"]))
+                    story.append(t.paragraph(f"• {html.escape(issue)}"))
                 story.append(Spacer(1, 15))
             
             if audit_data.get("voice_search_issues"):
-                story.append(Paragraph("<b>Voice Search Issues:</b>", styles["Normal"]))
+                story.append(t.static("<b>Voice Search Issues:</b>"))
                 for issue in audit_data["voice_search_issues"][:3]:
-                    story.append(Paragraph(f"• {html.escape(issue)}", styles["Normal"]))
+                    story.append(t.paragraph(f"• {html.escape(issue)}"))
         
         story.append(Spacer(1, 30))
         
         # NEXT STEPS SECTION
-        story.append(Paragraph("Your Next Steps", section_style))
-        
-        next_steps = [
-            "1. Start with the Quick Wins - these can be done today",
-            "2. Schedule time to address Critical Issues (aim for 1-2 per week)",
-            "3. Monitor your scores in Google Search Console",
-            "4. Re-audit in 60 days to track improvement",
-            "5. Consider professional help for complex technical issues"
-        ]
+        story.append(t.static("Your Next Steps", t.section_style))
         
-        for step in next_steps:
-            story.append(Paragraph(step, styles["Normal"]))
+        for step in NEXT_STEPS:
+            story.append(t.static(step))
             story.append(Spacer(1, 5))
         
         # Build PDF
@@ -281,4 +372,88 @@ def generate_pdf_report(audit_data: Dict, website_data: Dict) -> Optional[str]:
         
     except Exception as exc:
         print(f"❌ PDF generation failed: {exc}")
-        return None
\ No newline at end of file
+        return None
+
+
+def generate_comparison_report(sites: List[Tuple[str, Dict]], filepath: str,
+                               profile: Optional[str] = None) -> Optional[str]:
+    """One PDF comparing several audits side by side; the first site is the client"""
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    
+    try:
+        doc = new_report_document(filepath, profile)
+        t = get_report_template()
+        story = []
+        
+        story.append(t.static("AI SEO COMPARISON REPORT", t.title_style))
+        story.append(Spacer(1, 20))
+        story.append(t.paragraph(
+            f"<b>Your site:</b> {html.escape(sites[0][0])}<br/>"
+            f"<b>Compared with:</b> {', '.join(html.escape(url) for url, _ in sites[1:])}<br/>"
+            f"<b>Audit Date:</b> {datetime.now().strftime('%B %d, %Y')}"
+        ))
+        story.append(Spacer(1, 20))
+        
+        # Column headers are the site hostnames, wrapped so long names fit
+        headers = [t.paragraph(f"<b>{html.escape(get_report_slug(url))}</b>") for url, _ in sites]
+        site_width = 4.5 * inch / len(sites)
+        col_widths = [2 * inch] + [site_width] * len(sites)
+        
+        # OVERVIEW
+        story.append(t.static("Overview", t.section_style))
+        overview = [["", *headers]]
+        overview.append(["Overall Score", *[
+            f"{audit.get('overall_score', audit.get('score', 0))}/100" for _, audit in sites
+        ]])
+        overview.append(["Critical Issues", *[str(len(audit.get("critical_issues", []))) for _, audit in sites]])
+        overview.append(["Quick Wins", *[str(len(audit.get("quick_wins", []))) for _, audit in sites]])
+        overview_table = Table(overview, colWidths=col_widths)
+        overview_table.setStyle(t.grid_table_style)
+        story.append(overview_table)
+        story.append(Spacer(1, 20))
+        
+        # CATEGORY SCORES SIDE BY SIDE
+        story.append(t.static("Category Scores", t.section_style))
+        categories = []
+        for _, audit in sites:
+            for name in audit.get("category_scores", audit.get("categories", {})):
+                if name not in categories:
+                    categories.append(name)
+        
+        category_rows = [["Category", *headers]]
+        for name in categories:
+            row = [name.replace("_", " ").title()]
+            for _, audit in sites:
+                score = audit.get("category_scores", audit.get("categories", {})).get(name)
+                row.append("-" if score is None else f"{score}/100 ({get_category_status(score)[0]})")
+            category_rows.append(row)
+        category_table = Table(category_rows, colWidths=col_widths)
+        category_table.setStyle(t.grid_table_style)
+        story.append(category_table)
+        
+        # PER-SITE HIGHLIGHTS
+        for url, audit in sites:
+            story.append(PageBreak())
+            story.append(t.paragraph(html.escape(url), t.section_style))
+            interpretation, action = SCORE_INTERPRETATIONS[get_score_band(audit.get("overall_score", audit.get("score", 0)))]
+            story.append(t.static(f"<b>Assessment:</b> {interpretation}"))
+            story.append(t.static(f"<b>Recommended Action:</b> {action}"))
+            story.append(Spacer(1, 15))
+            
+            if audit.get("critical_issues"):
+                story.append(t.static("<b>Critical Issues</b>"))
+                for issue in audit["critical_issues"][:5]:
+                    story.append(t.paragraph(f"• {html.escape(issue)}"))
+                story.append(Spacer(1, 10))
+            
+            if audit.get("quick_wins"):
+                story.append(t.static("<b>Quick Wins</b>"))
+                for win in audit["quick_wins"][:5]:
+                    story.append(t.paragraph(f"• {html.escape(win)}"))
+        
+        doc.build(story)
+        return filepath
+        
+    except Exception as exc:
+        print(f"❌ Comparison PDF generation failed: {exc}")
+        return None
@@ -0,0 +1,122 @@
+# File: services/report_view.py
+# Lightweight HTML/JSON report built straight from stored audit data (no PDF rendering)
+
+import html
+from typing import Dict
+from services.report_generator import (
+    SCORE_INTERPRETATIONS, TIMELINE_ROWS, NEXT_STEPS, VISITOR_VALUE_USD,
+    get_score_band, get_category_status, get_issue_context
+)
+
+def build_report_view(audit_data: Dict, url: str, created_at: str = None) -> Dict:
+    """Same sections as the PDF report, as plain data"""
+    score = audit_data.get('overall_score', audit_data.get('score', 0))
+    traffic_loss = audit_data.get('estimated_monthly_traffic_loss', 500)
+    interpretation, action = SCORE_INTERPRETATIONS[get_score_band(score)]
+    categories = audit_data.get('category_scores', audit_data.get('categories', {}))
+    
+    return {
+        'url': url,
+        'audit_date': created_at,
+        'overall_score': score,
+        'assessment': interpretation,
+        'recommended_action': action,
+        'critical_count': len(audit_data.get('critical_issues', [])),
+        'estimated_traffic_loss': traffic_loss,
+        'estimated_revenue_impact': traffic_loss * VISITOR_VALUE_USD,
+        'categories': [
+            {
+                'name': name.replace('_', ' ').title(),
+                'score': value,
+                'status': get_category_status(value)[0],
+                'priority': get_category_status(value)[1]
+            }
+            for name, value in categories.items()
+        ],
+        'quick_wins': audit_data.get('quick_wins', [])[:5],
+        'critical_issues': [
+            {'issue': issue, 'context': get_issue_context(issue)}
+            for issue in audit_data.get('critical_issues', [])[:5]
+        ],
+        'ai_search_issues': audit_data.get('ai_search_issues', [])[:3],
+        'voice_search_issues': audit_data.get('voice_search_issues', [])[:3],
+        'recommendations': audit_data.get('recommendations', []),
+        'timeline': TIMELINE_ROWS,
+        'next_steps': NEXT_STEPS
+    }
+
+def _items(values, ordered: bool = False) -> str:
+    tag = 'ol' if ordered else 'ul'
+    return f'<{tag}>' + ''.join(f'<li>{html.escape(str(value))}</li>' for value in values) + f'</{tag}>'
+
+def render_report_html(view: Dict, pdf_url: str = None) -> str:
+    """Render the report view as a standalone HTML page"""
+    e = html.escape
+    parts = [
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">',
+        '<meta name="viewport" content="width=device-width, initial-scale=1">',
+        f'<title>AI SEO Audit Report - {e(view["url"])}</title>',
+        '<style>body{font-family:Helvetica,Arial,sans-serif;max-width:800px;margin:0 auto;padding:24px;color:#1f2937}'
+        'h1{color:#1e40af}h2{color:#1e40af;border-bottom:1px solid #e5e7eb;padding-bottom:4px}'
+        'table{border-collapse:collapse;width:100%}td,th{border:1px solid #d1d5db;padding:6px 10px;text-align:left}'
+        'th{background:#1e40af;color:#fff}.context{color:#4b5563;margin:4px 0 4px 16px}</style>',
+        '</head><body>',
+        '<h1>AI SEO Audit Report</h1>',
+        '<table>',
+        f'<tr><td>Website:</td><td>{e(view["url"])}</td></tr>',
+    ]
+    if view.get('audit_date'):
+        parts.append(f'<tr><td>Audit Date:</td><td>{e(str(view["audit_date"]))}</td></tr>')
+    parts += [
+        f'<tr><td>Overall Score:</td><td>{e(str(view["overall_score"]))}/100</td></tr>',
+        f'<tr><td>Critical Issues:</td><td>{view["critical_count"]}</td></tr>',
+        f'<tr><td>Est. Monthly Traffic Loss:</td><td>{view["estimated_traffic_loss"]:,} visitors</td></tr>',
+        f'<tr><td>Est. Revenue Impact:</td><td>${view["estimated_revenue_impact"]:,}/month</td></tr>',
+        '</table>',
+        f'<p><b>Assessment:</b> {e(view["assessment"])}</p>',
+        f'<p><b>Recommended Action:</b> {e(view["recommended_action"])}</p>',
+    ]
+    
+    if view['categories']:
+        parts.append('<h2>Performance by Category</h2><table>')
+        parts.append('<tr><th>Category</th><th>Score</th><th>Status</th><th>Priority</th></tr>')
+        for category in view['categories']:
+            parts.append(
+                f'<tr><td>{e(category["name"])}</td><td>{e(str(category["score"]))}/100</td>'
+                f'<td>{category["status"]}</td><td>{category["priority"]}</td></tr>'
+            )
+        parts.append('</table>')
+    
+    parts.append('<h2>Priority Action Plan</h2>')
+    if view['quick_wins']:
+        parts.append('<h3>🎯 Quick Wins (Do These First!)</h3>')
+        parts.append(_items(view['quick_wins'], ordered=True))
+    if view['critical_issues']:
+        parts.append('<h3>⚠️ Critical Issues (Address Within 30 Days)</h3>')
+        for i, item in enumerate(view['critical_issues'], 1):
+            parts.append(f'<p><b>Issue {i}:</b> {e(item["issue"])}</p>')
+            # Context lines are our own static copy with <i> markup, not user data
+            parts += [f'<p class="context">{line}</p>' for line in item['context']]
+    
+    parts.append('<h2>Expected Results Timeline</h2><table>')
+    header, *rows = view['timeline']
+    parts.append('<tr>' + ''.join(f'<th>{e(cell)}</th>' for cell in header) + '</tr>')
+    for row in rows:
+        parts.append('<tr>' + ''.join(f'<td>{e(cell)}</td>' for cell in row) + '</tr>')
+    parts.append('</table>')
+    
+    if view['ai_search_issues'] or view['voice_search_issues']:
+        parts.append('<h2>AI &amp; Voice Search Optimization</h2>')
+        if view['ai_search_issues']:
+            parts.append('<h3>AI Search Issues</h3>' + _items(view['ai_search_issues']))
+        if view['voice_search_issues']:
+            parts.append('<h3>Voice Search Issues</h3>' + _items(view['voice_search_issues']))
+    
+    parts.append('<h2>Your Next Steps</h2>')
+    parts += [f'<p>{e(step)}</p>' for step in view['next_steps']]
+    
+    if pdf_url:
+        parts.append(f'<p><a href="{e(pdf_url)}">Download the PDF report</a></p>')
+    
+    parts.append('</body></html>')
+    return ''.join(parts)
@@ -3,12 +3,16 @@
 
 import os
 import logging
-from typing import Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
 from services.web_scraper import scrape_website
 from services.ai_service import analyze_with_ai
-from services.report_generator import generate_pdf_report
-from services.email_service import send_email_report
-from models.database import save_audit_data
+from services.render_pool import submit_render, submit_comparison_render, on_done
+from services.email_service import send_email_report, is_duplicate_report, is_email_configured
+from services.cache_service import cache
+from models.database import save_audit_data, get_audit_by_report_id, get_audit_timestamp
+from config.settings import EMAIL_ATTACH_PDF, BATCH_AUDIT_WORKERS
+from utils.helpers import canonicalize_url
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +20,7 @@ class SEOAuditor:
     def __init__(self):
         pass
     
-    def run_full_audit(self, url: str, email: str) -> Dict:
+    def run_full_audit(self, url: str, email: str, send_email: bool = True) -> Dict:
         """Run complete SEO audit process"""
         try:
             logger.info(f'Starting audit for {url}')
@@ -24,8 +28,17 @@ class SEOAuditor:
             # Step 1: Scrape website
             website_data = scrape_website(url)
             if 'error' in website_data:
-                raise Exception(f'Failed to analyze website: {website_data["error"]}')
-            
+                # Negative-cache the failure so retries don't hit the dead site again
+                failure = cache.record_failure(url, website_data.get('error_type'), website_data['error'])
+                logger.warning(f'Scrape failed for {url} ({website_data.get("error_type")}): {website_data["error"]}')
+                return {
+                    'success': False,
+                    'error': f'Failed to analyze website: {website_data["error"]}',
+                    'error_type': website_data.get('error_type', 'unknown'),
+                    'retry_in': failure['retry_in'] if failure else None
+                }
+            
+            cache.clear_failures(url)
             logger.info(f'Website scraped successfully for {url}')
             
             # Step 2: AI Analysis
@@ -33,41 +46,30 @@ class SEOAuditor:
             
             logger.info(f'AI analysis completed for {url}')
             
-            # Step 3: Generate PDF Report
-            pdf_path = generate_pdf_report(audit_data, website_data)
-            
-            logger.info(f'PDF report generated for {url}')
-            
-            # Step 4: Save to database
-            save_audit_data(email, url, audit_data)
+            # Step 3: Save to database
+            created_at = get_audit_timestamp()
+            report_id = save_audit_data(email, url, audit_data, created_at=created_at)
             
             logger.info(f'Audit data saved to database for {url}')
             
-            # Step 5: Send email report
-            email_sent = send_email_report(email, audit_data, pdf_path, url)
-            
-            if not email_sent:
-                logger.warning(f'Email report not sent for {url}')
-            else:
-                logger.info(f'Email report sent successfully for {url}')
+            # Step 4: Email the report; the PDF is only rendered (in the render pool) if attached
+            pdf_path = None
+            email_status = None
+            if send_email and not is_email_configured():
+                email_status = 'not_configured'
+            elif send_email:
+                pdf_future = self.no_pdf()
+                if EMAIL_ATTACH_PDF:
+                    # Dated like the stored audit, so /pdf downloads find this same file
+                    pdf_future = submit_render(audit_data, self.get_report_site(url, created_at))
+                self.email_when_rendered(pdf_future, email, audit_data, url)
+                # Nothing is sent yet: the render and delivery finish in the background
+                email_status = 'queued'
+                if pdf_future.done() and pdf_future.exception() is None:
+                    pdf_path = pdf_future.result()
             
             # Prepare response data
-            response_data = {
-                'success': True,
-                'score': audit_data.get('overall_score', 70),
-                'overall_score': audit_data.get('overall_score', 70),  # Include both fields
-                'issues': (audit_data.get('critical_issues', []) + 
-                          audit_data.get('warnings', []) + 
-                          audit_data.get('ai_search_issues', []))[:8],  # Limit to 8 issues for display
-                'recommendations': audit_data.get('recommendations', [])[:5],  # Top 5 recommendations
-                'pdf_path': f'reports/{os.path.basename(pdf_path)}',
-                'categories': audit_data.get('category_scores', {}),
-                'email_sent': email_sent,
-                'quick_wins': audit_data.get('quick_wins', []),
-                'voice_search_issues': audit_data.get('voice_search_issues', []),
-                'critical_issues': audit_data.get('critical_issues', []),  # Add for cached email sending
-                'ai_search_issues': audit_data.get('ai_search_issues', [])  # Add for cached email sending
-            }
+            response_data = self.build_response(audit_data, pdf_path, False, report_id, email_status)
             
             logger.info(f'Audit completed successfully for {url} with score {response_data["score"]}')
             return response_data
@@ -79,27 +81,169 @@ class SEOAuditor:
                 'error': str(e)
             }
     
-    def send_cached_report(self, email: str, cached_data: Dict, url: str) -> bool:
-        """Send email report for cached audit data"""
+    def run_batch_audit(self, urls: List[str], email: str) -> Dict:
+        """Audit a client site and its competitors concurrently and email one comparison report"""
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_AUDIT_WORKERS, len(urls)))) as pool:
+            results = list(pool.map(lambda url: self.audit_for_batch(url, email), urls))
+        
+        sites = [(url, result) for url, result in zip(urls, results) if result.get('success')]
+        summary = [
+            {
+                'url': url,
+                'success': result.get('success', False),
+                'score': result.get('score'),
+                'categories': result.get('categories', {}),
+                'critical_issues': len(result.get('critical_issues', [])),
+                'cached': result.get('cached', False),
+                'error': result.get('error'),
+                'report_url': result.get('report_url')
+            }
+            for url, result in zip(urls, results)
+        ]
+        
+        if len(sites) < 2:
+            return {
+                'success': False,
+                'error': 'At least two sites must audit successfully to build a comparison',
+                'sites': summary
+            }
+        
+        client_url, client_result = sites[0]
+        compared_urls = [url for url, _ in sites]
+        if not is_email_configured():
+            return {'success': True, 'sites': summary, 'email_sent': False, 'email_status': 'not_configured'}
+        if is_duplicate_report(email, client_url, 'comparison', compared_urls):
+            logger.info(f'Comparison for {client_url} already emailed recently, skipping duplicate send')
+            return {'success': True, 'sites': summary, 'email_sent': False, 'email_status': 'skipped', 'deduplicated': True}
+        
+        # One shared document for all sites, rendered in the pool and emailed when ready
+        pdf_future = submit_comparison_render(sites)
+        self.email_when_rendered(pdf_future, email, dict(client_result), client_url, kind='comparison',
+                                 compared_urls=compared_urls)
+        logger.info(f'Batch audit completed for {len(sites)}/{len(urls)} sites, comparison queued')
+        
+        return {
+            'success': True,
+            'sites': summary,
+            'email_sent': False,
+            'email_status': 'queued'  # sent with the comparison PDF once it is rendered
+        }
+    
+    def audit_for_batch(self, url: str, email: str) -> Dict:
+        """Cached result or fresh audit for one batch site, without a per-site email"""
+        try:
+            cached = cache.get(url)
+            if cached:
+                return {**cached, 'cached': True}
+            
+            failure = cache.get_failure(url)
+            if failure:
+                return {
+                    'success': False,
+                    'error': f"This site recently failed to load ({failure['error_type']})",
+                    'retry_in': failure['retry_in']
+                }
+            
+            result = self.run_full_audit(url, email, send_email=False)
+            if result.get('success'):
+                cache.set(url, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f'Batch audit failed for {url}: {str(e)}')
+            return {'success': False, 'error': str(e)}
+    
+    @staticmethod
+    def build_response(audit_data: Dict, pdf_path: Optional[str] = None, email_sent: bool = False,
+                       report_id: Optional[str] = None, email_status: Optional[str] = None) -> Dict:
+        """Build the API/cache response payload from raw audit data"""
+        return {
+            'success': True,
+            'score': audit_data.get('overall_score', 70),
+            'overall_score': audit_data.get('overall_score', 70),  # Include both fields
+            'issues': (audit_data.get('critical_issues', []) + 
+                      audit_data.get('warnings', []) + 
+                      audit_data.get('ai_search_issues', []))[:8],  # Limit to 8 issues for display
+            'recommendations': audit_data.get('recommendations', [])[:5],  # Top 5 recommendations
+            'pdf_path': f'reports/{os.path.basename(pdf_path)}' if pdf_path else None,
+            'categories': audit_data.get('category_scores', {}),
+            'email_sent': email_sent,
+            'email_status': email_status,  # 'queued' until the render and outbox finish
+            'quick_wins': audit_data.get('quick_wins', []),
+            'voice_search_issues': audit_data.get('voice_search_issues', []),
+            'critical_issues': audit_data.get('critical_issues', []),  # Add for cached email sending
+            'ai_search_issues': audit_data.get('ai_search_issues', []),  # Add for cached email sending
+            'report_id': report_id,
+            'report_url': f'/api/report/{report_id}' if report_id else None,
+            'pdf_url': f'/api/report/{report_id}/pdf' if report_id else None  # rendered on first download
+        }
+    
+    @staticmethod
+    def get_report_site(url: str, audit_date: Optional[str] = None) -> Dict:
+        """Website data used to render a report; the canonical URL keeps report hashes stable"""
+        return {'url': canonicalize_url(url), 'audit_date': audit_date}
+    
+    @staticmethod
+    def no_pdf() -> Future:
+        """Already-resolved render future for emails sent without an attachment"""
+        future = Future()
+        future.set_result(None)
+        return future
+    
+    def email_when_rendered(self, pdf_future: Future, email: str, audit_data: Dict, url: str,
+                            kind: str = 'audit', compared_urls: List[str] = ()) -> Future:
+        """Send the email report after the PDF render completes, without blocking the caller"""
+        def _send(done: Future) -> bool:
+            try:
+                pdf_path = done.result()
+            except Exception as e:
+                # Still send the results, just without the PDF attached
+                logger.error(f'PDF render failed for {url}: {str(e)}')
+                pdf_path = None
+            
+            email_sent = send_email_report(email, audit_data, pdf_path, url, kind=kind, compared_urls=compared_urls)
+            if email_sent:
+                logger.info(f'Email report sent successfully for {url}')
+            else:
+                logger.warning(f'Email report not sent for {url}')
+            return email_sent
+        
+        return on_done(pdf_future, _send)
+    
+    def send_cached_report(self, email: str, cached_data: Dict, url: str) -> Future:
+        """Send email report for cached audit data; returns a future for the send result (already False if skipped)"""
         try:
+            # Nothing to send without an email provider, and re-submitting the same URL
+            # shouldn't email (or render) the same report again
+            if not is_email_configured() or is_duplicate_report(email, url):
+                logger.info(f'Report for {url} already emailed recently, skipping duplicate send')
+                skipped = Future()
+                skipped.set_result(False)
+                return skipped
+            
+            # Work on a copy - the cache may hand the same dict to other requests
+            cached_data = dict(cached_data)
+            
             # Fix missing overall_score immediately
             if 'overall_score' not in cached_data:
                 cached_data['overall_score'] = cached_data.get('score', 70)
             
-            # Generate fresh PDF from cached data
-            website_data = {'url': url}  # Minimal website data for PDF
-            pdf_path = generate_pdf_report(cached_data, website_data)
-            
-            # Send email with cached data
-            email_sent = send_email_report(email, cached_data, pdf_path, url)
-            
-            if email_sent:
-                logger.info(f'Cached report sent successfully for {url}')
+            # Reuse the PDF rendered for this cached data, building it only once
+            if EMAIL_ATTACH_PDF:
+                # Render from the stored audit so the attachment is the same file /pdf downloads serve
+                stored = get_audit_by_report_id(cached_data['report_id']) if cached_data.get('report_id') else None
+                if stored:
+                    report_site = {'url': stored['url'], 'audit_date': stored['created_at']}
+                    pdf_future = submit_render(stored['audit_data'], report_site)
+                else:
+                    pdf_future = submit_render(cached_data, self.get_report_site(url))
             else:
-                logger.warning(f'Failed to send cached report for {url}')
+                pdf_future = self.no_pdf()
             
-            return email_sent
+            return self.email_when_rendered(pdf_future, email, cached_data, url)
             
         except Exception as e:
             logger.error(f'Failed to send cached report for {url}: {str(e)}')
-            return False
\ No newline at end of file
+            failed = Future()
+            failed.set_result(False)
+            return failed
@@ -2,6 +2,7 @@
 # Then rename your current web_scraper.py to ai_service.py
 # Then rename this file to web_scraper.py
 
+import socket
 import requests
 from bs4 import BeautifulSoup
 from typing import Dict
@@ -58,4 +59,38 @@ def scrape_website(url: str) -> Dict:
         return website_data
         
     except Exception as e:
-        return {'error': str(e)}
\ No newline at end of file
+        return {'error': str(e), 'error_type': classify_scrape_error(e)}
+
+def classify_scrape_error(error: Exception) -> str:
+    """Classify a scrape failure so it can be negative-cached appropriately"""
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        if 400 <= status < 500:
+            return 'http_4xx'
+        if status >= 500:
+            return 'http_5xx'
+    if isinstance(error, requests.exceptions.SSLError):
+        return 'tls'
+    if isinstance(error, requests.exceptions.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.exceptions.ConnectionError):
+        # requests wraps resolver failures (socket.gaierror) in ConnectionError
+        for cause in _error_chain(error):
+            if isinstance(cause, socket.gaierror) or type(cause).__name__ == 'NameResolutionError':
+                return 'dns'
+        message = str(error)
+        if 'Name or service not known' in message or 'getaddrinfo failed' in message or 'Failed to resolve' in message:
+            return 'dns'
+        return 'connection'
+    return 'unknown'
+
+def _error_chain(error: BaseException):
+    """Yield an exception and the exceptions it wraps"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        nested = getattr(error, 'reason', None)
+        if not isinstance(nested, BaseException):
+            nested = error.args[0] if error.args and isinstance(error.args[0], BaseException) else None
+        error = nested or error.__cause__ or error.__context__
\ No newline at end of file
@@ -0,0 +1,122 @@
+# File: tests/test_archive.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import json
+import shutil
+import tempfile
+import subprocess
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from services.audit_archiver import AuditArchiver
+from utils import process_lock
+
+def audit_row(report_id, url, created_at, score=50):
+    return {
+        'email': 'owner@example.com',
+        'url': url,
+        'overall_score': score,
+        'technical_score': 0,
+        'content_score': 0,
+        'performance_score': 0,
+        'accessibility_score': 0,
+        'audit_data': json.dumps({'overall_score': score}, sort_keys=True),
+        'report_id': report_id,
+        'created_at': created_at
+    }
+
+class TestAuditArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db'))
+        self.patch.start()
+        database.init_database()
+        
+        database.insert_audit_rows([
+            audit_row('jan', 'https://example.com', '2025-01-10 08:00:00', score=40),
+            audit_row('feb', 'https://example.com', '2025-02-10 08:00:00', score=70),
+            # Same result as the February audit, so they share a blob
+            audit_row('shared', 'https://example.com', '2025-02-11 08:00:00', score=70),
+            audit_row('new', 'https://example.com', '2099-01-01 08:00:00', score=70),
+        ])
+    
+    def tearDown(self):
+        database.connections.close()
+        self.patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_old_audits_move_to_monthly_tables(self):
+        status = AuditArchiver(max_age_days=30, batch_size=2, pause=0).run()
+        self.assertEqual(status['archived'], 3)
+        
+        conn = database.get_connection()
+        self.assertEqual(conn.execute('SELECT report_id FROM audits').fetchall()[0][0], 'new')
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM archive.audits_2025_01').fetchone()[0], 1)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM archive.audits_2025_02').fetchone()[0], 2)
+        self.assertEqual(conn.execute('PRAGMA main.auto_vacuum').fetchone()[0], 2)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'test_archive.db')))
+    
+    def test_reads_span_the_archive(self):
+        AuditArchiver(max_age_days=30, pause=0).run()
+        
+        archived = database.get_audit_by_report_id('jan')
+        self.assertEqual(archived['audit_data'], {'overall_score': 40})
+        
+        history = database.get_audit_history('url', 'https://example.com', limit=3, full=True)
+        self.assertEqual([row['report_id'] for row in history], ['new', 'shared', 'feb'])
+        self.assertEqual(history[2]['audit_data'], {'overall_score': 70})
+        rest = database.get_audit_history('url', 'https://example.com', before_id=history[-1]['id'])
+        self.assertEqual([row['report_id'] for row in rest], ['jan'])
+    
+    def test_only_unshared_blobs_are_dropped(self):
+        AuditArchiver(max_age_days=30, pause=0).run()
+        conn = database.get_connection()
+        hashes = [row[0] for row in conn.execute('SELECT hash FROM audit_blobs')]
+        self.assertEqual(hashes, [conn.execute('SELECT blob_hash FROM audits').fetchone()[0]])
+    
+    def test_interrupted_move_is_not_duplicated(self):
+        # A copy that committed without its delete is redone cleanly on the next run
+        database.create_archive_table('2025-01')
+        conn = database.get_connection()
+        conn.execute('''
+            INSERT INTO archive.audits_2025_01 (id, email, url, domain, created_at, report_id)
+            SELECT id, email, url, domain, created_at, report_id FROM audits WHERE report_id = 'jan'
+        ''')
+        
+        database.archive_audits('2025-02-01 00:00:00')
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM all_audits WHERE report_id = 'jan'").fetchone()[0], 1)
+    
+    def test_one_archiver_per_host(self):
+        with mock.patch.object(process_lock, 'LOCK_DIR', self.tmp_dir):
+            self.assertTrue(process_lock.hold_lock('test-archiver'))
+            self.assertTrue(process_lock.hold_lock('test-archiver'))
+        
+        # Another worker process can't take the lock while this one holds it
+        other = subprocess.run(
+            [sys.executable, '-c', "from utils.process_lock import hold_lock; print(hold_lock('test-archiver'))"],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env={**os.environ, 'LOCK_DIR': self.tmp_dir}, capture_output=True, text=True
+        )
+        self.assertEqual(other.stdout.strip(), 'False')
+    
+    def test_archiver_never_rewrites_existing_database(self):
+        conn = database.get_connection()
+        conn.execute('PRAGMA main.auto_vacuum=NONE')
+        conn.execute('VACUUM main')
+        
+        with mock.patch.object(database, 'enable_incremental_vacuum') as convert:
+            status = AuditArchiver(max_age_days=30, pause=0).run()
+        self.assertEqual(status['archived'], 3)
+        self.assertEqual(status['pages_freed'], 0)
+        convert.assert_not_called()
+        
+        self.assertTrue(database.enable_incremental_vacuum())
+        self.assertTrue(database.has_incremental_vacuum())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+# File: tests/test_audit_history.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+from flask import Flask
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from routes import api_routes
+from utils import auth
+
+class TestAuditHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db')),
+            mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False),
+            mock.patch.object(auth, 'ADMIN_API_KEY', 'secret'),
+        ]
+        for patch in self.patches:
+            patch.start()
+        database.init_database()
+        
+        for score in range(5):
+            database.save_audit_data('Agency@Example.com', 'https://www.example.com/page', {'overall_score': 50 + score})
+        database.save_audit_data('agency@example.com', 'https://example.com/other', {'overall_score': 90})
+        database.save_audit_data('someone@else.com', 'https://other.example', {'overall_score': 30})
+        
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+        self.client.environ_base['HTTP_X_ADMIN_KEY'] = 'secret'
+    
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_requires_admin_key(self):
+        # Lookups by email would otherwise hand anyone's report ids (and report links) to any caller
+        del self.client.environ_base['HTTP_X_ADMIN_KEY']
+        self.assertEqual(self.client.get('/api/audits?email=agency@example.com').status_code, 401)
+    
+    def test_keyset_pages_by_url(self):
+        first = self.client.get('/api/audits?url=http://example.com/page/&limit=3').get_json()
+        self.assertEqual([a['overall_score'] for a in first['audits']], [54, 53, 52])
+        self.assertNotIn('audit_data', first['audits'][0])
+        
+        second = self.client.get(f'/api/audits?url=example.com/page&limit=3&before={first["next_before"]}').get_json()
+        self.assertEqual([a['overall_score'] for a in second['audits']], [51, 50])
+        self.assertIsNone(second['next_before'])
+    
+    def test_domain_and_email_lookups(self):
+        by_domain = self.client.get('/api/audits?domain=www.example.com').get_json()
+        self.assertEqual(len(by_domain['audits']), 6)
+        self.assertNotIn('email', by_domain['audits'][0])
+        
+        by_email = self.client.get('/api/audits?email=AGENCY@example.com&fields=full').get_json()
+        self.assertEqual(len(by_email['audits']), 6)
+        self.assertEqual(by_email['audits'][0]['audit_data'], {'overall_score': 90})
+    
+    def test_requires_exactly_one_filter(self):
+        self.assertEqual(self.client.get('/api/audits').status_code, 400)
+        self.assertEqual(self.client.get('/api/audits?url=a.com&email=b@c.com').status_code, 400)
+        self.assertEqual(self.client.get('/api/audits?url=a.com&limit=abc').status_code, 400)
+    
+    def test_lookups_use_indexes(self):
+        conn = database.get_connection()
+        for condition in database.HISTORY_FILTERS.values():
+            plan = ' '.join(row[3] for row in conn.execute(
+                f'EXPLAIN QUERY PLAN SELECT a.id FROM audits a WHERE {condition} AND a.id < ? ORDER BY a.id DESC LIMIT 20',
+                ('x', 100)
+            ))
+            self.assertRegex(plan, r'USING (COVERING )?INDEX idx_audits_')
+            self.assertNotIn('TEMP B-TREE', plan)
+
+class TestAuditBlobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmp_dir, 'test.db')
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', self.db_path),
+            mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False),
+        ]
+        for patch in self.patches:
+            patch.start()
+    
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_identical_results_share_one_blob(self):
+        database.init_database()
+        audit = {'overall_score': 70, 'recommendations': ['Add schema markup'] * 50}
+        first = database.save_audit_data('a@example.com', 'https://example.com', audit)
+        second = database.save_audit_data('b@example.com', 'https://example.com', dict(reversed(list(audit.items()))))
+        
+        conn = database.get_connection()
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM audit_blobs').fetchone()[0], 1)
+        self.assertEqual(conn.execute('SELECT COUNT(*) FROM audits WHERE audit_data IS NOT NULL').fetchone()[0], 0)
+        size, stored = conn.execute('SELECT size, LENGTH(data) FROM audit_blobs').fetchone()
+        self.assertLess(stored, size)
+        self.assertEqual(database.get_audit_by_report_id(second)['audit_data'], audit)
+        self.assertEqual(database.get_audit_by_report_id(first)['audit_data'], audit)
+    
+    def test_backfills_inline_audit_data(self):
+        # A database from before the blob table, with audit data inline
+        conn = database.get_connection()
+        conn.execute('''CREATE TABLE audits (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL,
+                        url TEXT NOT NULL, overall_score INTEGER, technical_score INTEGER, content_score INTEGER,
+                        performance_score INTEGER, accessibility_score INTEGER, audit_data TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        conn.execute("INSERT INTO audits (email, url, audit_data) VALUES ('a@example.com', 'https://example.com', '{\"overall_score\": 40}')")
+        
+        database.init_database()
+        
+        row = conn.execute('SELECT audit_data, blob_hash, domain FROM audits').fetchone()
+        self.assertIsNone(row['audit_data'])
+        self.assertIsNotNone(row['blob_hash'])
+        self.assertEqual(row['domain'], 'example.com')
+        popular = database.get_recent_popular_audits(3600)
+        self.assertEqual(popular[0]['audit_data'], '{"overall_score": 40}')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# File: tests/test_audit_writer.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from models.audit_writer import AuditWriter
+
+class TestAuditWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.journal_dir = os.path.join(self.tmp_dir, 'journal')
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db'))
+        self.db_patch.start()
+        database.init_database()
+        self.batches = []
+        # Long interval so only explicit flushes (or a full batch) commit during the test
+        self.writer = AuditWriter(self._insert, self.journal_dir, flush_interval=60, batch_size=100)
+    
+    def tearDown(self):
+        self.writer.stop()
+        self.db_patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def _insert(self, rows):
+        self.batches.append(len(rows))
+        database.insert_audit_rows(rows)
+    
+    def _row(self, report_id):
+        return {
+            'email': 'a@example.com', 'url': 'https://example.com', 'overall_score': 70,
+            'technical_score': 0, 'content_score': 0, 'performance_score': 0, 'accessibility_score': 0,
+            'audit_data': json.dumps({'overall_score': 70}), 'report_id': report_id,
+            'created_at': '2026-01-01 00:00:00'
+        }
+    
+    def _stored_count(self):
+        return database.get_connection().execute('SELECT COUNT(*) FROM audits').fetchone()[0]
+    
+    def test_rows_committed_as_one_group(self):
+        for i in range(5):
+            self.writer.add(self._row(f'r{i}'))
+        self.assertEqual(self._stored_count(), 0)
+        self.assertIsNotNone(self.writer.get_pending('r3'))
+        
+        self.assertEqual(self.writer.flush(), 5)
+        
+        self.assertEqual(self.batches, [5])
+        self.assertEqual(self._stored_count(), 5)
+        self.assertIsNone(self.writer.get_pending('r3'))
+        self.assertEqual(os.listdir(self.journal_dir), [f'audits_{os.getpid()}-{self.writer._token}.jsonl'])
+    
+    def test_failed_commit_keeps_rows(self):
+        self.writer.add(self._row('r1'))
+        with mock.patch.object(self.writer, 'insert_rows', side_effect=RuntimeError('disk full')):
+            self.assertEqual(self.writer.flush(), 0)
+        
+        self.assertIsNotNone(self.writer.get_pending('r1'))
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(self._stored_count(), 1)
+    
+    def test_replays_journal_of_dead_process(self):
+        os.makedirs(self.journal_dir)
+        # pid 999999999 can't exist; last line is torn as if the process died mid-write
+        with open(os.path.join(self.journal_dir, 'audits_999999999.jsonl'), 'w') as f:
+            f.write(json.dumps(self._row('lost1')) + '\n' + json.dumps(self._row('lost2')) + '\n{"email": "a')
+        database.insert_audit_rows([self._row('lost1')])  # already committed before the crash
+        
+        self.assertEqual(self.writer.replay_journals(), 2)
+        self.assertEqual(self._stored_count(), 2)
+        self.assertEqual(os.listdir(self.journal_dir), [])
+    
+    def test_replays_journal_of_crashed_process_with_same_pid(self):
+        # A worker restarted in a container often gets the crashed worker's PID
+        os.makedirs(self.journal_dir)
+        with open(os.path.join(self.journal_dir, f'audits_{os.getpid()}-deadbeef.jsonl'), 'w') as f:
+            f.write(json.dumps(self._row('lost1')) + '\n')
+        with open(os.path.join(self.journal_dir, f'audits_{os.getpid()}.jsonl'), 'w') as f:
+            f.write(json.dumps(self._row('lost2')) + '\n')
+        
+        self.writer.add(self._row('new'))
+        self.assertEqual(self.writer.replay_journals(), 2)
+        self.assertEqual(self.writer.flush(), 1)
+        self.assertEqual(self._stored_count(), 3)
+    
+    def test_committer_replays_dead_journals(self):
+        # Gunicorn's timeout SIGKILLs workers; nothing restarts the app to replay their journals
+        writer = AuditWriter(self._insert, self.journal_dir, flush_interval=0.05, batch_size=100, replay_interval=0)
+        os.makedirs(self.journal_dir)
+        with open(os.path.join(self.journal_dir, 'audits_999999999-deadbeef.jsonl'), 'w') as f:
+            f.write(json.dumps(self._row('lost1')) + '\n')
+        
+        writer.add(self._row('new'))
+        deadline = time.time() + 5
+        while self._stored_count() < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        writer.stop()
+        
+        self.assertEqual(self._stored_count(), 2)
+    
+    def test_other_workers_read_journaled_rows(self):
+        # The parent process stands in for a live sibling worker whose group commit hasn't landed yet
+        os.makedirs(self.journal_dir)
+        with open(os.path.join(self.journal_dir, f'audits_{os.getppid()}-cafe.jsonl'), 'w') as f:
+            f.write(json.dumps(self._row('sibling')) + '\n')
+        
+        with mock.patch.object(database, 'audit_writer', self.writer):
+            audit = database.get_audit_by_report_id('sibling')
+            self.assertIsNone(database.get_audit_by_report_id('missing'))
+        self.assertEqual(audit['audit_data'], {'overall_score': 70})
+    
+    def test_save_audit_reads_own_write(self):
+        with mock.patch.object(database, 'audit_writer', self.writer):
+            report_id = database.save_audit_data('a@example.com', 'https://example.com', {'overall_score': 55})
+            self.assertEqual(database.get_audit_by_report_id(report_id)['overall_score'], 55)
+            self.writer.flush()
+            self.assertEqual(database.get_audit_by_report_id(report_id)['audit_data'], {'overall_score': 55})
+
+if __name__ == '__main__':
+    unittest.main()
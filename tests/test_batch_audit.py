@@ -0,0 +1,128 @@
+# File: tests/test_batch_audit.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from services import render_pool, report_cache, seo_auditor
+from services.email_service import get_email_dedup_key
+from services.seo_auditor import SEOAuditor
+
+def fake_result(score):
+    return SEOAuditor.build_response({
+        'overall_score': score,
+        'category_scores': {'technical_seo': score, 'content_quality': score - 10},
+        'critical_issues': ['Missing schema markup'],
+        'quick_wins': ['Add a meta description'],
+    }, report_id=f'id{score}')
+
+class TestBatchAudit(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db')),
+            mock.patch.object(report_cache, 'REPORTS_DIR', self.tmp_dir),
+            mock.patch.object(render_pool, 'RENDER_POOL_WORKERS', 0),
+            mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False),
+            mock.patch.object(seo_auditor, 'is_email_configured', return_value=True),
+            mock.patch.object(seo_auditor, 'send_email_report', return_value=True),
+        ]
+        self.send_email = [patch.start() for patch in self.patches][-1]
+        database.init_database()
+        self.auditor = SEOAuditor()
+    
+    def tearDown(self):
+        render_pool.shutdown()
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_one_comparison_pdf_for_all_sites(self):
+        results = {
+            'https://client.example': fake_result(60),
+            'https://rival-a.example': fake_result(75),
+            'https://rival-b.example': {'success': False, 'error': 'Failed to analyze website'},
+        }
+        with mock.patch.object(self.auditor, 'audit_for_batch', side_effect=lambda url, email: results[url]):
+            result = self.auditor.run_batch_audit(list(results), 'a@example.com')
+            render_pool._get_executors()[1].shutdown(wait=True)  # let the queued email run
+        
+        self.assertTrue(result['success'])
+        self.assertEqual([site['success'] for site in result['sites']], [True, True, False])
+        
+        pdfs = [name for name in os.listdir(self.tmp_dir) if name.endswith('.pdf')]
+        self.assertEqual(len(pdfs), 1)
+        self.assertTrue(pdfs[0].startswith('compare_client'))
+        
+        # One email to the client, with the comparison attached
+        self.assertEqual(self.send_email.call_count, 1)
+        self.assertEqual(os.path.basename(self.send_email.call_args[0][2]), pdfs[0])
+        self.assertEqual(result['email_status'], 'queued')
+    
+    def test_needs_two_successful_sites(self):
+        results = {
+            'https://client.example': fake_result(60),
+            'https://down.example': {'success': False, 'error': 'timeout'},
+        }
+        with mock.patch.object(self.auditor, 'audit_for_batch', side_effect=lambda url, email: results[url]):
+            result = self.auditor.run_batch_audit(list(results), 'a@example.com')
+        
+        self.assertFalse(result['success'])
+        self.assertEqual(len(result['sites']), 2)
+    
+    def test_audits_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+        
+        def audit(url, email):
+            barrier.wait()  # only passes if all three audits are in flight at once
+            return fake_result(70)
+        
+        urls = ['https://a.example', 'https://b.example', 'https://c.example']
+        with mock.patch.object(self.auditor, 'audit_for_batch', side_effect=audit):
+            result = self.auditor.run_batch_audit(urls, 'a@example.com')
+        self.assertTrue(result['success'])
+    
+    def test_duplicate_comparison_is_reported_not_sent(self):
+        results = {'https://client.example': fake_result(60), 'https://rival-a.example': fake_result(75)}
+        with mock.patch.object(self.auditor, 'audit_for_batch', side_effect=lambda url, email: results[url]), \
+             mock.patch.object(seo_auditor, 'is_duplicate_report', return_value=True) as duplicate:
+            result = self.auditor.run_batch_audit(list(results), 'a@example.com')
+        
+        self.assertFalse(result['email_sent'])
+        self.assertTrue(result['deduplicated'])
+        self.assertEqual(duplicate.call_args[0][3], list(results))
+        self.assertEqual(self.send_email.call_count, 0)
+    
+    def test_single_audit_reports_email_as_queued(self):
+        with mock.patch.object(seo_auditor, 'scrape_website', return_value={'url': 'https://client.example'}), \
+             mock.patch.object(seo_auditor, 'analyze_with_ai', return_value={'overall_score': 60}):
+            queued = self.auditor.run_full_audit('https://client.example', 'a@example.com')
+            with mock.patch.object(seo_auditor, 'is_email_configured', return_value=False):
+                unconfigured = self.auditor.run_full_audit('https://client.example', 'a@example.com')
+        
+        # Queued is not sent: the render and delivery still happen in the background
+        self.assertFalse(queued['email_sent'])
+        self.assertEqual(queued['email_status'], 'queued')
+        self.assertFalse(unconfigured['email_sent'])
+        self.assertEqual(unconfigured['email_status'], 'not_configured')
+    
+    def test_comparison_dedup_key_covers_competitors(self):
+        key = get_email_dedup_key('a@example.com', 'https://client.example', 'comparison',
+                                  ['https://client.example', 'https://rival-a.example'])
+        reordered = get_email_dedup_key('a@example.com', 'https://client.example', 'comparison',
+                                        ['https://rival-a.example', 'https://client.example'])
+        other = get_email_dedup_key('a@example.com', 'https://client.example', 'comparison',
+                                    ['https://client.example', 'https://rival-b.example'])
+        self.assertEqual(key, reordered)
+        self.assertNotEqual(key, other)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,231 @@
+# File: tests/test_cache.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import cache_service
+from services.cache_service import SimpleCache
+from services.cache_warmer import CacheWarmer
+from models import database
+from utils import auth
+
+class TestSimpleCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SimpleCache(cache_dir=self.cache_dir, default_ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_url_variants_share_entry(self):
+        self.cache.set('http://www.example.com/?utm_source=newsletter', {'score': 80})
+        self.assertEqual(self.cache.get('https://example.com'), {'score': 80})
+
+    def test_live_counters(self):
+        self.cache.get('https://example.com')
+        self.cache.set('https://example.com', {'score': 80})
+        self.cache.get('https://example.com')
+
+        stats = self.cache.get_cache_stats()
+        self.assertEqual(stats['total_cached_items'], 1)
+        self.assertGreater(stats['total_size_bytes'], 0)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['sets'], 1)
+
+        self.cache.delete('https://example.com')
+        stats = self.cache.get_cache_stats()
+        self.assertEqual(stats['total_cached_items'], 0)
+        self.assertEqual(stats['total_size_bytes'], 0)
+
+    def test_index_picks_up_existing_files(self):
+        self.cache.set('https://example.com', {'score': 80})
+        reopened = SimpleCache(cache_dir=self.cache_dir, default_ttl=60)
+        self.assertEqual(reopened.get_cache_stats()['total_cached_items'], 1)
+
+    def test_maintenance_removes_expired(self):
+        self.cache.set('https://old.example', {'score': 10}, ttl=-1)
+        self.cache.set('https://new.example', {'score': 90})
+
+        result = self.cache.run_maintenance()
+
+        self.assertEqual(result['expired'], 1)
+        self.assertEqual(self.cache.get_cache_stats()['total_cached_items'], 1)
+        self.assertEqual(self.cache.get_cache_stats()['lifetime']['expired'], 1)
+
+    def test_maintenance_enforces_size_budget(self):
+        for i in range(5):
+            self.cache.set(f'https://site{i}.example', {'payload': 'x' * 1000})
+        self.cache.get('https://site0.example')
+        self.cache.max_bytes = self.cache.get_cache_stats()['total_size_bytes'] // 2
+
+        result = self.cache.run_maintenance()
+
+        self.assertGreater(result['evicted'], 0)
+        self.assertLessEqual(self.cache.get_cache_stats()['total_size_bytes'], self.cache.max_bytes)
+        # Most recently read entry survives
+        self.assertIsNotNone(self.cache.get('https://site0.example'))
+
+    def test_stats_persist_without_flock(self):
+        # Platforms without fcntl (Windows) still import the module and keep the shared counters
+        with mock.patch.object(cache_service, 'fcntl', None):
+            self.cache.set('https://example.com', {'score': 80})
+            self.cache.persist_stats()
+        self.assertEqual(self.cache.get_cache_stats()['lifetime']['sets'], 1)
+
+class TestNegativeCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = SimpleCache(cache_dir=self.cache_dir, default_ttl=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_host_failure_blocks_other_pages(self):
+        self.cache.record_failure('https://down.example/pricing', 'timeout', 'Read timed out')
+        failure = self.cache.get_failure('https://down.example/about')
+        self.assertIsNotNone(failure)
+        self.assertEqual(failure['error_type'], 'timeout')
+        self.assertGreater(failure['retry_in'], 0)
+
+    def test_4xx_failure_is_page_scoped(self):
+        self.cache.record_failure('https://example.com/missing', 'http_4xx', '404 Not Found')
+        self.assertIsNotNone(self.cache.get_failure('https://example.com/missing'))
+        self.assertIsNone(self.cache.get_failure('https://example.com/'))
+
+    def test_backoff_doubles_per_failure(self):
+        first = self.cache.record_failure('https://flaky.example', 'http_5xx', '503')
+        second = self.cache.record_failure('https://flaky.example', 'http_5xx', '503')
+        self.assertEqual(second['failures'], 2)
+        self.assertEqual(second['retry_in'], first['retry_in'] * 2)
+
+    def test_unknown_errors_not_cached(self):
+        self.assertIsNone(self.cache.record_failure('https://example.com', 'unknown', 'parse error'))
+        self.assertIsNone(self.cache.get_failure('https://example.com'))
+
+    def test_clear_failures(self):
+        self.cache.record_failure('https://down.example', 'dns', 'Name resolution failed')
+        self.cache.clear_failures('https://down.example')
+        self.assertIsNone(self.cache.get_failure('https://down.example'))
+
+class TestCacheWarmer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'audits.db'))
+        self.write_behind_patch = mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False)
+        self.db_patch.start()
+        self.write_behind_patch.start()
+        database.init_database()
+        self.cache = SimpleCache(cache_dir=os.path.join(self.tmp_dir, 'cache'), default_ttl=60)
+
+    def tearDown(self):
+        self.write_behind_patch.stop()
+        self.db_patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_warms_latest_audit_per_url(self):
+        database.save_audit_data('a@example.com', 'https://example.com', {'overall_score': 40})
+        database.save_audit_data('b@example.com', 'http://www.example.com/', {'overall_score': 65})
+        database.save_audit_data('c@example.com', 'https://other.example', {'overall_score': 90})
+
+        status = CacheWarmer(self.cache, max_age=3600, rate=0).run()
+
+        self.assertEqual(status['state'], 'completed')
+        self.assertEqual(status['total'], 2)
+        self.assertEqual(status['warmed'], 2)
+        self.assertEqual(self.cache.get('https://example.com')['score'], 65)
+        self.assertEqual(self.cache.get('https://other.example')['score'], 90)
+
+    def test_skips_already_cached_urls(self):
+        database.save_audit_data('a@example.com', 'https://example.com', {'overall_score': 40})
+        self.cache.set('https://example.com', {'score': 99})
+
+        status = CacheWarmer(self.cache, max_age=3600, rate=0).run()
+
+        self.assertEqual(status['skipped'], 1)
+        self.assertEqual(self.cache.get('https://example.com')['score'], 99)
+
+    def test_warms_audits_older_than_cache_ttl(self):
+        # After a restart longer than the cache TTL there is still something to warm from
+        database.save_audit_data('a@example.com', 'https://example.com', {'overall_score': 40})
+        conn = database.get_connection()
+        conn.execute("UPDATE audits SET created_at = datetime('now', '-1 day')")
+        conn.commit()
+
+        status = CacheWarmer(self.cache, max_age=7 * 86400, rate=0, ttl=7200).run()
+
+        self.assertEqual(status['warmed'], 1)
+        self.assertEqual(self.cache.get('https://example.com')['score'], 40)
+
+class TestAdminEndpoints(unittest.TestCase):
+    def setUp(self):
+        from flask import Flask
+        from routes import api_routes
+        self.api_routes = api_routes
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+
+    def test_warm_requires_admin_key(self):
+        with mock.patch.object(self.api_routes.cache_warmer, 'start', return_value=True) as start:
+            with mock.patch.object(auth, 'ADMIN_API_KEY', ''):
+                self.assertEqual(self.client.post('/api/cache/warm').status_code, 403)
+            with mock.patch.object(auth, 'ADMIN_API_KEY', 'secret'):
+                self.assertEqual(self.client.post('/api/cache/warm', headers={'X-Admin-Key': 'wrong'}).status_code, 401)
+                start.assert_not_called()
+
+                response = self.client.post('/api/cache/warm', headers={'Authorization': 'Bearer secret'})
+                self.assertEqual(response.status_code, 202)
+                start.assert_called_once()
+
+class TestAuditFailureResponses(unittest.TestCase):
+    def setUp(self):
+        from flask import Flask
+        from routes import api_routes
+        self.api_routes = api_routes
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+        self.body = {'url': 'https://down.example', 'email': 'a@example.com'}
+
+    def test_fresh_and_cached_failures_both_ask_for_retry(self):
+        failure = {'error_type': 'timeout', 'retry_in': 60}
+        fresh = {'success': False, 'error': 'Failed to fetch website', **failure}
+        with mock.patch.object(self.api_routes, 'cache') as cache, \
+             mock.patch.object(self.api_routes.auditor, 'run_full_audit', return_value=fresh):
+            cache.get.return_value = None
+            cache.get_failure.return_value = None
+            first = self.client.post('/api/audit', json=self.body)
+
+            cache.get_failure.return_value = failure
+            second = self.client.post('/api/audit', json=self.body)
+
+        for response in (first, second):
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.headers['Retry-After'], '60')
+            self.assertEqual(response.json['retry_in'], 60)
+
+    def test_missing_page_is_not_retryable(self):
+        fresh = {'success': False, 'error': '404 Not Found', 'error_type': 'http_4xx', 'retry_in': 600}
+        with mock.patch.object(self.api_routes, 'cache') as cache, \
+             mock.patch.object(self.api_routes.auditor, 'run_full_audit', return_value=fresh):
+            cache.get.return_value = None
+            cache.get_failure.return_value = None
+            first = self.client.post('/api/audit', json=self.body)
+
+            cache.get_failure.return_value = {'error_type': 'http_4xx', 'retry_in': 600}
+            second = self.client.post('/api/audit', json=self.body)
+
+        for response in (first, second):
+            self.assertEqual(response.status_code, 400)
+            self.assertNotIn('Retry-After', response.headers)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# File: tests/test_connection.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+import threading
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from models.connection import ConnectionManager
+
+class TestConnectionManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'test.db')
+        self.manager = ConnectionManager()
+    
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_connection_reused_per_thread(self):
+        conn = self.manager.get(self.path)
+        self.assertIs(self.manager.get(self.path), conn)
+        
+        other = []
+        thread = threading.Thread(target=lambda: other.append(self.manager.get(self.path)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], conn)
+    
+    def test_wal_and_pragmas(self):
+        conn = self.manager.get(self.path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        self.assertEqual(conn.execute('PRAGMA synchronous').fetchone()[0], 1)  # NORMAL
+        self.assertLess(conn.execute('PRAGMA cache_size').fetchone()[0], 0)
+    
+    def test_transaction_rolls_back_on_error(self):
+        self.manager.get(self.path).execute('CREATE TABLE t (x INTEGER)')
+        with self.assertRaises(ValueError):
+            with self.manager.transaction(self.path) as conn:
+                conn.execute('INSERT INTO t VALUES (1)')
+                raise ValueError('boom')
+        
+        self.assertEqual(self.manager.get(self.path).execute('SELECT COUNT(*) FROM t').fetchone()[0], 0)
+    
+    def test_health_check_reconnects(self):
+        self.assertTrue(self.manager.check_health(self.path)['ok'])
+        
+        self.manager.get(self.path).close()  # simulate a connection that went bad
+        self.assertFalse(self.manager.check_health(self.path)['ok'])
+        self.assertTrue(self.manager.check_health(self.path)['ok'])
+    
+    def test_database_functions_share_connection(self):
+        with mock.patch.object(database, 'DATABASE_PATH', self.path), \
+             mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False):
+            database.init_database()
+            report_id = database.save_audit_data('a@example.com', 'https://example.com', {'overall_score': 70})
+            self.assertEqual(database.get_audit_by_report_id(report_id)['overall_score'], 70)
+            self.assertIs(database.get_connection(), database.get_connection())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+# File: tests/test_download.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+from flask import Flask
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from routes import api_routes
+from services import report_cache
+
+FILENAME = 'audit_example_com_0123456789abcdef.pdf'
+
+class TestReportDownload(unittest.TestCase):
+    def setUp(self):
+        self.reports_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.reports_dir, FILENAME), 'wb') as f:
+            f.write(b'%PDF-1.4 ' + bytes(range(256)) * 8)
+        self.dir_patch = mock.patch.object(api_routes, 'REPORTS_DIR', self.reports_dir)
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.reports_dir, 'test.db'))
+        self.key_patch = mock.patch.object(report_cache, 'SECRET_KEY', 'test-secret')
+        self.dir_patch.start()
+        self.db_patch.start()
+        self.key_patch.start()
+        database.init_database()
+        
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        self.key_patch.stop()
+        self.db_patch.stop()
+        self.dir_patch.stop()
+        shutil.rmtree(self.reports_dir, ignore_errors=True)
+    
+    def _download_url(self, filename=FILENAME, path=None):
+        """/api/download link signed the same way as emailed report links"""
+        url = report_cache.get_signed_report_url(os.path.join(self.reports_dir, filename))
+        return f'/api/download?path={path or filename}&' + url.split('?', 1)[1]
+    
+    def test_strong_etag_and_immutable_caching(self):
+        response = self.client.get(self._download_url(path=f'reports/{FILENAME}'))
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['ETag'], '"0123456789abcdef"')
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('public', response.headers['Cache-Control'])
+        response.close()
+    
+    def test_if_none_match_returns_304(self):
+        response = self.client.get(
+            self._download_url(), headers={'If-None-Match': '"0123456789abcdef"'}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+    
+    def test_range_request(self):
+        response = self.client.get(self._download_url(), headers={'Range': 'bytes=0-8'})
+        
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.data, b'%PDF-1.4 ')
+        response.close()
+    
+    def test_accel_redirect_mode(self):
+        with mock.patch.object(api_routes, 'REPORT_ACCEL_REDIRECT', True):
+            response = self.client.get(self._download_url())
+            cached = self.client.get(
+                self._download_url(), headers={'If-None-Match': '"0123456789abcdef"'}
+            )
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], f'/protected-reports/{FILENAME}')
+        self.assertEqual(response.data, b'')
+        self.assertEqual(cached.status_code, 304)
+        self.assertNotIn('X-Accel-Redirect', cached.headers)
+    
+    def test_indexed_report_found_without_disk_check(self):
+        database.record_report_file(FILENAME, 'https://example.com', '0123456789abcdef', 2057)
+        with mock.patch.object(api_routes.os.path, 'exists', side_effect=AssertionError('filesystem checked')):
+            response = self.client.get(self._download_url())
+        self.assertEqual(response.status_code, 200)
+        response.close()
+    
+    def test_missing_report(self):
+        response = self.client.get(self._download_url('audit_missing.pdf'))
+        self.assertEqual(response.status_code, 404)
+    
+    def test_download_requires_signature(self):
+        self.assertEqual(self.client.get(f'/api/download?path={FILENAME}').status_code, 403)
+        forged = self._download_url().replace('sig=', 'sig=0')
+        self.assertEqual(self.client.get(forged).status_code, 403)
+    
+    def test_no_signed_links_with_default_secret_key(self):
+        url = self._download_url()
+        with mock.patch.object(report_cache, 'SECRET_KEY', report_cache.DEFAULT_SECRET_KEY):
+            # The default key is public, so links signed with it would protect nothing
+            self.assertIsNone(report_cache.get_signed_report_url(os.path.join(self.reports_dir, FILENAME)))
+            self.assertEqual(self.client.get(url).status_code, 403)
+    
+    def test_signed_link(self):
+        url = report_cache.get_signed_report_url(os.path.join(self.reports_dir, FILENAME))
+        path = url[url.index('/api/'):]
+        
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        
+        tampered = self.client.get(path.replace(FILENAME, 'audit_other_0123456789abcdef.pdf'))
+        self.assertEqual(tampered.status_code, 403)
+    
+    def test_expired_signed_link(self):
+        url = report_cache.get_signed_report_url(os.path.join(self.reports_dir, FILENAME), ttl=-1)
+        response = self.client.get(url[url.index('/api/'):])
+        self.assertEqual(response.status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,198 @@
+# File: tests/test_email_outbox.py
+# Runs the outbox against a local HTTP stand-in for the Resend API
+
+import unittest
+from unittest import mock
+import os
+import sys
+import json
+import time
+import base64
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from services.email_outbox import EmailOutbox
+
+class FakeResend(BaseHTTPRequestHandler):
+    """Records requests and answers with queued (status, headers) responses, default 200"""
+    requests = []
+    responses = []
+    
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        FakeResend.requests.append((self.path, self.headers['Authorization'], body))
+        status, headers = FakeResend.responses.pop(0) if FakeResend.responses else (200, {})
+        
+        if status == 200:
+            count = len(body) if isinstance(body, list) else 1
+            ids = [{'id': f'msg-{len(FakeResend.requests)}-{i}'} for i in range(count)]
+            payload = {'data': ids} if isinstance(body, list) else ids[0]
+        else:
+            payload = {'message': 'error'}
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, *args):
+        pass
+
+class TestEmailOutbox(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeResend)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+    
+    def setUp(self):
+        FakeResend.requests = []
+        FakeResend.responses = []
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db')),
+            mock.patch.dict(os.environ, {'RESEND_API_KEY': 'test-key', 'RESEND_API_URL': self.base_url}),
+        ]
+        for patch in self.patches:
+            patch.start()
+        database.init_database()
+        self.outbox = EmailOutbox(rate=0, batch_size=10, max_attempts=3)
+    
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def _enqueue(self, recipient, attachment=None):
+        # Store directly so no background worker starts during the test
+        return database.enqueue_email(recipient, 'Your report', '<p>Hi</p>', attachment)
+    
+    def test_batches_plain_emails_and_sends_attachments_alone(self):
+        pdf = os.path.join(self.tmp_dir, 'report.pdf')
+        with open(pdf, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        ids = [self._enqueue('a@example.com'), self._enqueue('b@example.com'), self._enqueue('c@example.com', pdf)]
+        
+        counts = self.outbox.run_once()
+        
+        self.assertEqual(counts['sent'], 3)
+        paths = [path for path, _, _ in FakeResend.requests]
+        self.assertEqual(sorted(paths), ['/emails', '/emails/batch'])
+        self.assertEqual(FakeResend.requests[0][1], 'Bearer test-key')
+        single = next(body for path, _, body in FakeResend.requests if path == '/emails')
+        self.assertEqual(single['attachments'][0]['filename'], 'report.pdf')
+        self.assertTrue(all(database.get_email_status(i)['status'] == 'sent' for i in ids))
+    
+    def test_attachment_encoded_once(self):
+        pdf = os.path.join(self.tmp_dir, 'report.pdf')
+        with open(pdf, 'wb') as f:
+            f.write(b'%PDF-1.4')
+        self._enqueue('a@example.com', pdf)
+        self._enqueue('b@example.com', pdf)
+        
+        with mock.patch('services.email_outbox.base64.b64encode', wraps=base64.b64encode) as encode:
+            self.assertEqual(self.outbox.run_once()['sent'], 2)
+        
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(self.outbox.get_stats()['attachment_cache']['entries'], 1)
+    
+    def test_duplicate_report_suppressed(self):
+        first = database.enqueue_email('a@example.com', 'Report', '<p>1</p>', dedup_key='k', dedup_window=600)
+        again = database.enqueue_email('a@example.com', 'Report', '<p>2</p>', dedup_key='k', dedup_window=600)
+        other = database.enqueue_email('b@example.com', 'Report', '<p>3</p>', dedup_key='k2', dedup_window=600)
+        
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.outbox.run_once()['sent'], 2)
+    
+    def test_digest_combines_reports_for_recipient(self):
+        ids = [
+            database.enqueue_email('a@example.com', f'Report {i}', f'<p>{i}</p>', digest_html=f'<div>site {i}</div>',
+                                   digest_window=60)
+            for i in range(3)
+        ]
+        self.assertEqual(self.outbox.run_once()['sent'], 0)  # still collecting
+        
+        # Close the window early
+        for email_id in ids:
+            database.reschedule_email(email_id, 0, None)
+        counts = self.outbox.run_once()
+        
+        self.assertEqual(counts['sent'], 3)
+        self.assertEqual(len(FakeResend.requests), 1)
+        path, _, body = FakeResend.requests[0]
+        self.assertEqual(path, '/emails')
+        self.assertIn('3 Websites', body['subject'])
+        self.assertTrue(all(f'site {i}' in body['html'] for i in range(3)))
+    
+    def test_server_error_retried_with_backoff(self):
+        email_id = self._enqueue('a@example.com')
+        FakeResend.responses = [(500, {})]
+        
+        counts = self.outbox.run_once()
+        status = database.get_email_status(email_id)
+        
+        self.assertEqual(counts['retried'], 1)
+        self.assertEqual(status['status'], 'pending')
+        self.assertIn('HTTP 500', status['last_error'])
+        self.assertGreater(status['next_attempt_at'], status['created_at'] + 1)
+        
+        # Not due yet, so nothing is sent until the backoff passes
+        self.assertEqual(self.outbox.run_once()['sent'], 0)
+    
+    def test_rate_limit_pauses_dispatch(self):
+        email_id = self._enqueue('a@example.com')
+        FakeResend.responses = [(429, {'retry-after': '30'})]
+        
+        self.outbox.run_once()
+        status = database.get_email_status(email_id)
+        
+        self.assertEqual(status['status'], 'pending')
+        self.assertGreaterEqual(status['next_attempt_at'] - status['created_at'], 30)
+        self.assertEqual(self.outbox.run_once(), {'sent': 0, 'retried': 0, 'failed': 0})
+    
+    def test_client_error_fails_permanently(self):
+        email_id = self._enqueue('not-an-address')
+        FakeResend.responses = [(422, {})]
+        
+        self.assertEqual(self.outbox.run_once()['failed'], 1)
+        self.assertEqual(database.get_email_status(email_id)['status'], 'failed')
+    
+    def test_rejected_batch_resent_individually(self):
+        good = self._enqueue('a@example.com')
+        bad = self._enqueue('not-an-address')
+        other = self._enqueue('b@example.com')
+        FakeResend.responses = [(422, {}), (200, {}), (422, {}), (200, {})]
+        
+        self.assertEqual(self.outbox.run_once(), {'sent': 2, 'retried': 0, 'failed': 1})
+        self.assertEqual([path for path, _, _ in FakeResend.requests], ['/emails/batch'] + ['/emails'] * 3)
+        self.assertEqual(database.get_email_status(bad)['status'], 'failed')
+        self.assertEqual({database.get_email_status(i)['status'] for i in (good, other)}, {'sent'})
+    
+    def test_send_rate_shared_between_dispatchers(self):
+        # Slots come from the database, so a second worker's dispatcher queues behind the first
+        self.assertEqual(database.reserve_send_slot(0.5), 0)
+        self.assertAlmostEqual(database.reserve_send_slot(0.5), 0.5, delta=0.05)
+        database.pause_send_slots(time.time() + 10)
+        self.assertGreater(database.reserve_send_slot(0.5), 9)
+    
+    def test_retry_delay_has_jitter_and_cap(self):
+        delays = {EmailOutbox.get_retry_delay(3) for _ in range(20)}
+        self.assertGreater(len(delays), 1)
+        self.assertLessEqual(max(EmailOutbox.get_retry_delay(50) for _ in range(20)), 3600)
+
+if __name__ == '__main__':
+    unittest.main()
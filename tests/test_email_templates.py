@@ -0,0 +1,38 @@
+# File: tests/test_email_templates.py
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.email_service import CompiledTemplate, SafeHTML, build_email_body, get_compiled_template
+
+class TestCompiledTemplate(unittest.TestCase):
+    def test_single_pass_render(self):
+        template = CompiledTemplate('<h1>{{name}}</h1>{{body}}<p>{{name}} {{missing}}</p>')
+        
+        rendered = template.render({'name': 'A & B', 'body': SafeHTML('<ul><li>x</li></ul>')})
+        
+        self.assertEqual(rendered, '<h1>A &amp; B</h1><ul><li>x</li></ul><p>A &amp; B {{missing}}</p>')
+    
+    def test_segments_compiled_once(self):
+        self.assertIs(get_compiled_template('low'), get_compiled_template('low'))
+        self.assertIn('critical_issues', get_compiled_template('low').slots)
+    
+    def test_email_body(self):
+        audit_data = {
+            'overall_score': 55,
+            'critical_issues': ['Missing <title> tag'],
+            'recommendations': ['Add schema'],
+        }
+        body = build_email_body(audit_data, 'https://www.example.com')
+        
+        self.assertIn('Example, Google Overlooked', body)
+        self.assertIn('<li>Missing &lt;title&gt; tag</li>', body)
+        self.assertIn('55/100', body)
+        self.assertNotIn('{{', body)
+
+if __name__ == '__main__':
+    unittest.main()
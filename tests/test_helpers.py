@@ -0,0 +1,47 @@
+# File: tests/test_helpers.py
+
+import unittest
+import os
+import sys
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.helpers import canonicalize_url
+
+class TestCanonicalizeUrl(unittest.TestCase):
+    def test_scheme_www_and_trailing_slash(self):
+        self.assertEqual(canonicalize_url('http://www.example.com/'), 'https://example.com')
+        self.assertEqual(canonicalize_url('example.com'), 'https://example.com')
+        self.assertEqual(canonicalize_url('HTTPS://WWW.Example.COM'), 'https://example.com')
+
+    def test_default_ports(self):
+        self.assertEqual(canonicalize_url('http://example.com:80/about'), 'https://example.com/about')
+        self.assertEqual(canonicalize_url('https://example.com:443/about'), 'https://example.com/about')
+        self.assertEqual(canonicalize_url('https://example.com:8443/about'), 'https://example.com:8443/about')
+
+    def test_tracking_params_stripped_and_query_sorted(self):
+        self.assertEqual(
+            canonicalize_url('https://example.com/?utm_source=x&utm_medium=email&gclid=abc'),
+            'https://example.com'
+        )
+        self.assertEqual(
+            canonicalize_url('https://example.com/shop?b=2&fbclid=z&a=1#reviews'),
+            'https://example.com/shop?a=1&b=2'
+        )
+
+    def test_path_case_preserved(self):
+        self.assertEqual(canonicalize_url('https://example.com/About-Us'), 'https://example.com/About-Us')
+
+    def test_idn_host(self):
+        self.assertEqual(canonicalize_url('https://bücher.example/'), 'https://xn--bcher-kva.example')
+
+    def test_content_params_kept(self):
+        # ref often selects content (git refs, referral-gated pages), unlike utm_*/gclid
+        self.assertEqual(
+            canonicalize_url('https://example.com/tree?ref=main&utm_source=x'),
+            'https://example.com/tree?ref=main'
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+# File: tests/test_rate_limiter.py
+
+import unittest
+import os
+import sys
+import time
+import shutil
+import socket
+import tempfile
+import threading
+import subprocess
+from flask import Flask, jsonify
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import rate_limiter as limiter_module
+from utils.rate_limiter import BaseRateLimiter, RateLimiter, SQLiteRateLimiter, RedisRateLimiter, rate_limit, email_rate_limit, redis
+
+REDIS_SERVER = shutil.which('redis-server')
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _hit_concurrently(make_limiter, key, limit, threads=8, per_thread=10):
+    """Allowed requests when several limiters (one per simulated worker) race on one key"""
+    allowed = []
+    def worker():
+        limiter = make_limiter()
+        allowed.extend(limiter.is_allowed(key, limit=limit, window=3600) for _ in range(per_thread))
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sum(allowed)
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(max_keys=3, sweep_interval=10, clock=self.clock)
+    
+    def test_limit_within_window(self):
+        results = [self.limiter.is_allowed('ip', limit=3, window=100) for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+        self.assertGreater(self.limiter.get_reset_time('ip'), 0)
+    
+    def test_previous_window_decays(self):
+        for _ in range(4):
+            self.limiter.is_allowed('ip', limit=4, window=100)
+        # Halfway into the next window half the previous count still applies
+        self.clock.now = 1150
+        results = [self.limiter.is_allowed('ip', limit=4, window=100) for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        
+        retry = self.limiter.hit('ip', limit=4, window=100)[1]
+        self.clock.now += retry
+        self.assertTrue(self.limiter.is_allowed('ip', limit=4, window=100))
+    
+    def test_reset_time_does_not_track_unknown_keys(self):
+        self.assertEqual(self.limiter.get_reset_time('never-seen'), 0)
+        self.assertEqual(self.limiter.get_stats()['tracked_keys'], 0)
+    
+    def test_idle_keys_are_evicted(self):
+        self.limiter.is_allowed('old', window=100)
+        self.clock.now = 1300
+        self.limiter.is_allowed('new', window=100)
+        
+        stats = self.limiter.get_stats()
+        self.assertEqual(stats['tracked_keys'], 1)
+        self.assertEqual(stats['evicted_idle'], 1)
+    
+    def test_tracked_keys_are_capped(self):
+        for i in range(5):
+            self.limiter.is_allowed(f'ip-{i}')
+        stats = self.limiter.get_stats()
+        self.assertEqual(stats['tracked_keys'], 3)
+        self.assertEqual(stats['evicted_capacity'], 2)
+    
+    def test_backends_must_implement_hit(self):
+        class Incomplete(BaseRateLimiter):
+            pass
+        
+        with self.assertRaises(TypeError):
+            Incomplete()
+    
+    def test_decorators_are_scoped_per_endpoint(self):
+        original = limiter_module.rate_limiter
+        limiter_module.rate_limiter = RateLimiter()
+        try:
+            app = Flask(__name__)
+            
+            @app.route('/one', methods=['POST'])
+            @rate_limit(limit=1, window=3600)
+            @email_rate_limit(limit=5, window=3600)
+            def one():
+                return jsonify({'ok': True})
+            
+            @app.route('/two', methods=['POST'])
+            @rate_limit(limit=1, window=3600)
+            def two():
+                return jsonify({'ok': True})
+            
+            client = app.test_client()
+            body = {'email': 'a@example.com'}
+            self.assertEqual(client.post('/one', json=body).status_code, 200)
+            self.assertEqual(client.post('/two', json=body).status_code, 200)
+            
+            limited = client.post('/one', json=body)
+            self.assertEqual(limited.status_code, 429)
+            self.assertGreater(int(limited.headers['Retry-After']), 0)
+        finally:
+            limiter_module.rate_limiter = original
+
+class TestSQLiteRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'rate_limits.db')
+        self.clock = FakeClock()
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_workers_share_one_limit(self):
+        first = SQLiteRateLimiter(self.path, clock=self.clock)
+        second = SQLiteRateLimiter(self.path, clock=self.clock)
+        self.assertTrue(first.is_allowed('ip', limit=2, window=100))
+        self.assertTrue(second.is_allowed('ip', limit=2, window=100))
+        self.assertFalse(first.is_allowed('ip', limit=2, window=100))
+        self.assertGreater(second.get_reset_time('ip'), 0)
+    
+    def test_concurrent_hits_never_exceed_limit(self):
+        allowed = _hit_concurrently(lambda: SQLiteRateLimiter(self.path), 'ip', limit=25)
+        self.assertEqual(allowed, 25)
+    
+    def test_idle_keys_are_swept(self):
+        limiter = SQLiteRateLimiter(self.path, sweep_interval=10, clock=self.clock)
+        limiter.is_allowed('old', window=100)
+        self.clock.now = 1300
+        limiter.is_allowed('new', window=100)
+        self.assertEqual(limiter.get_stats()['tracked_keys'], 1)
+    
+    def test_falls_back_to_process_limits(self):
+        limiter = SQLiteRateLimiter(self.path, fallback=RateLimiter(), clock=self.clock)
+        limiter.path = os.path.join(self.tmp_dir, 'missing', 'rate_limits.db')
+        results = [limiter.is_allowed('ip', limit=1, window=100) for _ in range(2)]
+        self.assertEqual(results, [True, False])
+
+@unittest.skipUnless(REDIS_SERVER and redis, 'redis-server binary and redis package required')
+class TestRedisRateLimiter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.port = _free_port()
+        cls.server = subprocess.Popen(
+            [REDIS_SERVER, '--port', str(cls.port), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        cls.url = f'redis://127.0.0.1:{cls.port}/0'
+        for _ in range(50):
+            try:
+                redis.Redis.from_url(cls.url).ping()
+                break
+            except redis.exceptions.ConnectionError:
+                time.sleep(0.1)
+    
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+    
+    def setUp(self):
+        redis.Redis.from_url(self.url).flushdb()
+    
+    def test_concurrent_hits_never_exceed_limit(self):
+        allowed = _hit_concurrently(lambda: RedisRateLimiter.from_url(self.url, prefix='test:'), 'ip', limit=25)
+        self.assertEqual(allowed, 25)
+        
+        limiter = RedisRateLimiter.from_url(self.url, prefix='test:')
+        allowed, retry = limiter.hit('ip', limit=25, window=3600)
+        self.assertFalse(allowed)
+        self.assertGreater(retry, 0)
+        self.assertGreater(limiter.get_reset_time('ip', window=3600), 0)
+        self.assertGreater(limiter.client.ttl('test:ip'), 0)
+    
+    def test_cache_clear_keeps_limits(self):
+        from services.redis_cache import RedisCache
+        cache = RedisCache.from_url(self.url)
+        cache.set('https://example.com', {'score': 70})
+        limiter = RedisRateLimiter.from_url(self.url)
+        self.assertTrue(limiter.is_allowed('ip', limit=1, window=3600))
+        
+        self.assertEqual(cache.get_cache_stats()['total_cached_items'], 1)
+        self.assertEqual(cache.clear(), 1)
+        self.assertFalse(limiter.is_allowed('ip', limit=1, window=3600))
+    
+    def test_falls_back_when_redis_is_down(self):
+        limiter = RedisRateLimiter.from_url(self.url, fallback=RateLimiter(), prefix='test:')
+        limiter.client = redis.Redis(port=_free_port(), socket_connect_timeout=0.2)
+        limiter._hit = limiter.client.register_script('return 0')
+        results = [limiter.is_allowed('ip', limit=1, window=100) for _ in range(2)]
+        self.assertEqual(results, [True, False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+# File: tests/test_redis_cache.py
+# Runs against a throwaway redis-server started on a free local port
+
+import unittest
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tempfile
+import subprocess
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_service import SimpleCache, get_cache_key
+from services.redis_cache import RedisCache, redis
+
+REDIS_SERVER = shutil.which('redis-server')
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@unittest.skipUnless(REDIS_SERVER and redis, 'redis-server binary and redis package required')
+class TestRedisCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.port = _free_port()
+        cls.server = subprocess.Popen(
+            [REDIS_SERVER, '--port', str(cls.port), '--bind', '127.0.0.1', '--save', '', '--appendonly', 'no'],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        cls.url = f'redis://127.0.0.1:{cls.port}/0'
+        for _ in range(50):
+            try:
+                redis.Redis.from_url(cls.url).ping()
+                break
+            except redis.exceptions.ConnectionError:
+                time.sleep(0.1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.fallback = SimpleCache(cache_dir=self.cache_dir, default_ttl=60)
+        self.cache = RedisCache.from_url(self.url, fallback=self.fallback, default_ttl=60, prefix='test:')
+        self.cache.clear()
+
+    def tearDown(self):
+        self.cache.stop_janitor()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_set_get_with_server_side_ttl(self):
+        self.cache.set('http://www.example.com/', {'score': 75}, ttl=120)
+        self.assertEqual(self.cache.get('https://example.com'), {'score': 75})
+
+        ttl = self.cache.client.ttl(self.cache._audit_key(get_cache_key('https://example.com')))
+        self.assertTrue(0 < ttl <= 120)
+
+    def test_get_many_pipelined(self):
+        self.cache.set('https://a.example', {'score': 1})
+        self.cache.set('https://b.example', {'score': 2})
+
+        results = self.cache.get_many(['https://a.example', 'https://b.example', 'https://missing.example'])
+
+        self.assertEqual(results, {'https://a.example': {'score': 1}, 'https://b.example': {'score': 2}})
+
+    def test_shared_between_instances_with_invalidation(self):
+        other = RedisCache.from_url(self.url, default_ttl=60, prefix='test:')
+        try:
+            self.cache.set('https://example.com', {'score': 10})
+            self.assertEqual(other.get('https://example.com'), {'score': 10})
+
+            # Other worker now holds a local copy; an update here must invalidate it
+            self.cache.set('https://example.com', {'score': 20})
+            for _ in range(50):
+                if other.get('https://example.com') == {'score': 20}:
+                    break
+                time.sleep(0.05)
+            self.assertEqual(other.get('https://example.com'), {'score': 20})
+
+            self.cache.delete('https://example.com')
+            for _ in range(50):
+                if other.get('https://example.com') is None:
+                    break
+                time.sleep(0.05)
+            self.assertIsNone(other.get('https://example.com'))
+        finally:
+            other.stop_janitor()
+
+    def test_lost_listener_bypasses_local_copies(self):
+        other = RedisCache.from_url(self.url, default_ttl=60, prefix='test:')
+        try:
+            self.cache.set('https://example.com', {'score': 10})
+            self.assertEqual(other.get('https://example.com'), {'score': 10})
+
+            # Drop the subscriber connections, as a Redis restart or failover would
+            self.cache.client.client_kill_filter(_type='pubsub')
+            for _ in range(100):
+                if other._listener is None:
+                    break
+                time.sleep(0.05)
+            self.assertIsNone(other._listener)
+
+            # Missed invalidations can't leave the other worker serving its old copy
+            self.cache.client.set(self.cache._audit_key(get_cache_key('https://example.com')),
+                                  json.dumps({'data': {'score': 20}, 'expires_at': time.time() + 60}), ex=60)
+            self.assertEqual(other.get('https://example.com'), {'score': 20})
+            self.assertIsNotNone(other._listener)  # resubscribed on that read
+        finally:
+            other.stop_janitor()
+
+    def test_negative_cache(self):
+        first = self.cache.record_failure('https://down.example/a', 'timeout', 'timed out')
+        second = self.cache.record_failure('https://down.example/b', 'timeout', 'timed out')
+        self.assertEqual(second['retry_in'], first['retry_in'] * 2)
+        self.assertIsNotNone(self.cache.get_failure('https://down.example/c'))
+
+        self.cache.clear_failures('https://down.example')
+        self.assertIsNone(self.cache.get_failure('https://down.example/c'))
+
+    def test_falls_back_to_file_cache_when_redis_down(self):
+        broken = RedisCache(
+            redis.Redis(host='127.0.0.1', port=_free_port(), socket_connect_timeout=0.2),
+            fallback=self.fallback, default_ttl=60
+        )
+        self.assertTrue(broken.set('https://example.com', {'score': 5}))
+        self.assertEqual(broken.get('https://example.com'), {'score': 5})
+        self.assertEqual(self.fallback.get('https://example.com'), {'score': 5})
+
+if __name__ == '__main__':
+    unittest.main()
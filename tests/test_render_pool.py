@@ -0,0 +1,117 @@
+# File: tests/test_render_pool.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import time
+import shutil
+import tempfile
+from concurrent.futures import Future
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from services import render_pool, report_cache
+
+AUDIT_DATA = {
+    'overall_score': 62,
+    'category_scores': {'technical_seo': 70, 'content_quality': 55},
+    'critical_issues': ['Missing schema markup'],
+    'quick_wins': ['Add a meta description'],
+}
+
+class TestRenderPool(unittest.TestCase):
+    def setUp(self):
+        self.reports_dir = tempfile.mkdtemp()
+        db_path = os.path.join(self.reports_dir, 'test.db')
+        # Render processes are spawned fresh and read their paths from the environment
+        self.env_patch = mock.patch.dict(os.environ, {'REPORTS_DIR': self.reports_dir, 'DATABASE_PATH': db_path})
+        self.dir_patch = mock.patch.object(report_cache, 'REPORTS_DIR', self.reports_dir)
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', db_path)
+        self.env_patch.start()
+        self.dir_patch.start()
+        self.db_patch.start()
+        database.init_database()
+    
+    def tearDown(self):
+        render_pool.shutdown()
+        self.db_patch.stop()
+        self.dir_patch.stop()
+        self.env_patch.stop()
+        shutil.rmtree(self.reports_dir, ignore_errors=True)
+    
+    def test_render_in_pool_returns_future(self):
+        website_data = {'url': 'https://example.com'}
+        future = render_pool.submit_render(AUDIT_DATA, website_data, timeout=60)
+        self.assertIsInstance(future, Future)
+        
+        path = future.result(timeout=60)
+        
+        self.assertEqual(path, report_cache.get_report_path(AUDIT_DATA, website_data['url']))
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(render_pool.is_rendering(os.path.basename(path)))
+    
+    def test_on_done_runs_after_render(self):
+        future = render_pool.submit_render(AUDIT_DATA, {'url': 'https://example.com'}, timeout=60)
+        chained = render_pool.on_done(future, lambda done: os.path.basename(done.result()))
+        self.assertTrue(chained.result(timeout=60).endswith('.pdf'))
+    
+    def test_timeout_fails_future(self):
+        outer = Future()
+        render_pool._expire(outer, 0.1)
+        with self.assertRaises(render_pool.RenderTimeout):
+            outer.result()
+        
+        # A late result from the render process must not overwrite the timeout
+        render_pool._settle(outer, result='late.pdf')
+        with self.assertRaises(render_pool.RenderTimeout):
+            outer.result()
+    
+    def test_hung_render_recycles_pool(self):
+        future = render_pool._submit('hung.pdf', 0.5, time.sleep, 60)
+        with self.assertRaises(render_pool.RenderTimeout):
+            future.result(timeout=30)
+        
+        # The stuck process is killed and its slot freed, so later renders get a fresh pool
+        for _ in range(100):
+            if render_pool.get_pool_stats()['pending'] == 0:
+                break
+            time.sleep(0.1)
+        self.assertEqual(render_pool.get_pool_stats()['pending'], 0)
+        path = render_pool.submit_render(AUDIT_DATA, {'url': 'https://example.com'}, timeout=60).result(timeout=60)
+        self.assertTrue(os.path.exists(path))
+    
+    def test_time_spent_queued_does_not_count(self):
+        with mock.patch.object(render_pool, 'RENDER_POOL_WORKERS', 1):
+            busy = render_pool._submit('busy.pdf', 30, time.sleep, 2)
+            queued = render_pool._submit('queued.pdf', 1, time.sleep, 0.1)
+        
+        # Waits ~2s behind the busy render but only runs for 0.1s of its 1s budget
+        self.assertIsNone(queued.result(timeout=30))
+        self.assertIsNone(busy.result(timeout=30))
+    
+    def test_renders_sharing_a_recycled_pool_are_resubmitted(self):
+        hung = render_pool._submit('hung.pdf', 0.5, time.sleep, 60)
+        bystander = render_pool._submit('bystander.pdf', 30, time.sleep, 1.5)
+        
+        with self.assertRaises(render_pool.RenderTimeout):
+            hung.result(timeout=30)
+        # Killing the hung process breaks the pool under the other render, which runs again on the new one
+        self.assertIsNone(bystander.result(timeout=30))
+    
+    def test_queue_full_rejects(self):
+        with mock.patch.object(render_pool, 'RENDER_QUEUE_SIZE', 0):
+            future = render_pool.submit_render(AUDIT_DATA, {'url': 'https://example.com'})
+        with self.assertRaises(render_pool.RenderQueueFull):
+            future.result()
+    
+    def test_inline_when_pool_disabled(self):
+        with mock.patch.object(render_pool, 'RENDER_POOL_WORKERS', 0):
+            future = render_pool.submit_render(AUDIT_DATA, {'url': 'https://example.com'})
+        self.assertTrue(future.done())
+        self.assertTrue(os.path.exists(future.result()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# File: tests/test_report_cache.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from services import report_cache
+from services.report_generator import generate_pdf_report
+
+AUDIT_DATA = {
+    'overall_score': 62,
+    'category_scores': {'technical_seo': 70, 'content_quality': 55},
+    'critical_issues': ['Missing schema markup', 'Images missing alt text'],
+    'quick_wins': ['Add a meta description'],
+}
+
+class TestReportCache(unittest.TestCase):
+    def setUp(self):
+        self.reports_dir = tempfile.mkdtemp()
+        self.dir_patch = mock.patch.object(report_cache, 'REPORTS_DIR', self.reports_dir)
+        self.db_patch = mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.reports_dir, 'index.db'))
+        self.dir_patch.start()
+        self.db_patch.start()
+        database.init_database()
+    
+    def tearDown(self):
+        self.db_patch.stop()
+        self.dir_patch.stop()
+        shutil.rmtree(self.reports_dir, ignore_errors=True)
+    
+    def test_identical_data_renders_once(self):
+        website_data = {'url': 'https://example.com'}
+        with mock.patch.object(report_cache, 'generate_pdf_report', wraps=report_cache.generate_pdf_report) as render:
+            first = report_cache.render_pdf_cached(dict(AUDIT_DATA), website_data)
+            second = report_cache.render_pdf_cached({**AUDIT_DATA, 'website_url': 'https://example.com'}, website_data)
+        
+        self.assertEqual(first, second)
+        self.assertTrue(os.path.exists(first))
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual([name for name in os.listdir(self.reports_dir) if name.endswith('.pdf')], [os.path.basename(first)])
+        
+        record = report_cache.lookup_report(os.path.basename(first))
+        self.assertEqual(record['url'], 'https://example.com')
+        self.assertEqual(record['size'], os.path.getsize(first))
+        self.assertEqual(database.get_report_file_stats()['files'], 1)
+    
+    def test_changed_data_gets_new_report(self):
+        website_data = {'url': 'https://example.com'}
+        first = report_cache.get_report_path(AUDIT_DATA, website_data['url'])
+        second = report_cache.get_report_path({**AUDIT_DATA, 'overall_score': 90}, website_data['url'])
+        self.assertNotEqual(first, second)
+    
+    def test_compact_profile(self):
+        website_data = {'url': 'https://example.com'}
+        paths = {}
+        for name in ('compact', 'compact_again', 'standard'):
+            paths[name] = os.path.join(self.reports_dir, f'{name}.pdf')
+            generate_pdf_report(AUDIT_DATA, website_data, paths[name], profile=name.replace('_again', ''))
+        
+        with open(paths['compact'], 'rb') as a, open(paths['compact_again'], 'rb') as b:
+            self.assertEqual(a.read(), b.read())  # invariant builds are byte-identical
+        self.assertLess(os.path.getsize(paths['compact']), os.path.getsize(paths['standard']))
+    
+    def test_cleanup_by_age_and_size(self):
+        now = time.time()
+        for name, age in (('old.pdf', 10000), ('older_used.pdf', 300), ('recent.pdf', 10)):
+            path = os.path.join(self.reports_dir, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 1000)
+            os.utime(path, (now - age, now - age))
+        
+        result = report_cache.cleanup_reports(max_age=5000, max_bytes=1500)
+        
+        self.assertEqual(result['removed_expired'], 1)
+        self.assertEqual(result['removed_over_budget'], 1)
+        self.assertEqual([name for name in os.listdir(self.reports_dir) if name.endswith('.pdf')], ['recent.pdf'])
+        self.assertEqual([record['filename'] for record in database.get_report_files()], ['recent.pdf'])
+    
+    def test_lru_uses_index_access_time(self):
+        now = time.time()
+        for name in ('a.pdf', 'b.pdf'):
+            with open(os.path.join(self.reports_dir, name), 'wb') as f:
+                f.write(b'x' * 1000)
+            database.record_report_file(name, None, None, 1000, created_at=now - 600)
+        # b.pdf is older on disk but was downloaded recently
+        database.touch_report_file('b.pdf')
+        
+        result = report_cache.cleanup_reports(max_age=0, max_bytes=1000)
+        
+        self.assertEqual(result['removed_over_budget'], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.reports_dir, 'a.pdf')))
+        self.assertIsNotNone(report_cache.lookup_report('b.pdf'))
+    
+    def test_sync_drops_missing_files(self):
+        database.record_report_file('gone.pdf', 'https://example.com', None, 10)
+        self.assertEqual(report_cache.sync_report_index(), {'indexed': 0, 'dropped': 1})
+        self.assertIsNone(report_cache.lookup_report('gone.pdf'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# File: tests/test_report_view.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+from flask import Flask
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from routes import api_routes
+from services import render_pool, report_cache, seo_auditor
+from services.report_generator import format_audit_date
+from services.report_view import build_report_view, render_report_html
+
+AUDIT_DATA = {
+    'overall_score': 55,
+    'category_scores': {'technical_seo': 85, 'content_quality': 40},
+    'critical_issues': ['Missing schema markup', '<script>alert(1)</script>'],
+    'quick_wins': ['Add a meta description'],
+    'recommendations': ['Add FAQ schema'],
+}
+
+class TestReportView(unittest.TestCase):
+    def test_view_sections(self):
+        view = build_report_view(AUDIT_DATA, 'https://example.com')
+        
+        self.assertEqual(view['overall_score'], 55)
+        self.assertEqual(view['categories'][0]['status'], 'Strong')
+        self.assertEqual(view['categories'][1]['priority'], 'Critical')
+        self.assertIn('schema', view['critical_issues'][0]['context'][0])
+    
+    def test_html_escapes_audit_text(self):
+        page = render_report_html(build_report_view(AUDIT_DATA, 'https://example.com'), '/api/report/x/pdf')
+        
+        self.assertIn('&lt;script&gt;', page)
+        self.assertNotIn('<script>', page)
+        self.assertIn('href="/api/report/x/pdf"', page)
+    
+    def test_html_escapes_scores(self):
+        # Stored audit data is only as trustworthy as whatever wrote it
+        view = build_report_view(AUDIT_DATA, 'https://example.com')
+        view['overall_score'] = '<b>55</b>'
+        view['categories'][0]['score'] = '<img src=x onerror=alert(1)>'
+        page = render_report_html(view)
+        
+        self.assertNotIn('<img', page)
+        self.assertNotIn('<b>55', page)
+
+class TestReportRoutes(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db')),
+            mock.patch.object(report_cache, 'REPORTS_DIR', self.tmp_dir),
+            mock.patch.object(render_pool, 'RENDER_POOL_WORKERS', 0),
+            mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False),
+        ]
+        for patch in self.patches:
+            patch.start()
+        database.init_database()
+        self.report_id = database.save_audit_data('a@example.com', 'https://www.example.com/', AUDIT_DATA)
+        
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        render_pool.shutdown()
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_json_and_html_views(self):
+        response = self.client.get(f'/api/report/{self.report_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['url'], 'https://example.com')
+        self.assertEqual(response.json['pdf_url'], f'/api/report/{self.report_id}/pdf')
+        
+        cached = self.client.get(f'/api/report/{self.report_id}', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        
+        page = self.client.get(f'/api/report/{self.report_id}?format=html')
+        self.assertEqual(page.mimetype, 'text/html')
+        self.assertIn(b'Performance by Category', page.data)
+        
+        # Viewing never renders a PDF
+        self.assertEqual([name for name in os.listdir(self.tmp_dir) if name.endswith('.pdf')], [])
+    
+    def test_pdf_rendered_once_on_first_download(self):
+        with mock.patch.object(report_cache, 'generate_pdf_report', wraps=report_cache.generate_pdf_report) as render:
+            first = self.client.get(f'/api/report/{self.report_id}/pdf')
+            second = self.client.get(f'/api/report/{self.report_id}/pdf')
+        
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.data.startswith(b'%PDF'))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(render.call_count, 1)
+        first.close()
+        second.close()
+    
+    def test_pdf_uses_stored_audit_date(self):
+        conn = database.get_connection()
+        conn.execute("UPDATE audits SET created_at = '2024-01-15 10:00:00'")
+        conn.commit()
+        with mock.patch.object(report_cache, 'generate_pdf_report', wraps=report_cache.generate_pdf_report) as render:
+            response = self.client.get(f'/api/report/{self.report_id}/pdf')
+        
+        self.assertEqual(response.status_code, 200)
+        website_data = render.call_args[0][1]
+        self.assertEqual(format_audit_date(website_data['audit_date']), 'January 15, 2024')
+        response.close()
+    
+    def test_emailed_pdf_is_the_downloaded_pdf(self):
+        auditor = seo_auditor.SEOAuditor()
+        with mock.patch.object(seo_auditor, 'scrape_website', return_value={'url': 'https://example.com'}), \
+             mock.patch.object(seo_auditor, 'analyze_with_ai', return_value=dict(AUDIT_DATA)), \
+             mock.patch.object(seo_auditor, 'send_email_report', return_value=True), \
+             mock.patch.object(seo_auditor, 'EMAIL_ATTACH_PDF', True), \
+             mock.patch.object(seo_auditor, 'is_email_configured', return_value=True), \
+             mock.patch.object(report_cache, 'generate_pdf_report', wraps=report_cache.generate_pdf_report) as render:
+            result = auditor.run_full_audit('https://example.com', 'b@example.com')
+            render_pool._get_executors()[1].shutdown(wait=True)  # let the queued email render run
+            response = self.client.get(result['pdf_url'])
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, os.path.basename(result['pdf_path']))))
+        response.close()
+    
+    def test_unknown_report(self):
+        self.assertEqual(self.client.get('/api/report/missing').status_code, 404)
+        self.assertEqual(self.client.get('/api/report/missing/pdf').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# File: tests/test_rollups.py
+
+import unittest
+from unittest import mock
+import os
+import sys
+import shutil
+import tempfile
+from flask import Flask
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import database
+from routes import api_routes
+
+def audit(score, industry):
+    return {
+        'overall_score': score,
+        'industry': industry,
+        'category_scores': {'technical_seo': score + 10, 'content_quality': score - 10}
+    }
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.patches = [
+            mock.patch.object(database, 'DATABASE_PATH', os.path.join(self.tmp_dir, 'test.db')),
+            mock.patch.object(database, 'AUDIT_WRITE_BEHIND', False),
+        ]
+        for patch in self.patches:
+            patch.start()
+        database.init_database()
+        
+        database.save_audit_data('a@example.com', 'https://example.com', audit(60, 'E-commerce'))
+        database.save_audit_data('a@example.com', 'https://example.com/shop', audit(80, 'e-commerce '))
+        database.save_audit_data('b@example.com', 'https://clinic.example', audit(40, 'Healthcare'))
+        
+        app = Flask(__name__)
+        app.register_blueprint(api_routes.api_bp, url_prefix='/api')
+        self.client = app.test_client()
+    
+    def tearDown(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+    
+    def test_stats_from_rollups(self):
+        stats = self.client.get('/api/stats?days=7').get_json()
+        
+        self.assertEqual(len(stats['daily']), 1)
+        today = stats['daily'][0]
+        self.assertEqual(today['audits'], 3)
+        self.assertEqual(today['average_scores']['overall'], 60.0)
+        self.assertEqual(today['average_scores']['technical_seo'], 70.0)
+        
+        industries = {row['industry']: row for row in stats['industries']}
+        self.assertEqual(industries['e-commerce']['audits'], 2)
+        self.assertEqual(industries['e-commerce']['average_scores']['overall'], 70.0)
+    
+    def test_domain_series(self):
+        stats = self.client.get('/api/stats?domain=www.example.com').get_json()
+        self.assertEqual(stats['domain'], 'example.com')
+        self.assertEqual(stats['daily'][0]['audits'], 2)
+    
+    def test_replayed_rows_not_counted_twice(self):
+        row = dict(database.get_connection().execute('SELECT * FROM audits LIMIT 1').fetchone())
+        row['audit_data'] = '{"overall_score": 60}'
+        database.insert_audit_rows([row])  # same report_id, ignored
+        
+        # Rebuilding from scratch gives the same numbers as the incremental updates
+        conn = database.get_connection()
+        incremental = conn.execute('SELECT * FROM audit_rollups ORDER BY dimension, key').fetchall()
+        conn.execute('DELETE FROM audit_rollups')
+        conn.execute('DELETE FROM rollup_state')
+        database.update_rollups(conn.cursor())
+        rebuilt = conn.execute('SELECT * FROM audit_rollups ORDER BY dimension, key').fetchall()
+        self.assertEqual([tuple(r) for r in incremental], [tuple(r) for r in rebuilt])
+
+if __name__ == '__main__':
+    unittest.main()
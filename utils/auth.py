@@ -0,0 +1,30 @@
+# File: utils/auth.py
+# Shared-secret check for admin API endpoints
+
+import hmac
+from functools import wraps
+from flask import request, jsonify
+from config.settings import ADMIN_API_KEY
+
+def get_request_key() -> str:
+    """Admin key sent as X-Admin-Key or as an Authorization: Bearer token"""
+    auth = request.headers.get('Authorization', '')
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    return request.headers.get('X-Admin-Key', '')
+
+def is_admin_request() -> bool:
+    """Whether the request carries the configured admin key"""
+    # With no key configured nothing is admin, rather than everything
+    return bool(ADMIN_API_KEY) and hmac.compare_digest(get_request_key().encode(), ADMIN_API_KEY.encode())
+
+def admin_required(f):
+    """Reject requests without the admin key"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_API_KEY:
+            return jsonify({'success': False, 'error': 'Admin endpoints are disabled (ADMIN_API_KEY not set)'}), 403
+        if not is_admin_request():
+            return jsonify({'success': False, 'error': 'Admin key required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
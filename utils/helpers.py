@@ -2,7 +2,17 @@
 # Helper functions for URL validation, email validation, and text processing
 
 import re
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only carry campaign/click tracking and never change page content
+TRACKING_PARAMS = {
+    'gclid', 'dclid', 'gbraid', 'wbraid', 'fbclid', 'msclkid', 'yclid', 'twclid',
+    'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl', '_hsenc', '_hsmi', 'mkt_tok',
+    'ref_src', 'spm'
+}
+TRACKING_PREFIXES = ('utm_', 'pk_', 'hsa_')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
 
 def clean_url(url: str) -> str:
     """Clean and validate URL"""
@@ -18,6 +28,56 @@ def clean_url(url: str) -> str:
     
     return url
 
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def canonicalize_url(url: str) -> str:
+    """Reduce a URL to the canonical form used for cache keys and stored audits.
+
+    Forces https, lowercases the host, drops a leading "www.", default ports,
+    fragments, trailing slashes and tracking parameters, sorts the remaining
+    query string and encodes internationalized hosts as punycode. Purely
+    syntactic, so every worker (and every restart) maps a URL to the same key.
+    """
+    if not url:
+        return url
+
+    url = url.strip()
+    if not re.match(r'^https?://', url, re.IGNORECASE):
+        url = 'https://' + url
+
+    parts = urlsplit(url)
+    host = (parts.hostname or '').rstrip('.')
+    try:
+        host = host.encode('idna').decode('ascii')
+    except UnicodeError:
+        pass
+    host = host.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(parts.scheme):
+        host = f'{host}:{port}'
+
+    path = parts.path.rstrip('/')
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(key)
+    )
+
+    return urlunsplit(('https', host, path, urlencode(query), ''))
+
+def get_domain(url: str) -> str:
+    """Host of a URL as stored for audits (lowercase, no leading www. or port)"""
+    if not url:
+        return ''
+    return urlsplit(canonicalize_url(url)).hostname or ''
+
 def is_valid_email(email: str) -> bool:
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -0,0 +1,35 @@
+# File: utils/process_lock.py
+# Host-wide named locks so a background job runs in only one Gunicorn worker at a time
+
+import os
+import threading
+from config.settings import LOCK_DIR
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+_lock = threading.Lock()
+_held = {}  # name -> (pid, fd) of locks this process holds
+
+def hold_lock(name: str) -> bool:
+    """Take the named lock for the life of this process without waiting; True if this process holds it"""
+    with _lock:
+        held = _held.get(name)
+        if held and held[0] == os.getpid():
+            return True
+        if fcntl is None:
+            return True  # no flock (Windows): single process assumed
+        
+        # A fresh descriptor: one inherited through fork would share the parent's lock
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        fd = os.open(os.path.join(LOCK_DIR, f'{name}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Released by the OS when the process exits, so another worker can take over
+        _held[name] = (os.getpid(), fd)
+        return True
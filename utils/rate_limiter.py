@@ -2,55 +2,314 @@
 # Rate limiting functionality for API endpoints
 
 import time
-from collections import defaultdict, deque
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 import hashlib
+from config.settings import (
+    RATE_LIMIT_MAX_KEYS, RATE_LIMIT_SWEEP_INTERVAL, RATE_LIMIT_BACKEND, RATE_LIMIT_DB_PATH,
+    RATE_LIMIT_KEY_PREFIX, REDIS_URL
+)
+from models.connection import connections
 
-class RateLimiter:
-    def __init__(self):
-        self.requests = defaultdict(deque)
-        self.email_requests = defaultdict(deque)
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+def _roll(index, current, previous, now, window):
+    """Counts moved forward to the window containing now: (index, current, previous)"""
+    new_index = int(now // window)
+    if new_index == index:
+        return index, current, previous
+    return new_index, 0, current if new_index == index + 1 else 0
+
+def _estimate(current, previous, now, window):
+    """Requests in the last window, weighting the previous window by how much of it still overlaps"""
+    return previous * (1 - (now % window) / window) + current
+
+def _retry_after(current, previous, limit, now, window):
+    """Seconds until the estimate leaves room for one more request"""
+    elapsed = (now % window) / window
+    room = limit - 1 - current
+    if room >= 0 and previous:
+        # Frees up within this window as the previous window's weight decays
+        return max(1, int((1 - room / previous - elapsed) * window) + 1)
+    # Otherwise this window's count has to decay in the next one
+    until_next = (1 - elapsed) * window
+    if current <= 0:
+        return max(1, int(until_next) + 1)
+    decay = max(0.0, 1 - (limit - 1) / current)
+    return max(1, int(until_next + decay * window) + 1)
+
+class _Window:
+    """Sliding window counter state for one key: two counts instead of every timestamp"""
+    __slots__ = ('index', 'current', 'previous', 'window', 'limit')
+    
+    def __init__(self, index, window, limit):
+        self.index = index
+        self.current = 0
+        self.previous = 0
+        self.window = window
+        self.limit = limit
+
+class BaseRateLimiter(ABC):
+    """Key helpers shared by the rate limiter backends; subclasses implement hit()"""
+    
+    @abstractmethod
+    def hit(self, key, limit=10, window=3600):
+        """Count a request against key; returns (allowed, seconds until the next one would be allowed)"""
     
     def is_allowed(self, key, limit=10, window=3600):
         """Check if request is allowed based on rate limit"""
-        now = time.time()
-        
-        # Clean old requests outside the window
-        while self.requests[key] and self.requests[key][0] <= now - window:
-            self.requests[key].popleft()
-        
-        # Check if under limit
-        if len(self.requests[key]) < limit:
-            self.requests[key].append(now)
-            return True
-        
-        return False
-    
-    def is_email_allowed(self, email, limit=5, window=3600):
+        return self.hit(key, limit, window)[0]
+    
+    def is_email_allowed(self, email, limit=5, window=3600, scope=''):
         """Check if email-based request is allowed"""
-        email_hash = hashlib.md5(email.lower().encode()).hexdigest()
-        now = time.time()
-        
-        # Clean old requests
-        while self.email_requests[email_hash] and self.email_requests[email_hash][0] <= now - window:
-            self.email_requests[email_hash].popleft()
-        
-        # Check if under limit
-        if len(self.email_requests[email_hash]) < limit:
-            self.email_requests[email_hash].append(now)
-            return True
-        
-        return False
+        return self.is_allowed(f'{scope}:email:{email_key(email)}', limit, window)
+    
+    def _use_fallback(self, error, key, limit, window):
+        """Limit per process while the shared store is unavailable"""
+        logger.warning(f'Shared rate limit check failed, limiting per process: {error}')
+        fallback = getattr(self, 'fallback', None)
+        if fallback is None:
+            return True, 0
+        return fallback.hit(key, limit, window)
+
+class RateLimiter(BaseRateLimiter):
+    """In-process sliding window counter limiter with constant memory per key and a cap on tracked keys"""
+    
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL, clock=time.time):
+        self.max_keys = max(1, max_keys)
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._windows = OrderedDict()  # least recently used first
+        self._last_sweep = clock()
+        self._evicted = {'idle': 0, 'capacity': 0}
+    
+    def hit(self, key, limit=10, window=3600):
+        """Count a request against key; returns (allowed, seconds until the next one would be allowed)"""
+        now = self.clock()
+        with self._lock:
+            self._sweep(now)
+            state = self._windows.get(key)
+            if state is None:
+                if len(self._windows) >= self.max_keys:
+                    # Over the cap the least recently seen key is forgotten, so memory stays bounded
+                    self._windows.popitem(last=False)
+                    self._evicted['capacity'] += 1
+                state = self._windows[key] = _Window(int(now // window), window, limit)
+            else:
+                self._windows.move_to_end(key)
+                state.window, state.limit = window, limit
+            state.index, state.current, state.previous = _roll(state.index, state.current, state.previous, now, window)
+            
+            if _estimate(state.current, state.previous, now, window) + 1 > limit:
+                return False, _retry_after(state.current, state.previous, limit, now, window)
+            state.current += 1
+            return True, 0
+    
+    def get_reset_time(self, key, window=3600):
+        """Get when the rate limit will reset"""
+        now = self.clock()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None:
+                return 0
+            _, current, previous = _roll(state.index, state.current, state.previous, now, state.window)
+            if _estimate(current, previous, now, state.window) + 1 <= state.limit:
+                return 0
+            return _retry_after(current, previous, state.limit, now, state.window)
+    
+    def get_stats(self):
+        """Number of tracked keys and how many were evicted"""
+        with self._lock:
+            return {'backend': 'memory', 'tracked_keys': len(self._windows), 'max_keys': self.max_keys,
+                    'evicted_idle': self._evicted['idle'], 'evicted_capacity': self._evicted['capacity']}
+    
+    def _sweep(self, now):
+        """Drop keys idle for two full windows, whose counts have decayed to zero (caller holds _lock)"""
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        for key in list(self._windows):
+            state = self._windows[key]
+            if int(now // state.window) <= state.index + 1:
+                break  # keys behind this one were used more recently
+            del self._windows[key]
+            self._evicted['idle'] += 1
+
+def email_key(email):
+    """Rate limit key for an email address, so addresses aren't held in memory"""
+    return hashlib.md5(email.lower().encode()).hexdigest()
+
+class SQLiteRateLimiter(BaseRateLimiter):
+    """Rate limiter shared by every worker on this host through a small WAL database"""
+    
+    def __init__(self, path=RATE_LIMIT_DB_PATH, fallback=None, sweep_interval=RATE_LIMIT_SWEEP_INTERVAL, clock=time.time):
+        self.path = path
+        self.fallback = fallback
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._last_sweep = clock()
+        with connections.transaction(path) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limits (
+                    key TEXT PRIMARY KEY,
+                    window_index INTEGER NOT NULL,
+                    current INTEGER NOT NULL,
+                    previous INTEGER NOT NULL,
+                    window REAL NOT NULL,
+                    max_requests INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_expires ON rate_limits (expires_at)')
+    
+    def hit(self, key, limit=10, window=3600):
+        now = self.clock()
+        try:
+            # The write lock is taken before the read, so concurrent workers can't both take the last slot
+            with connections.transaction(self.path) as conn:
+                if now - self._last_sweep >= self.sweep_interval:
+                    self._last_sweep = now
+                    conn.execute('DELETE FROM rate_limits WHERE expires_at <= ?', (now,))
+                row = conn.execute(
+                    'SELECT window_index, current, previous FROM rate_limits WHERE key = ?', (key,)
+                ).fetchone()
+                index, current, previous = _roll(*(row or (int(now // window), 0, 0)), now, window)
+                
+                allowed = _estimate(current, previous, now, window) + 1 <= limit
+                if allowed:
+                    current += 1
+                # Idle keys expire once both windows they count towards are over
+                conn.execute('''
+                    INSERT INTO rate_limits (key, window_index, current, previous, window, max_requests, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET window_index = excluded.window_index, current = excluded.current,
+                        previous = excluded.previous, window = excluded.window,
+                        max_requests = excluded.max_requests, expires_at = excluded.expires_at
+                ''', (key, index, current, previous, window, limit, (index + 2) * window))
+        except Exception as e:
+            return self._use_fallback(e, key, limit, window)
+        return (True, 0) if allowed else (False, _retry_after(current, previous, limit, now, window))
+    
+    def get_reset_time(self, key, window=3600):
+        """Get when the rate limit will reset"""
+        now = self.clock()
+        row = connections.get(self.path).execute(
+            'SELECT window_index, current, previous, window, max_requests FROM rate_limits WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return 0
+        _, current, previous = _roll(row['window_index'], row['current'], row['previous'], now, row['window'])
+        if _estimate(current, previous, now, row['window']) + 1 <= row['max_requests']:
+            return 0
+        return _retry_after(current, previous, row['max_requests'], now, row['window'])
+    
+    def get_stats(self):
+        """Number of tracked keys across all workers"""
+        tracked = connections.get(self.path).execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        return {'backend': 'sqlite', 'tracked_keys': tracked}
+
+# Same sliding window counter as _roll/_estimate/_retry_after, run atomically inside Redis on Redis's clock
+REDIS_HIT_SCRIPT = '''
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local index = math.floor(now / window)
+local state = redis.call('HMGET', KEYS[1], 'index', 'current', 'previous')
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if tonumber(state[1]) ~= index then
+    if tonumber(state[1]) == index - 1 then previous = current else previous = 0 end
+    current = 0
+end
+local elapsed = (now % window) / window
+local allowed = previous * (1 - elapsed) + current + 1 <= limit
+if allowed then current = current + 1 end
+redis.call('HSET', KEYS[1], 'index', index, 'current', current, 'previous', previous, 'limit', limit)
+-- Idle keys expire once both windows they count towards are over
+redis.call('EXPIREAT', KEYS[1], math.ceil((index + 2) * window))
+if allowed then return 0 end
+local room = limit - 1 - current
+if room >= 0 and previous > 0 then
+    return math.max(1, math.floor((1 - room / previous - elapsed) * window) + 1)
+end
+local until_next = (1 - elapsed) * window
+if current <= 0 then
+    return math.max(1, math.floor(until_next) + 1)
+end
+local decay = math.max(0, 1 - (limit - 1) / current)
+return math.max(1, math.floor(until_next + decay * window) + 1)
+'''
+
+class RedisRateLimiter(BaseRateLimiter):
+    """Rate limiter shared by every worker on every node through Redis"""
+    
+    def __init__(self, client, fallback=None, prefix=RATE_LIMIT_KEY_PREFIX):
+        self.client = client
+        self.fallback = fallback
+        # Separate from the cache's keys, so clearing the cache doesn't reset anyone's limits
+        self.prefix = prefix
+        self._hit = client.register_script(REDIS_HIT_SCRIPT)
+    
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        """Connect to Redis, raising if the server can't be reached"""
+        if redis is None:
+            raise RuntimeError('redis package not installed. Run: pip install redis')
+        client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        client.ping()
+        return cls(client, **kwargs)
+    
+    def hit(self, key, limit=10, window=3600):
+        try:
+            # Returns 0 when allowed, otherwise the seconds to wait
+            retry = int(self._hit(keys=[self.prefix + key], args=[window, limit]))
+        except Exception as e:
+            return self._use_fallback(e, key, limit, window)
+        return (True, 0) if retry == 0 else (False, retry)
     
     def get_reset_time(self, key, window=3600):
         """Get when the rate limit will reset"""
-        if not self.requests[key]:
+        state = self.client.hmget(self.prefix + key, 'index', 'current', 'previous', 'limit')
+        if state[0] is None:
             return 0
-        return int(self.requests[key][0] + window - time.time())
+        seconds, micros = self.client.time()
+        now = seconds + micros / 1000000
+        index, current, previous, limit = (int(float(value)) for value in state)
+        _, current, previous = _roll(index, current, previous, now, window)
+        if _estimate(current, previous, now, window) + 1 <= limit:
+            return 0
+        return _retry_after(current, previous, limit, now, window)
+    
+    def get_stats(self):
+        """Keys expire in Redis on their own, so only the backend is reported"""
+        return {'backend': 'redis'}
+
+def create_rate_limiter():
+    """Create the limiter shared by all workers: Redis across nodes, SQLite on a single node"""
+    local = RateLimiter()
+    backend = RATE_LIMIT_BACKEND or ('redis' if REDIS_URL else 'sqlite')
+    try:
+        if backend == 'redis':
+            return RedisRateLimiter.from_url(REDIS_URL, fallback=local)
+        if backend == 'sqlite':
+            return SQLiteRateLimiter(RATE_LIMIT_DB_PATH, fallback=local)
+    except Exception as e:
+        logger.warning(f'Shared rate limiter unavailable, limiting per process: {e}')
+    return local
 
 # Global rate limiter instance
-rate_limiter = RateLimiter()
+rate_limiter = create_rate_limiter()
 
 def rate_limit(limit=10, window=3600, per='ip'):
     """Rate limiting decorator"""
@@ -64,16 +323,17 @@ def rate_limit(limit=10, window=3600, per='ip'):
                 email = data.get('email')
                 if not email:
                     return jsonify({'error': 'Email required for rate limiting'}), 400
-                key = hashlib.md5(email.lower().encode()).hexdigest()
+                key = email_key(email)
             else:
                 key = request.remote_addr
             
-            if not rate_limiter.is_allowed(key, limit, window):
-                reset_time = rate_limiter.get_reset_time(key, window)
+            # Scoped per endpoint, so one endpoint's traffic doesn't use up another's limit
+            allowed, reset_time = rate_limiter.hit(f'{f.__name__}:{key}', limit, window)
+            if not allowed:
                 return jsonify({
                     'error': 'Rate limit exceeded',
                     'reset_in': reset_time
-                }), 429
+                }), 429, {'Retry-After': str(reset_time)}
             
             return f(*args, **kwargs)
         return decorated_function
@@ -90,7 +350,7 @@ def email_rate_limit(limit=5, window=3600):
             if not email:
                 return jsonify({'error': 'Email required'}), 400
             
-            if not rate_limiter.is_email_allowed(email, limit, window):
+            if not rate_limiter.is_email_allowed(email, limit, window, scope=f.__name__):
                 return jsonify({
                     'error': 'Too many requests from this email address',
                     'message': f'Limit: {limit} requests per {window//60} minutes'
@@ -98,4 +358,4 @@ def email_rate_limit(limit=5, window=3600):
             
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator